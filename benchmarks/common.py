@@ -0,0 +1,53 @@
+from typing import Optional, Tuple
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def synthetic_corpus(
+    num_docs: int, num_queries: int, dim: int, seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Generate clustered unit vectors resembling text embeddings, plus nearby queries.
+
+    Variance decays across dimensions so that, like the text-embedding-3
+    models, the leading components carry most of the signal.
+    """
+    rng = np.random.default_rng(seed)
+    scale = np.linspace(1.0, 0.1, dim).astype(np.float32)
+    num_clusters = max(1, num_docs // 50)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32) * scale
+    assignments = rng.integers(0, num_clusters, size=num_docs)
+    docs = centers[assignments] + 0.5 * rng.standard_normal((num_docs, dim)).astype(np.float32) * scale
+    picks = rng.integers(0, num_docs, size=num_queries)
+    queries = docs[picks] + 0.3 * rng.standard_normal((num_queries, dim)).astype(np.float32) * scale
+    return normalize_rows(docs), normalize_rows(queries)
+
+
+def load_corpus(path: str, num_queries: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Load saved embeddings (.npy) and derive noisy queries from a sample of them."""
+    docs = normalize_rows(np.load(path).astype(np.float32))
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, docs.shape[0], size=num_queries)
+    queries = docs[picks] + 0.05 * rng.standard_normal((num_queries, docs.shape[1])).astype(np.float32)
+    return docs, normalize_rows(queries)
+
+
+def exact_top_k(docs: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Brute-force cosine top-k indices for unit-length vectors."""
+    scores = queries @ docs.T
+    k = min(k, docs.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray, k: Optional[int] = None) -> float:
+    """Mean fraction of the true top-k neighbours that were retrieved."""
+    k = k or truth.shape[1]
+    hits = [len(set(t[:k]) & set(f[:k])) / k for t, f in zip(truth, found)]
+    return float(np.mean(hits)) if hits else 0.0
@@ -0,0 +1,131 @@
+"""Sweep per-space HNSW settings and report recall@k, query latency and index size.
+
+Each combination of M, construction ef and search ef gets a freshly built
+Chroma collection; recall is measured against exact brute-force search. On
+unit-length vectors l2, cosine and ip rank neighbours identically, so the same
+exact top-k serves as ground truth for every distance space.
+
+Usage:
+    python -m benchmarks.hnsw_benchmark --num-docs 20000 --m 8 16 32 --search-ef 16 64 128
+    python -m benchmarks.hnsw_benchmark --embeddings saved_embeddings.npy --space cosine
+"""
+import argparse
+import itertools
+import os
+import tempfile
+import time
+from typing import List, Tuple
+import chromadb
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+from benchmarks.common import exact_top_k, load_corpus, recall_at_k, synthetic_corpus
+from src.vector_store.chroma_store import hnsw_configuration
+
+
+def index_size_bytes(path: str) -> int:
+    """Size of the HNSW segment files under a Chroma persist directory (excluding SQLite)."""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) if root != path
+        for name in names
+    )
+
+
+def latency_percentiles(latencies: List[float]) -> Tuple[float, float]:
+    """p50 and p99 in milliseconds."""
+    p50, p99 = np.percentile(np.asarray(latencies) * 1000.0, [50, 99])
+    return float(p50), float(p99)
+
+
+def exact_latencies(docs: np.ndarray, queries: np.ndarray, k: int) -> List[float]:
+    """Per-query latency of brute-force search, the flat backend's strategy."""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        exact_top_k(docs, query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def build_and_query(
+    docs: np.ndarray, queries: np.ndarray, k: int, hnsw: dict
+) -> Tuple[np.ndarray, List[float], float, int]:
+    """Build a collection with the given settings, then run every query against it one at a time."""
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as path:
+        client = chromadb.PersistentClient(path=path)
+        collection = client.create_collection(
+            "benchmark",
+            configuration={"hnsw": hnsw_configuration(hnsw)},
+            embedding_function=None
+        )
+
+        start = time.perf_counter()
+        batch_size = client.get_max_batch_size()
+        for offset in range(0, docs.shape[0], batch_size):
+            end = min(offset + batch_size, docs.shape[0])
+            collection.add(ids=[str(i) for i in range(offset, end)], embeddings=docs[offset:end])
+        build_seconds = time.perf_counter() - start
+
+        found = []
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=query[None, :], n_results=k, include=[])
+            latencies.append(time.perf_counter() - start)
+            found.append([int(doc_id) for doc_id in result["ids"][0]])
+
+        size = index_size_bytes(path)
+        SharedSystemClient.clear_system_cache()
+    return np.asarray(found), latencies, build_seconds, size
+
+
+def run(docs, queries, space: str, ms: List[int], construction_efs: List[int], search_efs: List[int], k: int) -> None:
+    truth = exact_top_k(docs, queries, k)
+    raw_mb = docs.nbytes / 1e6
+
+    print(
+        f"{docs.shape[0]} vectors x {docs.shape[1]} dims ({raw_mb:.1f} MB raw), "
+        f"{queries.shape[0]} queries, space={space}"
+    )
+    print(
+        f"{'M':>4} {'constr ef':>9} {'search ef':>9} {f'recall@{k}':>10} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'index MB':>9}"
+    )
+    p50, p99 = latency_percentiles(exact_latencies(docs, queries, k))
+    print(f"{'exact (flat)':>24} {1.0:>10.3f} {p50:>8.2f} {p99:>8.2f} {'-':>8} {raw_mb:>9.1f}")
+
+    for m, construction_ef, search_ef in itertools.product(ms, construction_efs, search_efs):
+        hnsw = {"space": space, "m": m, "construction_ef": construction_ef, "search_ef": search_ef}
+        found, latencies, build_seconds, size = build_and_query(docs, queries, k, hnsw)
+        p50, p99 = latency_percentiles(latencies)
+        print(
+            f"{m:>4} {construction_ef:>9} {search_ef:>9} {recall_at_k(truth, found):>10.3f} "
+            f"{p50:>8.2f} {p99:>8.2f} {build_seconds:>8.1f} {size / 1e6:>9.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark recall and latency of HNSW settings")
+    parser.add_argument("--embeddings", help="Path to a .npy matrix of saved embeddings (default: synthetic)")
+    parser.add_argument("--num-docs", type=int, default=20000, help="Synthetic corpus size (default: 20000)")
+    parser.add_argument("--num-queries", type=int, default=200, help="Number of queries (default: 200)")
+    parser.add_argument("--dim", type=int, default=512, help="Synthetic embedding size (default: 512)")
+    parser.add_argument("--space", default="cosine", choices=["l2", "cosine", "ip"],
+                        help="Distance space (default: cosine)")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32], help="Graph degrees (default: 8 16 32)")
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200],
+                        help="Construction ef values (default: 100 200)")
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[16, 64, 128],
+                        help="Search ef values (default: 16 64 128)")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query (default: 10)")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        docs, queries = load_corpus(args.embeddings, args.num_queries)
+    else:
+        docs, queries = synthetic_corpus(args.num_docs, args.num_queries, args.dim)
+    run(docs, queries, args.space, args.m, args.construction_ef, args.search_ef, args.k)
+
+
+if __name__ == "__main__":
+    main()
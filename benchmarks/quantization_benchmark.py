@@ -0,0 +1,52 @@
+"""Compare memory footprint and recall@k of reduced-dimension and quantized embeddings.
+
+Usage:
+    python -m benchmarks.quantization_benchmark --num-docs 20000 --dimensions 1536 512 256
+    python -m benchmarks.quantization_benchmark --embeddings saved_embeddings.npy
+"""
+import argparse
+from typing import List
+from benchmarks.common import exact_top_k, load_corpus, recall_at_k, synthetic_corpus
+from src.vector_store.quantization import QUANTIZATION_TYPES, apply_quantization, bytes_per_vector, truncate_dimensions
+
+
+def run(docs, queries, dimensions: List[int], k: int) -> None:
+    truth = exact_top_k(docs, queries, k)
+    full_bytes = docs.shape[0] * bytes_per_vector(docs.shape[1], "float32")
+
+    print(f"{'dims':>6} {'quantization':>12} {'memory (MB)':>12} {'vs full':>8} {f'recall@{k}':>10}")
+    for dims in dimensions:
+        reduced_docs = truncate_dimensions(docs, dims)
+        reduced_queries = truncate_dimensions(queries, dims)
+        actual_dims = reduced_docs.shape[1]
+        for quantization in QUANTIZATION_TYPES:
+            stored = apply_quantization(reduced_docs, quantization)
+            query_vectors = apply_quantization(reduced_queries, quantization)
+            found = exact_top_k(stored, query_vectors, k)
+            memory = docs.shape[0] * bytes_per_vector(actual_dims, quantization)
+            print(
+                f"{actual_dims:>6} {quantization:>12} {memory / 1e6:>12.1f} "
+                f"{memory / full_bytes:>7.1%} {recall_at_k(truth, found):>10.3f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark reduced-dimension and quantized embedding storage")
+    parser.add_argument("--embeddings", help="Path to a .npy matrix of saved embeddings (default: synthetic)")
+    parser.add_argument("--num-docs", type=int, default=20000, help="Synthetic corpus size (default: 20000)")
+    parser.add_argument("--num-queries", type=int, default=200, help="Number of queries (default: 200)")
+    parser.add_argument("--dim", type=int, default=1536, help="Synthetic embedding size (default: 1536)")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1536, 1024, 512, 256],
+                        help="Reduced sizes to evaluate (default: 1536 1024 512 256)")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query (default: 10)")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        docs, queries = load_corpus(args.embeddings, args.num_queries)
+    else:
+        docs, queries = synthetic_corpus(args.num_docs, args.num_queries, args.dim)
+    run(docs, queries, args.dimensions, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,7 @@ setup(
         "requests==2.32.5",
         "urllib3==2.5.0",
         "tqdm==4.67.1",
+        "numpy==2.4.6",
         "httpx==0.28.1"
     ],
 ) 
\ No newline at end of file
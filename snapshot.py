@@ -0,0 +1,35 @@
+import argparse
+from src.vector_store.chroma_store import ChromaStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or restore a space as a compact snapshot")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write a space to a snapshot directory")
+    export_parser.add_argument("space", help="Name of the space to export")
+    export_parser.add_argument("path", help="Snapshot directory to write")
+    export_parser.add_argument("--dtype", choices=["float32", "float16", "int8"],
+                               help="Embedding precision (default: the space's quantization)")
+
+    import_parser = subparsers.add_parser("import", help="Restore a space from a snapshot directory")
+    import_parser.add_argument("path", help="Snapshot directory to read")
+    import_parser.add_argument("--space", help="Restore under this name (default: the exported space's name)")
+
+    args = parser.parse_args()
+
+    try:
+        store = ChromaStore.from_env()
+        if args.command == "export":
+            manifest = store.export_snapshot(args.space, args.path, args.dtype)
+            print(f"Exported {manifest['count']} chunks of '{args.space}' to {args.path} ({manifest['dtype']})")
+        else:
+            result = store.import_snapshot(args.path, args.space)
+            print(f"Imported {result['loaded']} chunks into '{result['collection']}'")
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional
 import os
+import json
 import logging
 from ..rag.rag_chain import RAGChain
 from ..rag.document_loader import DocumentLoader
+from ..embeddings.query_coalescer import close_query_coalescers
+from ..http_clients import close_http_clients, get_connection_stats
 from dotenv import load_dotenv
 
 # Configure logging
@@ -14,7 +20,16 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+    # Stop background batching threads and release pooled connections
+    close_query_coalescers()
+    close_http_clients()
+
+# Handlers that call the blocking RAG, vector store or LLM APIs are plain ``def``
+# so FastAPI runs them in its threadpool instead of serialising them on the event loop
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -31,17 +46,30 @@ rag_chain = RAGChain()
 class QueryRequest(BaseModel):
     query: str
     space_name: str
+    where: Optional[Dict[str, Any]] = None
+    where_document: Optional[Dict[str, Any]] = None
+    search_mode: Optional[str] = None
+
+class HNSWConfig(BaseModel):
+    space: Optional[str] = None
+    m: Optional[int] = None
+    construction_ef: Optional[int] = None
+    search_ef: Optional[int] = None
 
 class SpaceRequest(BaseModel):
     name: str
     documents: List[Dict[str, Any]]
+    embedding_dimensions: Optional[int] = None
+    quantization: Optional[str] = None
+    vector_backend: Optional[str] = None
+    hnsw: Optional[HNSWConfig] = None
 
 class Document(BaseModel):
     text: str
     metadata: Dict[str, Any] = {}
 
 @app.get("/api/health")
-async def health_check():
+def health_check():
     """Check if the backend is healthy"""
     try:
         # Get list of collections to verify connection
@@ -57,8 +85,17 @@ async def health_check():
             "error": str(e)
         }
 
+@app.get("/api/metrics")
+def metrics():
+    """Report performance counters for shared clients and caches."""
+    return {
+        "http_connections": get_connection_stats(),
+        "caches": rag_chain.get_cache_stats(),
+        "embeddings": rag_chain.get_embedding_stats()
+    }
+
 @app.get("/spaces")
-async def list_spaces():
+def list_spaces():
     try:
         spaces = rag_chain.get_spaces()
         return {"spaces": spaces}
@@ -66,25 +103,82 @@ async def list_spaces():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/spaces")
-async def create_space(request: SpaceRequest):
+def create_space(request: SpaceRequest):
     try:
         # Convert documents to the expected format
         documents = [{"text": doc["text"], "metadata": doc.get("metadata", {})} for doc in request.documents]
+        if request.embedding_dimensions or request.quantization or request.vector_backend or request.hnsw:
+            rag_chain.configure_space(
+                request.name,
+                request.embedding_dimensions,
+                request.quantization,
+                request.vector_backend,
+                request.hnsw.model_dump(exclude_none=True) if request.hnsw else None
+            )
         rag_chain.add_documents(documents, request.name)
-        # Initialize the chain for the new space
+        # Warm the new space's chain
         rag_chain.initialize_chain(request.name)
         return {"message": f"Space '{request.name}' created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/spaces/{space_name}/query")
-async def query_space(space_name: str, request: QueryRequest):
+def query_space(space_name: str, request: QueryRequest):
     try:
-        results = rag_chain.query(request.query, space_name)
+        results = rag_chain.query(
+            request.query,
+            space_name,
+            where=request.where,
+            where_document=request.where_document,
+            search_mode=request.search_mode
+        )
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/spaces/{space_name}/query/stream")
+async def stream_query_space(space_name: str, request: QueryRequest):
+    """Stream the answer as Server-Sent Events: a ``sources`` event, ``token`` events, then ``done``."""
+    stream = rag_chain.astream_query(
+        request.query,
+        space_name,
+        where=request.where,
+        where_document=request.where_document,
+        search_mode=request.search_mode
+    )
+    # Validation and retrieval fail before any header is sent, as plain HTTP errors
+    try:
+        first = await stream.__anext__()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        try:
+            yield f"event: {first['type']}\ndata: {json.dumps(first)}\n\n"
+            async for event in stream:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-stream
+            logger.error(f"Streaming query failed: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/spaces/{space_name}/filters")
+def list_filters(space_name: str):
+    """List the metadata keys that can be used in query filters for a space."""
+    try:
+        return {"keys": rag_chain.get_filterable_keys(space_name)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/spaces/{space_name}/documents")
 async def upload_document(space_name: str, file: UploadFile = File(...)):
     """Upload a document to a specific space"""
@@ -95,32 +189,36 @@ async def upload_document(space_name: str, file: UploadFile = File(...)):
 
         # Save the uploaded file
         file_path = os.path.join(space_dir, file.filename or "")
+        content = await file.read()
         with open(file_path, "wb") as buffer:
-            content = await file.read()
             buffer.write(content)
 
-        # Process the document
-        loader = DocumentLoader()
-        documents = loader.load_documents(file_path)
-
-        # Convert Langchain Document objects to the expected format
-        processed_documents = [
-            {
-                "text": doc.page_content,
-                "metadata": doc.metadata
-            }
-            for doc in documents
-        ]
-
-        # Add to vector store
-        rag_chain.add_documents(processed_documents, space_name)
+        # Loading, embedding and writing block, so they run in the threadpool
+        report = await run_in_threadpool(_ingest_file, file_path, space_name)
 
-        return {"message": f"Document '{file.filename}' uploaded successfully"}
+        return {"message": f"Document '{file.filename}' uploaded successfully", "report": report}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _ingest_file(file_path: str, space_name: str) -> Dict[str, int]:
+    """Load a saved upload, add its chunks to a space and return the ingest report."""
+    loader = DocumentLoader()
+    documents = loader.load_documents(file_path)
+
+    # Convert Langchain Document objects to the expected format
+    processed_documents = [
+        {
+            "text": doc.page_content,
+            "metadata": doc.metadata
+        }
+        for doc in documents
+    ]
+
+    # A re-uploaded file replaces the chunks stored for its previous version
+    return rag_chain.add_documents(processed_documents, space_name, replace_sources=True)
+
 @app.delete("/spaces/{space_name}")
-async def delete_space(space_name: str):
+def delete_space(space_name: str):
     """Delete a space and its associated documents."""
     if space_name == "default":
         raise HTTPException(status_code=400, detail="Cannot delete the default space")
@@ -133,7 +231,7 @@ async def delete_space(space_name: str):
             shutil.rmtree(space_dir)
         
         # Delete the collection from ChromaDB
-        rag_chain.vector_store.delete_collection(space_name)
+        rag_chain.delete_space(space_name)
         
         return {"message": f"Space '{space_name}' deleted successfully"}
     except Exception as e:
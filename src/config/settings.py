@@ -1,4 +1,5 @@
 from pathlib import Path
+import json
 import os
 
 # Base directory
@@ -8,6 +9,41 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 CHROMA_HOST = "localhost"
 CHROMA_PORT = 8000
 COLLECTION_NAME = "documents"
+# "persistent" opens ./chroma_db in-process; "http" talks to a Chroma server at CHROMA_HOST:CHROMA_PORT
+CHROMA_CLIENT_MODE = os.getenv("CHROMA_CLIENT_MODE", "persistent")
+# Documents embedded and written per collection.add call (capped at the client's max batch size)
+CHROMA_WRITE_BATCH_SIZE = int(os.getenv("CHROMA_WRITE_BATCH_SIZE", "500"))
+# Collection handles kept per store to avoid a metadata round trip on every call
+COLLECTION_CACHE_SIZE = int(os.getenv("COLLECTION_CACHE_SIZE", "64"))
+
+# QA chain settings
+# Warm per-space QA chains kept by RAGChain, least recently used evicted first
+QA_CHAIN_CACHE_SIZE = int(os.getenv("QA_CHAIN_CACHE_SIZE", "32"))
+
+# LLM cache settings
+# Exact-match LLM response cache (SQLite); the TTL bounds how long a stale answer can be served (0 = no expiry)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "604800"))
+
+# Context packing settings
+# Token budget for retrieved chunks in the prompt, overridable per model
+# with a JSON object such as {"gpt-4o-mini": 6000}
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_TOKEN_BUDGETS = json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS", "{}"))
+# Candidates fetched per requested chunk, so deduplication still leaves k chunks
+CONTEXT_FETCH_MULTIPLIER = int(os.getenv("CONTEXT_FETCH_MULTIPLIER", "2"))
+# Share of a chunk's word shingles found in a better chunk above which it is dropped as a near duplicate
+CONTEXT_NEAR_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+# Answer cache settings
+# Semantic answer cache: reuse an answer when a query's embedding is this close (cosine) to a cached one
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+# Answers expire after this long (0 disables); caches are per worker and miss other workers' writes
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
 
 # OpenAI settings
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -19,3 +55,34 @@ RETRIEVAL_K = 3
 
 # LLM settings
 TEMPERATURE = 0.2
+
+# Embedding cache settings
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Embedding API quota shared by all embedding clients in the process
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "3000"))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+
+# Query embedding coalescing (set the window to 0 to disable)
+QUERY_COALESCE_WINDOW_MS = float(os.getenv("QUERY_COALESCE_WINDOW_MS", "5"))
+QUERY_COALESCE_MAX_BATCH_SIZE = int(os.getenv("QUERY_COALESCE_MAX_BATCH_SIZE", "64"))
+
+# Embedding backend: "openai" or "hashing" (offline, deterministic)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "384"))
+
+# Shared HTTP connection pool used by all OpenAI clients
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+# Hybrid retrieval: "vector" (dense only) or "hybrid" (dense + BM25 fused with reciprocal rank fusion)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")
+# Candidates taken from each ranking before fusion, and the RRF rank constant
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
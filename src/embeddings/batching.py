@@ -0,0 +1,65 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# OpenAI limits a single embeddings request to 2048 inputs and roughly 300k tokens
+DEFAULT_MAX_BATCH_SIZE = 1000
+DEFAULT_MAX_BATCH_TOKENS = 250_000
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheaply estimate the token count of a text (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def make_batches(
+    texts: Sequence[str],
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+) -> List[Tuple[int, int]]:
+    """Split texts into contiguous (start, end) ranges bounded by item count and estimated tokens.
+
+    A single text larger than ``max_batch_tokens`` gets a batch of its own.
+    """
+    if max_batch_size <= 0 or max_batch_tokens <= 0:
+        raise ValueError("Batch limits must be positive")
+
+    batches: List[Tuple[int, int]] = []
+    start = 0
+    batch_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if i > start and (i - start >= max_batch_size or batch_tokens + tokens > max_batch_tokens):
+            batches.append((start, i))
+            start = i
+            batch_tokens = 0
+        batch_tokens += tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def normalize_text(text: str) -> str:
+    """Normalise a text for duplicate detection by collapsing whitespace."""
+    return " ".join(text.split())
+
+
+def deduplicate(texts: Sequence[str]) -> Tuple[List[str], Optional[List[int]]]:
+    """Collapse texts that are identical after normalisation.
+
+    Returns the unique texts (first occurrence of each) and, for every input
+    position, the index of its unique text. The positions are None when there
+    were no duplicates so callers can skip the scatter step.
+    """
+    index_by_key: Dict[str, int] = {}
+    unique: List[str] = []
+    positions: List[int] = []
+    for text in texts:
+        key = normalize_text(text)
+        index = index_by_key.get(key)
+        if index is None:
+            index = len(unique)
+            index_by_key[key] = index
+            unique.append(text)
+        positions.append(index)
+    if len(unique) == len(texts):
+        return list(texts), None
+    return unique, positions
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Union
+import numpy as np
+
+
+class EmbeddingCache:
+    """Persistent, content-addressed embedding cache backed by SQLite.
+
+    Entries are keyed by (model name, dimensions, SHA-256 of the text) so the
+    same text embedded with a different model or output size never collides.
+    Vectors are stored as packed float32 blobs. When the number of entries
+    exceeds ``max_entries`` the least recently used ones are evicted.
+    """
+
+    # SQLite limits the number of host parameters per statement
+    _QUERY_CHUNK_SIZE = 500
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, dimensions: Optional[int], text: str) -> str:
+        """Build the cache key for a text embedded with the given model settings."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}:{dimensions or 0}:{digest}"
+
+    def get_many(
+        self, model_name: str, dimensions: Optional[int], texts: Sequence[str]
+    ) -> List[Optional[List[float]]]:
+        """Return cached embeddings in input order, with None for misses."""
+        return [
+            array("f", blob).tolist() if blob is not None else None
+            for blob in self.get_many_raw(model_name, dimensions, texts)
+        ]
+
+    def get_many_raw(
+        self, model_name: str, dimensions: Optional[int], texts: Sequence[str]
+    ) -> List[Optional[bytes]]:
+        """Return cached embeddings as packed float32 bytes in input order, with None for misses."""
+        keys = [self.make_key(model_name, dimensions, text) for text in texts]
+        found: Dict[str, bytes] = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self._lock:
+            for start in range(0, len(unique_keys), self._QUERY_CHUNK_SIZE):
+                chunk = unique_keys[start:start + self._QUERY_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",  # nosec B608
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = blob
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(
+        self,
+        model_name: str,
+        dimensions: Optional[int],
+        texts: Sequence[str],
+        embeddings: Union[Sequence[Sequence[float]], np.ndarray],
+    ) -> None:
+        """Store embeddings (lists or rows of a float32 matrix) for the given texts, evicting old entries if needed."""
+        if len(texts) != len(embeddings):
+            raise ValueError("texts and embeddings must have the same length")
+        if not texts:
+            return
+
+        now = time.time()
+        rows = [
+            (self.make_key(model_name, dimensions, text), _pack(embedding), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries beyond max_entries. Caller holds the lock."""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def clear(self) -> None:
+        """Remove every cached embedding."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and the current number of entries."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def _pack(embedding: Any) -> bytes:
+    """Serialise an embedding as float32 bytes, without a Python-level copy for float32 arrays."""
+    if getattr(embedding, "dtype", None) == "float32":
+        return embedding.tobytes()
+    return array("f", embedding).tobytes()
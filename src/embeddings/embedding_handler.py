@@ -1,20 +1,15 @@
-from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
-import os
-from typing import Optional
-from pydantic import SecretStr
+from typing import Any, Optional
+from src.embeddings.registry import create_embedding_function
 
 # Load environment variables from .env file
 load_dotenv()
 
 
 class EmbeddingHandler:
-    def __init__(self):
-        api_key: Optional[str] = os.getenv("OPENAI_API_KEY")
-        secret_key: Optional[SecretStr] = SecretStr(api_key) if api_key else None
-        self.embeddings = OpenAIEmbeddings(
-            api_key=secret_key.get_secret_value() if secret_key else None
-        )
+    def __init__(self, backend: Optional[str] = None):
+        # Every backend, OpenAI included, comes from the shared registry
+        self.embeddings: Any = create_embedding_function(backend)
     
-    def get_embeddings(self) -> OpenAIEmbeddings:
+    def get_embeddings(self) -> Any:
         return self.embeddings
@@ -0,0 +1,103 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=200_000)
+def _hash_feature(feature: str, dimensions: int) -> Tuple[int, float]:
+    """Map a feature to a stable (index, sign) pair; blake2b keeps it identical across processes."""
+    value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return value % dimensions, 1.0 if (value >> 63) & 1 else -1.0
+
+
+class HashingEmbeddings:
+    """Deterministic, offline embeddings built with signed feature hashing.
+
+    Each text is represented by its lower-cased words, adjacent word pairs and
+    character n-grams, hashed into a fixed number of dimensions and
+    L2-normalised. No network or model download is involved, so this backend
+    is suited to offline ingest, CI and load tests; lexical overlap stands in
+    for semantic similarity.
+    """
+
+    supports_numpy_embeddings = True
+
+    def __init__(self, dimensions: int = 384, ngram_size: int = 3):
+        if dimensions <= 0:
+            raise ValueError("dimensions must be positive")
+        self.dimensions = dimensions
+        self.ngram_size = ngram_size
+        self.model_name = f"hashing-{dimensions}"
+
+    @staticmethod
+    def name() -> str:
+        # Chroma treats embedding functions without a registered name as legacy
+        return NotImplemented
+
+    def with_dimensions(self, dimensions: Optional[int]) -> "HashingEmbeddings":
+        """Return an embedder hashing into ``dimensions`` buckets."""
+        if not dimensions or dimensions == self.dimensions:
+            return self
+        return HashingEmbeddings(dimensions, self.ngram_size)
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_PATTERN.findall(text.lower())
+        features = [f"w:{word}" for word in words]
+        features.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+        n = self.ngram_size
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(f"c:{padded[i:i + n]}" for i in range(max(1, len(padded) - n + 1)))
+        return features
+
+    def _embed_array(self, texts: List[str]) -> np.ndarray:
+        rows: List[int] = []
+        columns: List[int] = []
+        signs: List[float] = []
+        for row, text in enumerate(texts):
+            for feature in self._features(str(text)):
+                column, sign = _hash_feature(feature, self.dimensions)
+                rows.append(row)
+                columns.append(column)
+                signs.append(sign)
+
+        flat = np.asarray(rows, dtype=np.int64) * self.dimensions + np.asarray(columns, dtype=np.int64)
+        matrix = np.bincount(flat, weights=signs, minlength=len(texts) * self.dimensions)
+        matrix = matrix.reshape(len(texts), self.dimensions).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def __call__(self, input: Union[str, List[str]]) -> List[List[float]]:
+        """Generate embeddings for input text(s)."""
+        if isinstance(input, str):
+            input = [input]
+        return self._embed_array(input).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for a list of texts."""
+        return self._embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Generate embedding for a single text query."""
+        return self._embed_array([text])[0].tolist()
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for a list of texts as a float32 matrix."""
+        return self._embed_array(texts)
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text query as a float32 array."""
+        return self._embed_array([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async counterpart of embed_documents; hashing is CPU-only so this does not await."""
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async counterpart of embed_query."""
+        return self.embed_query(text)
@@ -1,11 +1,258 @@
-from typing import List, Union
-from openai import OpenAI
+import asyncio
+import base64
+import copy
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
+from src.embeddings.batching import (
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_BATCH_TOKENS,
+    deduplicate,
+    estimate_tokens,
+    make_batches,
+)
+from src.embeddings.embedding_cache import EmbeddingCache
+from src.embeddings.rate_limiter import RateLimiter, get_shared_rate_limiter
+from src.embeddings.retry import RetryPolicy, RetryStats, acall_with_retry, call_with_retry
+from src.http_clients import get_async_http_client, get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+def decode_base64_embeddings(encoded: Sequence[str]) -> np.ndarray:
+    """Decode base64 float32 embeddings into one contiguous (n, dim) float32 matrix."""
+    if not encoded:
+        return np.empty((0, 0), dtype=np.float32)
+    first = np.frombuffer(base64.b64decode(encoded[0]), dtype=np.float32)
+    matrix = np.empty((len(encoded), first.shape[0]), dtype=np.float32)
+    matrix[0] = first
+    for i in range(1, len(encoded)):
+        matrix[i] = np.frombuffer(base64.b64decode(encoded[i]), dtype=np.float32)
+    return matrix
+
+
+def _concat_rows(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    return np.concatenate([first, second])
 
 
 class OpenAIEmbeddings:
-    def __init__(self, api_key: str, model_name: str = "text-embedding-3-small"):
-        self.client = OpenAI(api_key=api_key)
+    # Lets vector stores pass float32 matrices straight through instead of nested lists
+    supports_numpy_embeddings = True
+
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = "text-embedding-3-small",
+        dimensions: Optional[int] = None,
+        cache: Optional[EmbeddingCache] = None,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+        max_workers: int = 4,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        # Retries are handled by our own policy, which can also split oversized batches
+        self.client = OpenAI(api_key=api_key, max_retries=0, http_client=get_http_client())
+        self.async_client = AsyncOpenAI(api_key=api_key, max_retries=0, http_client=get_async_http_client())
         self.model_name = model_name
+        self.dimensions = dimensions
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_workers = max_workers
+        # Shared per model by default so every client in the process draws from one quota
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter(model_name)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.retry_stats = RetryStats()
+        self._dedup_lock = threading.Lock()
+        self.dedup_inputs = 0
+        self.dedup_saved = 0
+
+    @staticmethod
+    def name() -> str:
+        # Chroma treats embedding functions without a registered name as legacy
+        return NotImplemented
+
+    def with_dimensions(self, dimensions: Optional[int]) -> "OpenAIEmbeddings":
+        """Return a copy producing ``dimensions``-sized vectors that shares clients, cache and quota."""
+        if dimensions == self.dimensions:
+            return self
+        embeddings = copy.copy(self)
+        embeddings.dimensions = dimensions
+        return embeddings
+
+    def _request_params(self, texts: List[str]) -> Dict[str, Any]:
+        """Build the keyword arguments for an embeddings API call."""
+        params: Dict[str, Any] = {"model": self.model_name, "input": texts}
+        if self.dimensions:
+            params["dimensions"] = self.dimensions
+        return params
+
+    def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts via the API, splitting into batches dispatched concurrently.
+
+        Batches are bounded by item count and estimated tokens so large ingests
+        stay within per-request limits; results are returned in input order.
+        """
+        batches = make_batches(texts, self.max_batch_size, self.max_batch_tokens)
+        if len(batches) <= 1:
+            return self._create_batch(texts)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            results = executor.map(lambda bounds: self._create_batch(texts[bounds[0]:bounds[1]]), batches)
+            return [embedding for batch in results for embedding in batch]
+
+    def _create_embeddings_array(self, texts: List[str]) -> np.ndarray:
+        """Like _create_embeddings, but returns a float32 matrix decoded from base64 responses."""
+        batches = make_batches(texts, self.max_batch_size, self.max_batch_tokens)
+        if len(batches) <= 1:
+            return self._create_batch_array(texts)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            results = executor.map(lambda bounds: self._create_batch_array(texts[bounds[0]:bounds[1]]), batches)
+            return np.concatenate(list(results))
+
+    def _create_batch_array(self, texts: List[str]) -> np.ndarray:
+        """Embed a single batch as a float32 matrix, with the same retry behaviour as _create_batch."""
+        return call_with_retry(self._request_batch_array, texts, self.retry_policy, self.retry_stats, _concat_rows)
+
+    def _request_batch_array(self, texts: List[str]) -> np.ndarray:
+        """Call the embeddings API requesting base64 output and decode it without per-float objects."""
+        self.rate_limiter.acquire_blocking(sum(estimate_tokens(text) for text in texts))
+        response = self.client.embeddings.create(**self._request_params(texts), encoding_format="base64")
+        return decode_base64_embeddings([data.embedding for data in response.data])  # type: ignore[misc]
+
+    def _create_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a single batch, retrying transient errors and splitting it if it is too large."""
+        return call_with_retry(self._request_batch, texts, self.retry_policy, self.retry_stats)
+
+    def _request_batch(self, texts: List[str]) -> List[List[float]]:
+        """Call the embeddings API for a single batch of texts."""
+        self.rate_limiter.acquire_blocking(sum(estimate_tokens(text) for text in texts))
+        response = self.client.embeddings.create(**self._request_params(texts))
+        return [data.embedding for data in response.data]
+
+    async def _acreate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Async counterpart of _create_embeddings with at most max_workers batches in flight."""
+        batches = make_batches(texts, self.max_batch_size, self.max_batch_tokens)
+        if len(batches) <= 1:
+            return await self._acreate_batch(texts)
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run(start: int, end: int) -> List[List[float]]:
+            async with semaphore:
+                return await self._acreate_batch(texts[start:end])
+
+        results = await asyncio.gather(*(run(start, end) for start, end in batches))
+        return [embedding for batch in results for embedding in batch]
+
+    async def _acreate_batch(self, texts: List[str]) -> List[List[float]]:
+        """Async counterpart of _create_batch."""
+        return await acall_with_retry(self._arequest_batch, texts, self.retry_policy, self.retry_stats)
+
+    async def _arequest_batch(self, texts: List[str]) -> List[List[float]]:
+        """Call the async embeddings API for a single batch of texts."""
+        await self.rate_limiter.acquire(sum(estimate_tokens(text) for text in texts))
+        response = await self.async_client.embeddings.create(**self._request_params(texts))
+        return [data.embedding for data in response.data]
+
+    def _lookup_cache(self, texts: List[str]) -> Tuple[List[Optional[List[float]]], List[int]]:
+        """Return cached embeddings (None for misses) and the indices that still need embedding."""
+        if self.cache is None:
+            return [None] * len(texts), list(range(len(texts)))
+        cached = self.cache.get_many(self.model_name, self.dimensions, texts)
+        return cached, [i for i, embedding in enumerate(cached) if embedding is None]
+
+    def _fill_misses(
+        self,
+        texts: List[str],
+        cached: List[Optional[List[float]]],
+        missing: List[int],
+        fresh: List[List[float]]
+    ) -> List[List[float]]:
+        """Merge freshly generated embeddings into the cached results and store them."""
+        if self.cache is None:
+            return fresh
+        if fresh:
+            self.cache.put_many(self.model_name, self.dimensions, [texts[i] for i in missing], fresh)
+        for i, embedding in zip(missing, fresh):
+            cached[i] = embedding
+        return cached  # type: ignore[return-value]
+
+    def _deduplicate(self, texts: List[str]) -> Tuple[List[str], Optional[List[int]]]:
+        """Collapse duplicate texts in a call and record how many API inputs that saved."""
+        unique, positions = deduplicate(texts)
+        saved = len(texts) - len(unique)
+        with self._dedup_lock:
+            self.dedup_inputs += len(texts)
+            self.dedup_saved += saved
+        if saved:
+            logger.info(f"Deduplicated {saved} of {len(texts)} texts before embedding")
+        return unique, positions
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed each distinct text once and scatter the vectors back to every position."""
+        unique, positions = self._deduplicate(texts)
+        embeddings = self._embed_unique(unique)
+        if positions is None:
+            return embeddings
+        return [embeddings[i] for i in positions]
+
+    def _embed_unique(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, serving what we can from the cache and sending only misses to the API."""
+        cached, missing = self._lookup_cache(texts)
+        fresh = self._create_embeddings([texts[i] for i in missing]) if missing else []
+        return self._fill_misses(texts, cached, missing, fresh)
+
+    def _embed_array(self, texts: List[str]) -> np.ndarray:
+        """Array counterpart of _embed."""
+        unique, positions = self._deduplicate(texts)
+        matrix = self._embed_unique_array(unique)
+        if positions is None:
+            return matrix
+        return matrix[positions]
+
+    def _embed_unique_array(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix, serving cached rows straight from their stored bytes."""
+        if self.cache is None:
+            return self._create_embeddings_array(texts)
+
+        cached = self.cache.get_many_raw(self.model_name, self.dimensions, texts)
+        missing = [i for i, blob in enumerate(cached) if blob is None]
+        if len(missing) == len(texts):
+            fresh = self._create_embeddings_array(texts)
+            self.cache.put_many(self.model_name, self.dimensions, texts, fresh)
+            return fresh
+
+        dim = len(next(blob for blob in cached if blob is not None)) // 4
+        matrix = np.empty((len(texts), dim), dtype=np.float32)
+        for i, blob in enumerate(cached):
+            if blob is not None:
+                matrix[i] = np.frombuffer(blob, dtype=np.float32)
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fresh = self._create_embeddings_array(missing_texts)
+            self.cache.put_many(self.model_name, self.dimensions, missing_texts, fresh)
+            matrix[missing] = fresh
+        return matrix
+
+    async def _aembed(self, texts: List[str]) -> List[List[float]]:
+        """Async counterpart of _embed."""
+        unique, positions = self._deduplicate(texts)
+        embeddings = await self._aembed_unique(unique)
+        if positions is None:
+            return embeddings
+        return [embeddings[i] for i in positions]
+
+    async def _aembed_unique(self, texts: List[str]) -> List[List[float]]:
+        """Async counterpart of _embed_unique; SQLite cache I/O runs off the event loop."""
+        cached, missing = await asyncio.to_thread(self._lookup_cache, texts)
+        fresh = await self._acreate_embeddings([texts[i] for i in missing]) if missing else []
+        return await asyncio.to_thread(self._fill_misses, texts, cached, missing, fresh)
 
     def __call__(self, input: Union[str, List[str]]) -> List[List[float]]:
         """Generate embeddings for input text(s)."""
@@ -13,12 +260,8 @@ class OpenAIEmbeddings:
             if isinstance(input, str):
                 input = [input]
             input = [str(text) for text in input]
-            
-            response = self.client.embeddings.create(
-                model=self.model_name,
-                input=input
-            )
-            return [data.embedding for data in response.data]
+
+            return self._embed(input)
         except Exception as e:
             raise Exception(f"Failed to generate embeddings: {str(e)}")
 
@@ -27,11 +270,7 @@ class OpenAIEmbeddings:
         try:
             texts = [str(text) for text in texts]
 
-            response = self.client.embeddings.create(
-                model=self.model_name,
-                input=texts
-            )
-            return [data.embedding for data in response.data]
+            return self._embed(texts)
         except Exception as e:
             raise Exception(f"Failed to generate embeddings: {str(e)}")
 
@@ -40,10 +279,57 @@ class OpenAIEmbeddings:
         try:
             text = str(text)
 
-            response = self.client.embeddings.create(
-                model=self.model_name,
-                input=[text]
-            )
-            return response.data[0].embedding
+            return self._embed([text])[0]
+        except Exception as e:
+            raise Exception(f"Failed to generate query embedding: {str(e)}")
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for a list of texts as a contiguous (n, dim) float32 matrix."""
+        try:
+            texts = [str(text) for text in texts]
+            if not texts:
+                return np.empty((0, self.dimensions or 0), dtype=np.float32)
+
+            return self._embed_array(texts)
+        except Exception as e:
+            raise Exception(f"Failed to generate embeddings: {str(e)}")
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text query as a 1-D float32 array."""
+        try:
+            text = str(text)
+
+            return self._embed_array([text])[0]
         except Exception as e:
             raise Exception(f"Failed to generate query embedding: {str(e)}")
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronously generate embeddings for a list of texts."""
+        try:
+            texts = [str(text) for text in texts]
+
+            return await self._aembed(texts)
+        except Exception as e:
+            raise Exception(f"Failed to generate embeddings: {str(e)}")
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Asynchronously generate embedding for a single text query."""
+        try:
+            text = str(text)
+
+            return (await self._aembed([text]))[0]
+        except Exception as e:
+            raise Exception(f"Failed to generate query embedding: {str(e)}")
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return embedding cache counters, or an empty dict when caching is disabled."""
+        return self.cache.get_stats() if self.cache is not None else {}
+
+    def get_dedup_stats(self) -> Dict[str, int]:
+        """Return how many texts were submitted and how many API inputs deduplication saved."""
+        with self._dedup_lock:
+            return {"inputs": self.dedup_inputs, "saved": self.dedup_saved}
+
+    def get_retry_stats(self) -> Dict[str, Any]:
+        """Return retry counts, time spent backing off and number of batch splits."""
+        return self.retry_stats.as_dict()
@@ -0,0 +1,169 @@
+import asyncio
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Coalescers with a running worker, so shutdown code can stop them all
+_running: "weakref.WeakSet[QueryCoalescer]" = weakref.WeakSet()
+
+
+class QueryCoalescer:
+    """Micro-batches concurrent query embeddings into single API calls.
+
+    Callers of ``embed_query`` (from any thread, or ``aembed_query`` from a
+    coroutine) are queued; a background worker waits up to ``window_ms`` after
+    the first request for more to arrive, embeds up to ``max_batch_size``
+    texts at once through the wrapped embeddings' document path, and hands
+    each caller its own vector. Everything else is delegated to the wrapped
+    embedding function unchanged.
+    """
+
+    def __init__(self, embeddings: Any, window_ms: float = 5.0, max_batch_size: int = 64, max_workers: int = 4):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+        self._embeddings = embeddings
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.max_workers = max_workers
+        self.requests = 0
+        self.batches = 0
+        # Each worker has its own queue, so close() stops exactly the worker it took;
+        # None is the stop signal it sends
+        self._queue: "Optional[queue.Queue[Optional[Tuple[str, Future]]]]" = None
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes not found on the coalescer itself
+        if name == "_embeddings":
+            raise AttributeError(name)
+        return getattr(self._embeddings, name)
+
+    def __call__(self, input: Any) -> Any:
+        return self._embeddings(input)
+
+    @property
+    def wrapped(self) -> Any:
+        """The underlying embedding function."""
+        return self._embeddings
+
+    def with_dimensions(self, dimensions: Optional[int]) -> "QueryCoalescer":
+        """Return a coalescer over the wrapped embeddings resized to ``dimensions``."""
+        resized = self._embeddings.with_dimensions(dimensions)
+        if resized is self._embeddings:
+            return self
+        return QueryCoalescer(resized, self.window_ms, self.max_batch_size, self.max_workers)
+
+    def _ensure_worker(self) -> "queue.Queue[Optional[Tuple[str, Future]]]":
+        """Return the running worker's queue, starting a worker first if needed; call with ``_lock`` held."""
+        if self._queue is None or self._worker is None or not self._worker.is_alive():
+            self._queue = queue.Queue()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            self._worker = threading.Thread(
+                target=self._run, args=(self._queue, self._executor), name="query-coalescer", daemon=True
+            )
+            self._worker.start()
+            _running.add(self)
+        return self._queue
+
+    def close(self) -> None:
+        """Stop the worker after it dispatches already queued requests, and wait for in-flight batches.
+
+        The coalescer stays usable: a later query starts a new worker.
+        """
+        with self._lock:
+            worker, executor, requests = self._worker, self._executor, self._queue
+            self._worker = self._executor = self._queue = None
+            _running.discard(self)
+            # Queued under the lock, so the sentinel follows every request submitted to this worker
+            if requests is not None:
+                requests.put(None)
+        if worker is None:
+            return
+        worker.join()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _submit(self, text: str) -> Future:
+        future: Future = Future()
+        with self._lock:
+            self.requests += 1
+            self._ensure_worker().put((str(text), future))
+        return future
+
+    def _run(
+        self, requests: "queue.Queue[Optional[Tuple[str, Future]]]", executor: ThreadPoolExecutor
+    ) -> None:
+        """Collect queued requests into batches and dispatch them until close() is called."""
+        stopping = False
+        while not stopping:
+            first = requests.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.window_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            with self._lock:
+                self.batches += 1
+            executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[Tuple[str, Future]]) -> None:
+        """Embed a batch in one call and resolve each caller's future."""
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            if getattr(self._embeddings, "supports_numpy_embeddings", False) is True:
+                vectors: Any = self._embeddings.embed_documents_array(texts)
+            else:
+                vectors = self._embeddings.embed_documents(texts)
+            by_text = dict(zip(texts, vectors))
+            for text, future in batch:
+                future.set_result(by_text[text])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, sharing an API call with other concurrent queries."""
+        vector = self._submit(text).result()
+        return vector.tolist() if isinstance(vector, np.ndarray) else list(vector)
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        """Like embed_query, returning a float32 array."""
+        return np.asarray(self._submit(text).result(), dtype=np.float32)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Await a coalesced query embedding without blocking the event loop."""
+        vector = await asyncio.wrap_future(self._submit(text))
+        return vector.tolist() if isinstance(vector, np.ndarray) else list(vector)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return how many query requests were coalesced into how many API batches."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "average_batch_size": self.requests / self.batches if self.batches else 0.0,
+            }
+
+
+def close_query_coalescers() -> None:
+    """Stop the worker threads of every running coalescer, e.g. on application shutdown."""
+    for coalescer in list(_running):
+        coalescer.close()
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+from src.config.settings import EMBEDDING_REQUESTS_PER_MINUTE, EMBEDDING_TOKENS_PER_MINUTE
+
+
+class RateLimiter:
+    """Token-bucket limiter tracking both requests-per-minute and tokens-per-minute.
+
+    Each bucket holds up to one minute of quota and refills continuously. A
+    single instance can be shared by sync callers (``acquire_blocking``) and
+    coroutines on any event loop (``acquire``), so concurrent ingests and
+    queries draw from the same quota.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        if requests_per_minute <= 0 or tokens_per_minute <= 0:
+            raise ValueError("Rate limits must be positive")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_capacity = float(requests_per_minute)
+        self._token_capacity = float(tokens_per_minute)
+        self._request_rate = requests_per_minute / 60.0
+        self._token_rate = tokens_per_minute / 60.0
+        self._available_requests = self._request_capacity
+        self._available_tokens = self._token_capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self.total_wait_seconds = 0.0
+
+    def _refill(self) -> None:
+        """Top up both buckets for the time elapsed since the last refill. Caller holds the lock."""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._available_requests = min(
+            self._request_capacity, self._available_requests + elapsed * self._request_rate
+        )
+        self._available_tokens = min(self._token_capacity, self._available_tokens + elapsed * self._token_rate)
+
+    def try_acquire(self, tokens: int) -> float:
+        """Consume one request and ``tokens`` tokens if available.
+
+        Returns 0.0 on success, otherwise the number of seconds to wait before
+        the quota is expected to be available. Requests larger than the
+        per-minute token budget are clamped so they can eventually proceed.
+        """
+        needed = min(float(tokens), self._token_capacity)
+        with self._lock:
+            self._refill()
+            if self._available_requests >= 1 and self._available_tokens >= needed:
+                self._available_requests -= 1
+                self._available_tokens -= needed
+                return 0.0
+            request_wait = max(0.0, (1 - self._available_requests) / self._request_rate)
+            token_wait = max(0.0, (needed - self._available_tokens) / self._token_rate)
+            return max(request_wait, token_wait)
+
+    def _record_wait(self, wait: float) -> None:
+        with self._lock:
+            self.total_wait_seconds += wait
+
+    def acquire_blocking(self, tokens: int) -> None:
+        """Block the current thread until the request fits in the quota."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            self._record_wait(wait)
+            time.sleep(wait)
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait without blocking the event loop until the request fits in the quota."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            self._record_wait(wait)
+            await asyncio.sleep(wait)
+
+
+_shared_limiters: Dict[str, RateLimiter] = {}
+_shared_limiters_lock = threading.Lock()
+
+
+def get_shared_rate_limiter(
+    key: str,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+) -> RateLimiter:
+    """Return the process-wide limiter for ``key`` (usually a model name), creating it on first use."""
+    with _shared_limiters_lock:
+        limiter = _shared_limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(
+                requests_per_minute or EMBEDDING_REQUESTS_PER_MINUTE,
+                tokens_per_minute or EMBEDDING_TOKENS_PER_MINUTE,
+            )
+            _shared_limiters[key] = limiter
+        return limiter
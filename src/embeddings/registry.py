@@ -0,0 +1,73 @@
+import os
+from typing import Any, Callable, Dict, List, Optional
+from src.config.settings import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_DIMENSIONS,
+    QUERY_COALESCE_MAX_BATCH_SIZE,
+    QUERY_COALESCE_WINDOW_MS,
+)
+from src.embeddings.embedding_cache import EmbeddingCache
+from src.embeddings.local_embeddings import HashingEmbeddings
+from src.embeddings.openai_embeddings import OpenAIEmbeddings
+from src.embeddings.query_coalescer import QueryCoalescer
+
+EmbeddingFactory = Callable[..., Any]
+
+_backends: Dict[str, EmbeddingFactory] = {}
+
+
+def register_embedding_backend(name: str, factory: EmbeddingFactory) -> None:
+    """Register a factory that builds an embedding function for ``name``.
+
+    Factories receive keyword options such as ``cache_directory`` and should
+    ignore the ones they do not use.
+    """
+    _backends[name.lower()] = factory
+
+
+def get_embedding_backends() -> List[str]:
+    """Return the names of all registered embedding backends."""
+    return sorted(_backends)
+
+
+def create_embedding_function(backend: Optional[str] = None, **options: Any) -> Any:
+    """Build the embedding function for ``backend`` (defaults to the EMBEDDING_BACKEND setting)."""
+    name = (backend or EMBEDDING_BACKEND).lower()
+    factory = _backends.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown embedding backend: {name}. Available: {', '.join(get_embedding_backends())}")
+    return factory(**options)
+
+
+def _create_openai_embeddings(cache_directory: Optional[str] = None, **_: Any) -> Any:
+    """OpenAI embeddings with the on-disk cache and query coalescing enabled per settings."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+
+    cache = None
+    if EMBEDDING_CACHE_ENABLED:
+        path = EMBEDDING_CACHE_PATH or os.path.join(cache_directory or os.getcwd(), "embedding_cache.sqlite3")
+        cache = EmbeddingCache(path, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+
+    embeddings = OpenAIEmbeddings(api_key=api_key, model_name=EMBEDDING_MODEL, cache=cache)
+    if QUERY_COALESCE_WINDOW_MS <= 0:
+        return embeddings
+    return QueryCoalescer(
+        embeddings,
+        window_ms=QUERY_COALESCE_WINDOW_MS,
+        max_batch_size=QUERY_COALESCE_MAX_BATCH_SIZE
+    )
+
+
+def _create_hashing_embeddings(**_: Any) -> Any:
+    """Offline feature-hashing embeddings."""
+    return HashingEmbeddings(dimensions=LOCAL_EMBEDDING_DIMENSIONS)
+
+
+register_embedding_backend("openai", _create_openai_embeddings)
+register_embedding_backend("hashing", _create_hashing_embeddings)
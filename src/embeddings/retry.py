@@ -0,0 +1,155 @@
+import asyncio
+import operator
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import openai
+
+# Phrases OpenAI uses when a request carries too many inputs or tokens
+_PAYLOAD_TOO_LARGE_MARKERS = (
+    "maximum context length",
+    "too many tokens",
+    "too many inputs",
+    "max_tokens_per_request",
+    "maximum request size",
+)
+
+
+class RetryPolicy:
+    """Jittered exponential backoff settings for embedding requests."""
+
+    def __init__(self, max_retries: int = 6, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Return how long to wait before retry number ``attempt`` (0-based).
+
+        A server-provided Retry-After always wins; otherwise use full jitter over
+        an exponentially growing window capped at ``max_delay``.
+        """
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))  # nosec B311
+
+
+class RetryStats:
+    """Thread-safe counters describing retry behaviour."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.batch_splits = 0
+
+    def record_retry(self, delay: float) -> None:
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += delay
+
+    def record_split(self) -> None:
+        with self._lock:
+            self.batch_splits += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "backoff_seconds": self.backoff_seconds,
+                "batch_splits": self.batch_splits,
+            }
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is transient: rate limits, server errors, timeouts and dropped connections."""
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def is_payload_too_large(error: Exception) -> bool:
+    """Whether an error means the batch itself is too big and should be split."""
+    if not isinstance(error, openai.APIStatusError):
+        return False
+    if error.status_code == 413:
+        return True
+    message = str(error).lower()
+    return error.status_code == 400 and any(marker in message for marker in _PAYLOAD_TOO_LARGE_MARKERS)
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Read the server's Retry-After hint (in seconds) from an API error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def call_with_retry(
+    request: Callable[[List[str]], Any],
+    texts: List[str],
+    policy: RetryPolicy,
+    stats: RetryStats,
+    combine: Callable[[Any, Any], Any] = operator.add,
+) -> Any:
+    """Run ``request(texts)``, retrying transient failures and bisecting oversized batches.
+
+    ``combine`` joins the results of the two halves of a split batch.
+    """
+    attempt = 0
+    while True:
+        try:
+            return request(texts)
+        except Exception as e:
+            if is_payload_too_large(e) and len(texts) > 1:
+                stats.record_split()
+                middle = len(texts) // 2
+                return combine(
+                    call_with_retry(request, texts[:middle], policy, stats, combine),
+                    call_with_retry(request, texts[middle:], policy, stats, combine),
+                )
+            if not is_retryable(e) or attempt >= policy.max_retries:
+                raise
+            delay = policy.compute_delay(attempt, get_retry_after(e))
+            stats.record_retry(delay)
+            time.sleep(delay)
+            attempt += 1
+
+
+async def acall_with_retry(
+    request: Callable[[List[str]], Awaitable[Any]],
+    texts: List[str],
+    policy: RetryPolicy,
+    stats: RetryStats,
+    combine: Callable[[Any, Any], Any] = operator.add,
+) -> Any:
+    """Async counterpart of call_with_retry."""
+    attempt = 0
+    while True:
+        try:
+            return await request(texts)
+        except Exception as e:
+            if is_payload_too_large(e) and len(texts) > 1:
+                stats.record_split()
+                middle = len(texts) // 2
+                first = await acall_with_retry(request, texts[:middle], policy, stats, combine)
+                second = await acall_with_retry(request, texts[middle:], policy, stats, combine)
+                return combine(first, second)
+            if not is_retryable(e) or attempt >= policy.max_retries:
+                raise
+            delay = policy.compute_delay(attempt, get_retry_after(e))
+            stats.record_retry(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
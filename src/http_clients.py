@@ -0,0 +1,125 @@
+import threading
+from typing import Any, Dict, Optional
+import httpx
+from src.config.settings import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_TIMEOUT,
+)
+
+
+class ConnectionStats:
+    """Counts requests and newly opened connections to measure keep-alive reuse."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.new_connections += 1
+
+    def trace(self, event: str, info: Dict[str, Any]) -> None:
+        """httpcore trace callback; a completed TCP connect means the pool had nothing to reuse."""
+        if event == "connection.connect_tcp.complete":
+            self.record_connection()
+
+    async def atrace(self, event: str, info: Dict[str, Any]) -> None:
+        self.trace(event, info)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+
+_stats = ConnectionStats()
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def _on_request(request: httpx.Request) -> None:
+    _stats.record_request()
+    request.extensions["trace"] = _stats.trace
+
+
+async def _on_async_request(request: httpx.Request) -> None:
+    _stats.record_request()
+    request.extensions["trace"] = _stats.atrace
+
+
+def create_http_client(**kwargs: Any) -> httpx.Client:
+    """Create a keep-alive HTTP client with the shared pool limits, timeouts and connection counters.
+
+    For services that need their own client (e.g. per-client auth headers)
+    rather than the process-wide one.
+    """
+    return httpx.Client(
+        limits=_limits(),
+        timeout=_timeout(),
+        event_hooks={"request": [_on_request]},
+        **kwargs
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide keep-alive HTTP client shared by all API clients."""
+    global _http_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = create_http_client()
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the process-wide async keep-alive HTTP client shared by all API clients."""
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None or _async_http_client.is_closed:
+            _async_http_client = httpx.AsyncClient(
+                limits=_limits(),
+                timeout=_timeout(),
+                event_hooks={"request": [_on_async_request]},
+            )
+        return _async_http_client
+
+
+def get_connection_stats() -> Dict[str, Any]:
+    """Return request and connection counters for the shared clients."""
+    return _stats.as_dict()
+
+
+def close_http_clients() -> None:
+    """Close the shared clients; the next get_* call creates fresh ones."""
+    global _http_client, _async_http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+        # The async client is dropped rather than awaited so this can be called from sync shutdown code
+        _async_http_client = None
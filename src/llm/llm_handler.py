@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 import os
 from typing import Optional
 from pydantic import SecretStr
+from src.http_clients import get_async_http_client, get_http_client
+from src.llm.llm_cache import get_llm_cache
 
 # Load environment variables
 load_dotenv()
@@ -13,7 +15,13 @@ class LLMHandler:
     def __init__(self):
         api_key: Optional[str] = os.getenv("OPENAI_API_KEY")
         secret_key: Optional[SecretStr] = SecretStr(api_key) if api_key else None
-        self.llm = ChatOpenAI(temperature=0.0, api_key=secret_key.get_secret_value() if secret_key else None)
+        self.llm = ChatOpenAI(
+            temperature=0.0,
+            api_key=secret_key.get_secret_value() if secret_key else None,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            cache=get_llm_cache()
+        )
 
     def get_rag_prompt(self) -> PromptTemplate:
         template = """Use the following pieces of context to answer the question at the end.
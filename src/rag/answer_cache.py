@@ -0,0 +1,194 @@
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+# Rows allocated when a table is created; tables double up to max_entries
+_INITIAL_CAPACITY = 64
+
+
+class _AnswerTable:
+    """Cached answers of one (space, retrieval options) scope, with their query vectors in one matrix."""
+
+    def __init__(self, dimensions: int):
+        self.vectors = np.zeros((_INITIAL_CAPACITY, dimensions), dtype=np.float32)
+        self.live = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+        self.last_used = np.zeros(_INITIAL_CAPACITY, dtype=np.float64)
+        self.created = np.zeros(_INITIAL_CAPACITY, dtype=np.float64)
+        self.answers: List[Any] = [None] * _INITIAL_CAPACITY
+        self.sources: List[Set[str]] = [set() for _ in range(_INITIAL_CAPACITY)]
+        self.by_chunk: Dict[str, Set[int]] = {}
+        self.count = 0
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+
+    def drop(self, row: int) -> None:
+        self.live[row] = False
+        self.answers[row] = None
+        for chunk_id in self.sources[row]:
+            rows = self.by_chunk.get(chunk_id)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self.by_chunk[chunk_id]
+        self.sources[row] = set()
+
+    def free_row(self, max_entries: int) -> Tuple[int, bool]:
+        """Return a row to write into and whether a live entry had to be evicted for it."""
+        dead = np.flatnonzero(~self.live[:self.count])
+        if len(dead):
+            return int(dead[0]), False
+        if self.count < max_entries:
+            if self.count == len(self.live):
+                self._grow(min(2 * self.count, max_entries))
+            self.count += 1
+            return self.count - 1, False
+        row = int(np.argmin(self.last_used[:self.count]))
+        self.drop(row)
+        return row, True
+
+    def _grow(self, capacity: int) -> None:
+        extra = capacity - len(self.live)
+        self.vectors = np.vstack([self.vectors, np.zeros((extra, self.dimensions), dtype=np.float32)])
+        self.live = np.concatenate([self.live, np.zeros(extra, dtype=bool)])
+        self.last_used = np.concatenate([self.last_used, np.zeros(extra, dtype=np.float64)])
+        self.created = np.concatenate([self.created, np.zeros(extra, dtype=np.float64)])
+        self.answers.extend([None] * extra)
+        self.sources.extend(set() for _ in range(extra))
+
+
+class SemanticAnswerCache:
+    """Per-space cache returning a stored answer for queries that paraphrase an earlier one.
+
+    Each entry holds a normalised query embedding, the answer and the IDs of
+    the chunks it was generated from. A lookup scores the query against every
+    cached embedding of the space with one matrix-vector product and returns
+    the best answer if its cosine similarity reaches ``threshold``. Entries
+    are scoped by retrieval options (``k``, filters, search mode), evicted
+    least recently used beyond ``max_entries`` per scope, and dropped as soon
+    as any of their source chunks is removed from the space.
+
+    The cache lives in one process and only hears about writes made through
+    that process's store. Entries older than ``ttl_seconds`` are treated as
+    misses, which bounds how long another worker's ingest can go unnoticed.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: Optional[float] = None):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds or None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self._tables: Dict[Tuple[str, str], _AnswerTable] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, space_name: str, scope: str, embedding: Any) -> Optional[Any]:
+        """Return the cached answer for the most similar earlier query, or None."""
+        query = self._normalise(embedding)
+        with self._lock:
+            table = self._tables.get((space_name, scope))
+            if table is not None and self.ttl_seconds:
+                self._expire(table)
+            if table is None or table.dimensions != len(query) or not table.live[:table.count].any():
+                self.misses += 1
+                return None
+            scores = table.vectors[:table.count] @ query
+            scores[~table.live[:table.count]] = -np.inf
+            row = int(np.argmax(scores))
+            if scores[row] < self.threshold:
+                self.misses += 1
+                return None
+            table.last_used[row] = time.monotonic()
+            self.hits += 1
+            return table.answers[row]
+
+    def _expire(self, table: _AnswerTable) -> None:
+        """Drop a table's entries older than the TTL. Caller holds the lock."""
+        assert self.ttl_seconds is not None
+        cutoff = time.monotonic() - self.ttl_seconds
+        rows = np.flatnonzero(table.live[:table.count] & (table.created[:table.count] < cutoff))
+        for row in rows:
+            table.drop(int(row))
+        self.expirations += len(rows)
+
+    def store(self, space_name: str, scope: str, embedding: Any, answer: Any, source_ids: Iterable[str]) -> None:
+        """Cache an answer together with the chunk IDs it was generated from."""
+        query = self._normalise(embedding)
+        with self._lock:
+            key = (space_name, scope)
+            table = self._tables.get(key)
+            if table is None or table.dimensions != len(query):
+                # A reconfigured space embeds with a different size; older entries cannot match
+                table = self._tables[key] = _AnswerTable(len(query))
+            row, evicted = table.free_row(self.max_entries)
+            if evicted:
+                self.evictions += 1
+            table.vectors[row] = query
+            table.live[row] = True
+            table.last_used[row] = table.created[row] = time.monotonic()
+            table.answers[row] = answer
+            table.sources[row] = set(source_ids)
+            for chunk_id in table.sources[row]:
+                table.by_chunk.setdefault(chunk_id, set()).add(row)
+
+    def invalidate_chunks(self, space_name: str, chunk_ids: Iterable[str]) -> None:
+        """Drop every entry of a space generated from any of the given chunks."""
+        chunk_ids = list(chunk_ids)
+        with self._lock:
+            for (name, _), table in self._tables.items():
+                if name != space_name:
+                    continue
+                rows = set().union(*(table.by_chunk.get(chunk_id, set()) for chunk_id in chunk_ids))
+                for row in rows:
+                    table.drop(row)
+                self.invalidations += len(rows)
+
+    def invalidate_unsourced(self, space_name: str) -> None:
+        """Drop a space's entries that cite no chunks (e.g. "I don't know" answers).
+
+        New chunks may answer them now.
+        """
+        with self._lock:
+            for (name, _), table in self._tables.items():
+                if name != space_name:
+                    continue
+                rows = [row for row in np.flatnonzero(table.live[:table.count]) if not table.sources[row]]
+                for row in rows:
+                    table.drop(int(row))
+                self.invalidations += len(rows)
+
+    def invalidate_space(self, space_name: str) -> None:
+        """Drop every entry of a space."""
+        with self._lock:
+            for key in [key for key in self._tables if key[0] == space_name]:
+                table = self._tables.pop(key)
+                self.invalidations += int(table.live[:table.count].sum())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the number of cached answers."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+                "size": sum(int(table.live[:table.count].sum()) for table in self._tables.values()),
+            }
@@ -0,0 +1,150 @@
+import re
+from functools import lru_cache
+from typing import Any, List, Optional, Set
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.config.settings import CONTEXT_TOKEN_BUDGET, CONTEXT_TOKEN_BUDGETS
+from src.embeddings.batching import estimate_tokens
+from src.vector_store.base import BaseVectorStore
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None  # type: ignore[assignment]
+
+# Metadata key holding the stored chunk's ID when the packer truncated its text
+CHUNK_ID_KEY = "chunk_id"
+
+# Words per shingle when comparing chunks for near-duplicate text
+_SHINGLE_SIZE = 3
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: Optional[str]) -> Any:
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+    except KeyError:
+        # Models tiktoken does not know use the default encoding
+        return _get_encoding(None)
+    except Exception:
+        # Encodings are downloaded on first use; count approximately when offline
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count the tokens of a text with the model's tokenizer, or estimate them without tiktoken."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Cut a text down to at most ``max_tokens`` tokens."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[:max(max_tokens - 1, 0) * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def get_context_token_budget(model: Optional[str]) -> int:
+    """Return the context token budget configured for a model, or the default budget."""
+    return int(CONTEXT_TOKEN_BUDGETS.get(model or "", CONTEXT_TOKEN_BUDGET))
+
+
+def _shingles(text: str) -> Set[tuple]:
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < _SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + _SHINGLE_SIZE]) for i in range(len(words) - _SHINGLE_SIZE + 1)}
+
+
+class ContextPacker:
+    """Assemble retrieved chunks into the context of a "stuff" prompt within a token budget.
+
+    Chunks are taken in retrieval order, i.e. best score first. A chunk is
+    skipped when its normalised text repeats an earlier one, or when at least
+    ``near_duplicate_threshold`` of the shorter chunk's word shingles also
+    occur in an earlier chunk (overlapping splits, the same page ingested
+    from two sources). The rest are added until ``k`` chunks or
+    ``token_budget`` tokens are reached; a chunk that does not fit is skipped
+    in favour of shorter lower-ranked ones, and the best chunk is truncated
+    rather than dropped if it alone exceeds the budget. A truncated chunk
+    keeps its stored ID under ``CHUNK_ID_KEY`` in its metadata.
+    """
+
+    def __init__(self, token_budget: int, model: Optional[str] = None, near_duplicate_threshold: float = 0.8):
+        if token_budget <= 0:
+            raise ValueError("token_budget must be positive")
+        if not 0.0 < near_duplicate_threshold <= 1.0:
+            raise ValueError("near_duplicate_threshold must be in (0, 1]")
+        self.token_budget = token_budget
+        self.model = model
+        self.near_duplicate_threshold = near_duplicate_threshold
+
+    def _is_near_duplicate(self, shingles: Set[tuple], kept: List[Set[tuple]]) -> bool:
+        for other in kept:
+            smaller = min(len(shingles), len(other))
+            if smaller and len(shingles & other) / smaller >= self.near_duplicate_threshold:
+                return True
+        return False
+
+    def pack(self, documents: List[Document], k: Optional[int] = None) -> List[Document]:
+        """Return the deduplicated documents that fit the budget, best first."""
+        packed: List[Document] = []
+        seen_texts: Set[str] = set()
+        kept_shingles: List[Set[tuple]] = []
+        used_tokens = 0
+        for doc in documents:
+            if k is not None and len(packed) >= k:
+                break
+            normalised = " ".join(doc.page_content.lower().split())
+            if not normalised or normalised in seen_texts:
+                continue
+            shingles = _shingles(normalised)
+            if self._is_near_duplicate(shingles, kept_shingles):
+                continue
+            tokens = count_tokens(doc.page_content, self.model)
+            if used_tokens + tokens > self.token_budget:
+                if packed:
+                    continue
+                doc = Document(
+                    page_content=truncate_to_tokens(doc.page_content, self.token_budget, self.model),
+                    metadata={
+                        **doc.metadata,
+                        CHUNK_ID_KEY: BaseVectorStore.make_document_id(doc.page_content, doc.metadata)
+                    }
+                )
+                tokens = self.token_budget
+            seen_texts.add(normalised)
+            kept_shingles.append(shingles)
+            packed.append(doc)
+            used_tokens += tokens
+        return packed
+
+
+class PackedRetriever(BaseRetriever):
+    """Retriever that packs another retriever's results with a ``ContextPacker``.
+
+    The wrapped retriever should fetch more than ``k`` candidates so that
+    chunks dropped as duplicates leave room for the next best ones.
+    """
+
+    retriever: Any
+    packer: Any
+    k: int = 4
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self.packer.pack(documents, self.k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: Any) -> List[Document]:
+        documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return self.packer.pack(documents, self.k)
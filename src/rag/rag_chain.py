@@ -1,8 +1,30 @@
-from typing import Optional, Dict, Any, List
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Optional, Dict, Any, List, Tuple
 from langchain.chains import RetrievalQA
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
 from langchain_openai import ChatOpenAI
 from langchain_community.vectorstores import Chroma
+from chromadb.errors import NotFoundError
+from ..config.settings import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    CONTEXT_FETCH_MULTIPLIER,
+    CONTEXT_NEAR_DUPLICATE_THRESHOLD,
+    QA_CHAIN_CACHE_SIZE,
+    SEARCH_MODE,
+)
 from ..vector_store.chroma_store import ChromaStore
+from ..vector_store.lexical_index import validate_search_mode
+from .answer_cache import SemanticAnswerCache
+from .context_packer import CHUNK_ID_KEY, ContextPacker, PackedRetriever, get_context_token_budget
+from .retriever import StoreRetriever
+from ..http_clients import get_async_http_client, get_http_client
+from ..llm.llm_cache import get_llm_cache
 import os
 from dotenv import load_dotenv
 
@@ -16,65 +38,367 @@ class RAGChain:
             raise ValueError("OPENAI_API_KEY environment variable is not set")
         
         # Initialize ChromaStore with environment variables
-        self.vector_store = ChromaStore(
-            host=os.getenv("CHROMA_HOST", "localhost"),
-            port=int(os.getenv("CHROMA_PORT", "8001")),
-            collection_name="default",
-            persist_directory="./chroma_db"
-        )
+        self.vector_store = ChromaStore.from_env()
         
         self.llm = ChatOpenAI(
             temperature=0.0,
-            api_key=openai_api_key
+            api_key=openai_api_key,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            cache=get_llm_cache()
+        )
+        # Retrieved chunks are deduplicated and packed into the model's context token budget
+        model_name = getattr(self.llm, "model_name", None)
+        model_name = model_name if isinstance(model_name, str) else None
+        self.context_packer = ContextPacker(
+            get_context_token_budget(model_name),
+            model=model_name,
+            near_duplicate_threshold=CONTEXT_NEAR_DUPLICATE_THRESHOLD
+        )
+        # Warm QA chains keyed by (space, search mode, k), least recently used first
+        self._qa_chains: "OrderedDict[Tuple[str, str, int], Any]" = OrderedDict()
+        self._qa_chain_cache_size = QA_CHAIN_CACHE_SIZE
+        self._qa_chain_hits = 0
+        self._qa_chain_misses = 0
+        # Bumped when a space is written or deleted so chains built meanwhile are not cached
+        self._space_generations: Dict[str, int] = {}
+        self._build_locks: Dict[Tuple[str, str, int], threading.Lock] = {}
+        self._chain_lock = threading.Lock()
+        # Answers of earlier near-identical queries, dropped when their source chunks are removed
+        self.answer_cache: Optional[SemanticAnswerCache] = None
+        if ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(
+                ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS
+            )
+            self.vector_store.add_removal_listener(self.answer_cache.invalidate_chunks)
+        # LangChain wrappers keyed by collection name, with the store handle they were built for
+        self._vectorstores: Dict[str, Tuple[Any, Any]] = {}
+
+    def _get_vectorstore(self, collection_name: str) -> Any:
+        """Return a LangChain Chroma wrapper, rebuilding it only when the store's handle changed."""
+        handle = self.vector_store.get_collection(collection_name, create=True)
+        cached = self._vectorstores.get(collection_name)
+        if cached is not None and cached[0] is handle:
+            return cached[1]
+        vectorstore = Chroma(
+            client=self.vector_store._chroma_client,
+            collection_name=collection_name,
+            embedding_function=self.vector_store.get_embedding_function(collection_name)
         )
-        self.qa_chain: Optional[Any] = None
+        self._vectorstores[collection_name] = (handle, vectorstore)
+        return vectorstore
 
-    def initialize_chain(self, collection_name: str) -> None:
-        """Initialize the QA chain for a specific collection."""
-        try:
-            # Create a Chroma vectorstore using the existing collection
-            vectorstore = Chroma(
-                client=self.vector_store._chroma_client,
+    def _get_retriever(
+        self, collection_name: str, search_kwargs: Optional[Dict[str, Any]] = None, store_search: bool = False
+    ) -> Any:
+        """Return a retriever for a space, whichever backend stores it.
+
+        ``store_search`` always searches through the store, whose async path
+        embeds the query with the async embeddings client.
+        """
+        hybrid = (search_kwargs or {}).get("search_mode") == "hybrid"
+        if store_search or hybrid or self.vector_store.is_flat_collection(collection_name):
+            return StoreRetriever(
+                store=self.vector_store,
                 collection_name=collection_name,
-                embedding_function=self.vector_store._embedding_function
-            )
-            
-            # Create a retriever from the vectorstore
-            retriever = vectorstore.as_retriever()
-            
-            # Initialize the QA chain
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=retriever
+                search_kwargs=search_kwargs or {}
             )
+        vectorstore = self._get_vectorstore(collection_name)
+        if search_kwargs:
+            return vectorstore.as_retriever(search_kwargs=search_kwargs)
+        return vectorstore.as_retriever()
+
+    def _get_context_retriever(
+        self, collection_name: str, search_kwargs: Optional[Dict[str, Any]] = None, store_search: bool = False
+    ) -> Any:
+        """Return a retriever yielding up to ``k`` deduplicated chunks that fit the context token budget."""
+        search_kwargs = dict(search_kwargs or {})
+        k = search_kwargs.get("k", 4)
+        search_kwargs["k"] = k * CONTEXT_FETCH_MULTIPLIER
+        return PackedRetriever(
+            retriever=self._get_retriever(collection_name, search_kwargs, store_search),
+            packer=self.context_packer,
+            k=k
+        )
+
+    def _build_chain(self, collection_name: str, search_kwargs: Optional[Dict[str, Any]] = None) -> Any:
+        """Build a QA chain over a space's packed retriever."""
+        return RetrievalQA.from_chain_type(
+            llm=self.llm,
+            chain_type="stuff",
+            retriever=self._get_context_retriever(collection_name, search_kwargs),
+            return_source_documents=True
+        )
+
+    def initialize_chain(self, collection_name: str, search_mode: str = "vector", k: int = 4) -> Any:
+        """Build the QA chain for a space and keep it warm in the chain pool."""
+        key = (collection_name, search_mode, k)
+        with self._chain_lock:
+            generation = self._space_generations.get(collection_name, 0)
+        search_kwargs: Dict[str, Any] = {"k": k}
+        if search_mode != "vector":
+            search_kwargs["search_mode"] = search_mode
+        try:
+            qa_chain = self._build_chain(collection_name, search_kwargs)
         except Exception as e:
             raise ValueError(f"Failed to initialize chain: {str(e)}")
 
-    def query(self, query: str, space_name: str, k: int = 4) -> List[Dict[str, Any]]:
-        """Query the vector store for similar documents and generate a response."""
+        with self._chain_lock:
+            # A write or delete during the build may have made this chain stale
+            if qa_chain is not None and self._space_generations.get(collection_name, 0) == generation:
+                self._qa_chains[key] = qa_chain
+                self._qa_chains.move_to_end(key)
+                while len(self._qa_chains) > self._qa_chain_cache_size:
+                    self._qa_chains.popitem(last=False)
+        return qa_chain
+
+    def get_chain(self, space_name: str, search_mode: str = "vector", k: int = 4) -> Any:
+        """Return the warm QA chain for a space, building it once on first use.
+
+        Concurrent requests for a space that is not warm yet wait for a single
+        build instead of each building their own chain.
+        """
+        key = (space_name, search_mode, k)
+        with self._chain_lock:
+            qa_chain = self._qa_chains.get(key)
+            if qa_chain is not None:
+                self._qa_chains.move_to_end(key)
+                self._qa_chain_hits += 1
+                return qa_chain
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._chain_lock:
+                qa_chain = self._qa_chains.get(key)
+                if qa_chain is not None:
+                    self._qa_chains.move_to_end(key)
+                    self._qa_chain_hits += 1
+                    return qa_chain
+                self._qa_chain_misses += 1
+            return self.initialize_chain(space_name, search_mode, k)
+
+    def invalidate_space(self, space_name: str) -> None:
+        """Drop a space's warm chains; the next query rebuilds them."""
+        with self._chain_lock:
+            self._space_generations[space_name] = self._space_generations.get(space_name, 0) + 1
+            for key in [key for key in self._qa_chains if key[0] == space_name]:
+                del self._qa_chains[key]
+
+    def query(
+        self,
+        query: str,
+        space_name: str,
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        search_mode: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Query the vector store for similar documents and generate a response.
+
+        ``where`` / ``where_document`` restrict retrieval to matching chunks and
+        are pushed down into the Chroma search. ``search_mode="hybrid"``
+        (default: the SEARCH_MODE setting) fuses BM25 and vector rankings.
+        At most ``k`` chunks reach the prompt, after duplicates are removed and
+        within the context token budget.
+
+        Answers are served from the semantic answer cache when an earlier query
+        with the same retrieval options was close enough in embedding space.
+        """
         try:
-            # Initialize the chain if not already initialized
-            if not self.qa_chain:
-                self.initialize_chain(space_name)
-            
-            # Generate response using the QA chain
-            if self.qa_chain is None:
-                raise ValueError("QA chain not initialized")
-            response = self.qa_chain.invoke({"query": query})
+            search_mode = validate_search_mode(search_mode or SEARCH_MODE)
+            if self.answer_cache is not None:
+                scope = json.dumps(
+                    {"k": k, "where": where, "where_document": where_document, "search_mode": search_mode},
+                    sort_keys=True
+                )
+                embedding = self.vector_store.get_embedding_function(space_name).embed_query(query)
+                cached = self.answer_cache.lookup(space_name, scope, embedding)
+                if cached is not None:
+                    return cached
+
+            try:
+                response = self._invoke_chain(query, space_name, k, where, where_document, search_mode)
+            except NotFoundError:
+                # Another client deleted and recreated the space: rebuild from a fresh handle once
+                self._refresh_space(space_name)
+                response = self._invoke_chain(query, space_name, k, where, where_document, search_mode)
             
             # Format the response
-            return [{
+            results = [{
                 "text": response["result"],
                 "metadata": {"source": "qa_chain"}
             }]
+            if self.answer_cache is not None:
+                source_ids = [
+                    doc.metadata.get(CHUNK_ID_KEY) or self.vector_store.make_document_id(doc.page_content, doc.metadata)
+                    for doc in response.get("source_documents") or []
+                ]
+                self.answer_cache.store(space_name, scope, embedding, results, source_ids)
+            return results
         except Exception as e:
             raise Exception(f"Failed to query: {str(e)}")
 
+    def _invoke_chain(
+        self,
+        query: str,
+        space_name: str,
+        k: int,
+        where: Optional[Dict[str, Any]],
+        where_document: Optional[Dict[str, Any]],
+        search_mode: str
+    ) -> Dict[str, Any]:
+        """Run a query through the space's warm chain, or a one-off chain when it is filtered."""
+        if where or where_document:
+            qa_chain: Optional[Any] = self._build_filtered_chain(space_name, where, where_document, search_mode, k)
+        else:
+            # Warm per-space chain, built on first use
+            qa_chain = self.get_chain(space_name, search_mode, k)
+
+        # Generate response using the QA chain
+        if qa_chain is None:
+            raise ValueError("QA chain not initialized")
+        return qa_chain.invoke({"query": query})
+
+    def _refresh_space(self, space_name: str) -> None:
+        """Drop every cached handle of a space so the next query refetches its collection."""
+        self.vector_store.refresh_collection(space_name)
+        self._vectorstores.pop(space_name, None)
+        self.invalidate_space(space_name)
+
+    async def astream_query(
+        self,
+        query: str,
+        space_name: str,
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        search_mode: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Answer a query as a stream of events so clients can render it incrementally.
+
+        Yields ``{"type": "sources", "sources": [...]}`` as soon as retrieval
+        finishes, then ``{"type": "token", "text": ...}`` for each LLM token as
+        it arrives and finally ``{"type": "done"}``. Retrieval options match
+        ``query``, and the answer uses the same "stuff" prompt as its QA chain.
+
+        An unknown space or search mode (or filter key of a flat space) raises
+        ValueError before the first event, so callers can reject the request
+        before streaming.
+        """
+        search_mode = validate_search_mode(search_mode or SEARCH_MODE)
+        await asyncio.to_thread(self._check_stream_query, space_name, where)
+        search_kwargs: Dict[str, Any] = {"k": k}
+        if where:
+            search_kwargs["filter"] = where
+        if where_document:
+            search_kwargs["where_document"] = where_document
+        if search_mode != "vector":
+            search_kwargs["search_mode"] = search_mode
+
+        retriever = self._get_context_retriever(space_name, search_kwargs, store_search=True)
+        documents = await retriever.ainvoke(query)
+        yield {
+            "type": "sources",
+            "sources": [{"text": doc.page_content, "metadata": doc.metadata} for doc in documents]
+        }
+
+        prompt = PROMPT_SELECTOR.get_prompt(self.llm).format_prompt(
+            context="\n\n".join(doc.page_content for doc in documents),
+            question=query
+        )
+        async for chunk in self.llm.astream(prompt.to_messages()):
+            if chunk.content:
+                yield {"type": "token", "text": chunk.content}
+        yield {"type": "done"}
+
+    def _check_stream_query(self, space_name: str, where: Optional[Dict[str, Any]]) -> None:
+        """Reject a streamed query for a missing space, and check its filter keys."""
+        if space_name not in self.vector_store.get_existing_collections():
+            raise ValueError(f"Space '{space_name}' does not exist")
+        self.vector_store.validate_filter(space_name, where)
+
+    def _build_filtered_chain(
+        self,
+        space_name: str,
+        where: Optional[Dict[str, Any]],
+        where_document: Optional[Dict[str, Any]],
+        search_mode: str = "vector",
+        k: int = 4
+    ) -> Any:
+        """Build a QA chain whose retriever applies metadata and document filters and the search mode."""
+        self.vector_store.validate_filter(space_name, where)
+        search_kwargs: Dict[str, Any] = {"k": k}
+        if search_mode != "vector":
+            search_kwargs["search_mode"] = search_mode
+        if where:
+            search_kwargs["filter"] = where
+        if where_document:
+            search_kwargs["where_document"] = where_document
+        return self._build_chain(space_name, search_kwargs)
+
+    def get_filterable_keys(self, space_name: str) -> List[str]:
+        """Get the metadata keys that can be used to filter a space."""
+        return self.vector_store.get_filterable_keys(space_name)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return hit counters for the caches used on the query path."""
+        with self._chain_lock:
+            qa_chains = {
+                "hits": self._qa_chain_hits,
+                "misses": self._qa_chain_misses,
+                "size": len(self._qa_chains),
+            }
+        stats = {"collections": self.vector_store.get_collection_cache_stats(), "qa_chains": qa_chains}
+        if self.answer_cache is not None:
+            stats["answers"] = self.answer_cache.get_stats()
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            stats["llm"] = llm_cache.get_stats()
+        return stats
+
+    def get_embedding_stats(self) -> Dict[str, Any]:
+        """Return the embedding cache, retry, deduplication and query coalescing counters."""
+        return self.vector_store.get_embedding_stats()
+
     def get_spaces(self) -> List[str]:
         """Get list of existing spaces (collections)."""
         return self.vector_store.get_existing_collections()
 
-    def add_documents(self, documents: List[Dict[str, Any]], space_name: str) -> None:
-        """Add documents to the vector store."""
-        self.vector_store.add_documents(documents, space_name)
+    def configure_space(
+        self,
+        space_name: str,
+        embedding_dimensions: Optional[int] = None,
+        quantization: Optional[str] = None,
+        vector_backend: Optional[str] = None,
+        hnsw: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Create a space with a reduced embedding size, quantized vectors, the flat backend and/or HNSW tuning."""
+        self.vector_store.configure_collection(space_name, embedding_dimensions, quantization, vector_backend, hnsw)
+        self.invalidate_space(space_name)
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_space(space_name)
+
+    def add_documents(
+        self, documents: List[Dict[str, Any]], space_name: str, replace_sources: bool = False
+    ) -> Dict[str, int]:
+        """Add documents to the vector store and return the store's ingest report.
+
+        ``replace_sources=True`` treats the documents as the new version of
+        their sources and removes those sources' chunks that are no longer in them.
+        """
+        try:
+            return self.vector_store.add_documents(documents, space_name, replace_sources=replace_sources)
+        finally:
+            self.invalidate_space(space_name)
+            # Replaced chunks invalidate their answers through the removal listener
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate_unsourced(space_name)
+
+    def delete_space(self, space_name: str) -> None:
+        """Delete a space's collection and its warm chains."""
+        try:
+            self.vector_store.delete_collection(space_name)
+        finally:
+            self.invalidate_space(space_name)
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate_space(space_name)
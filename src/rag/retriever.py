@@ -0,0 +1,42 @@
+from typing import Any, Dict, List
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+class StoreRetriever(BaseRetriever):
+    """LangChain retriever over a vector store's ``similarity_search``.
+
+    Used for spaces that are not backed by a Chroma collection, such as flat
+    NumPy spaces, and for hybrid search. ``search_kwargs`` accepts the same
+    ``k``, ``filter`` and ``where_document`` keys as the Chroma retriever, plus
+    ``search_mode``. Async retrieval embeds the query through the store's
+    async path.
+    """
+
+    store: Any
+    collection_name: str
+    search_kwargs: Dict[str, Any] = {}
+
+    def _search_kwargs(self) -> Dict[str, Any]:
+        return {
+            "k": self.search_kwargs.get("k", 4),
+            "where": self.search_kwargs.get("filter"),
+            "where_document": self.search_kwargs.get("where_document"),
+            "search_mode": self.search_kwargs.get("search_mode")
+        }
+
+    @staticmethod
+    def _to_documents(results: List[Dict[str, Any]]) -> List[Document]:
+        return [Document(page_content=doc["text"], metadata=doc["metadata"]) for doc in results]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._to_documents(self.store.similarity_search(query, self.collection_name, **self._search_kwargs()))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        results = await self.store.asimilarity_search(query, self.collection_name, **self._search_kwargs())
+        return self._to_documents(results)
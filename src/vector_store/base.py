@@ -0,0 +1,300 @@
+import asyncio
+import hashlib
+import logging
+from itertools import chain, islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+import numpy as np
+from src.embeddings.query_coalescer import QueryCoalescer
+from src.vector_store.quantization import apply_quantization, validate_quantization
+
+logger = logging.getLogger(__name__)
+
+# Metadata value types that stores can filter on
+_FILTERABLE_TYPES = (str, int, float, bool)
+
+
+class BaseVectorStore:
+    """Embedding and document helpers shared by the vector store backends.
+
+    Subclasses set ``_embedding_function``, ``_dimension_embedding_functions``
+    and ``_removal_listeners`` and implement ``add_documents``,
+    ``similarity_search``, ``get_existing_collections`` and
+    ``delete_collection``.
+    """
+
+    _embedding_function: Any
+    _dimension_embedding_functions: Dict[int, Any]
+    _removal_listeners: List[Callable[[str, List[str]], None]]
+
+    def add_removal_listener(self, listener: Callable[[str, List[str]], None]) -> None:
+        """Register a callback run with (collection name, chunk IDs) whenever stored chunks are removed."""
+        self._removal_listeners.append(listener)
+
+    def _notify_removed(self, collection_name: str, ids: List[str]) -> None:
+        for listener in self._removal_listeners:
+            listener(collection_name, ids)
+
+    def _supports_numpy(self) -> bool:
+        """Whether the embedding function can return float32 matrices directly."""
+        return getattr(self._embedding_function, "supports_numpy_embeddings", False) is True
+
+    def _get_embedding_function_for(self, dimensions: Optional[int]) -> Any:
+        """Return the embedding function producing vectors of the given size."""
+        if not dimensions:
+            return self._embedding_function
+        if dimensions not in self._dimension_embedding_functions:
+            if not hasattr(self._embedding_function, "with_dimensions"):
+                raise ValueError("Embedding function does not support reduced dimensions")
+            self._dimension_embedding_functions[dimensions] = self._embedding_function.with_dimensions(dimensions)
+        return self._dimension_embedding_functions[dimensions]
+
+    def _embedding_functions(self) -> List[Any]:
+        """Return the default embedding function and its per-dimension variants."""
+        functions = [self._embedding_function, *self._dimension_embedding_functions.values()]
+        return list({id(function): function for function in functions}.values())
+
+    def get_embedding_stats(self) -> Dict[str, Any]:
+        """Return cache, retry, deduplication and query coalescing counters of the embedding functions.
+
+        Per-dimension variants share the default function's cache and retry
+        counters, while deduplication and coalescing are counted per variant and summed.
+        """
+        default = self._embedding_function
+        stats: Dict[str, Any] = {}
+        if hasattr(default, "get_cache_stats"):
+            stats["cache"] = default.get_cache_stats()
+        if hasattr(default, "get_retry_stats"):
+            stats["retries"] = default.get_retry_stats()
+        functions = self._embedding_functions()
+        dedup = [function.get_dedup_stats() for function in functions if hasattr(function, "get_dedup_stats")]
+        if dedup:
+            stats["deduplication"] = {key: sum(counts[key] for counts in dedup) for key in ("inputs", "saved")}
+        coalescers = [function.get_stats() for function in functions if isinstance(function, QueryCoalescer)]
+        if coalescers:
+            requests = sum(counts["requests"] for counts in coalescers)
+            batches = sum(counts["batches"] for counts in coalescers)
+            stats["query_coalescing"] = {
+                "requests": requests,
+                "batches": batches,
+                "average_batch_size": requests / batches if batches else 0.0,
+            }
+        return stats
+
+    def _embed_documents(
+        self, texts: List[str], config: Optional[Dict[str, Any]] = None
+    ) -> Union[np.ndarray, List[List[float]]]:
+        """Embed texts, keeping them as a float32 matrix when the embedding function supports it."""
+        config = config or {}
+        embedding_function = self._get_embedding_function_for(config.get("embedding_dimensions"))
+        if self._supports_numpy():
+            embeddings = embedding_function.embed_documents_array(texts)
+        else:
+            embeddings = embedding_function.embed_documents(texts)
+        return self._apply_quantization(embeddings, config)
+
+    def _embed_queries(
+        self, queries: List[str], config: Optional[Dict[str, Any]] = None
+    ) -> Union[np.ndarray, List[List[float]]]:
+        """Embed query strings into a (queries x dimensions) matrix.
+
+        A single query goes through the query path (and its coalescing); several
+        queries are embedded together in one documents call.
+        """
+        config = config or {}
+        embedding_function = self._get_embedding_function_for(config.get("embedding_dimensions"))
+        if len(queries) > 1:
+            return self._embed_documents(queries, config)
+        embeddings: Union[np.ndarray, List[List[float]]]
+        if self._supports_numpy():
+            embeddings = np.stack([embedding_function.embed_query_array(query) for query in queries])
+        else:
+            embeddings = [embedding_function.embed_query(query) for query in queries]
+        return self._apply_quantization(embeddings, config)
+
+    async def _aembed_query(self, query: str, config: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """Embed one query into a (1 x dimensions) matrix without blocking the event loop."""
+        config = config or {}
+        embedding_function = self._get_embedding_function_for(config.get("embedding_dimensions"))
+        if hasattr(embedding_function, "aembed_query"):
+            embedding = await embedding_function.aembed_query(query)
+        else:
+            embedding = await asyncio.to_thread(embedding_function.embed_query, query)
+        return np.asarray(self._apply_quantization(np.asarray([embedding], dtype=np.float32), config))
+
+    def _get_query_config(self, collection_name: str) -> Optional[Dict[str, Any]]:
+        """Return a collection's embedding settings, or None if it does not exist."""
+        raise NotImplementedError
+
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        collection_name: str,
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        search_mode: Optional[str] = None,
+        query_embeddings: Optional[Any] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for many queries at once, returning one result list per query."""
+        raise NotImplementedError
+
+    async def asimilarity_search(
+        self,
+        query: str,
+        collection_name: str,
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        search_mode: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Async ``similarity_search``: the query is embedded by the async client, the search runs in a thread."""
+        config = await asyncio.to_thread(self._get_query_config, collection_name)
+        if config is None:
+            return []
+        query_embeddings = await self._aembed_query(query, config)
+        results = await asyncio.to_thread(
+            self.similarity_search_batch,
+            [query], collection_name, k, where, where_document, search_mode, query_embeddings
+        )
+        return results[0]
+
+    def _embedding_config(self, embedding_dimensions: Optional[int], quantization: Optional[str]) -> Dict[str, Any]:
+        """Validate a collection's embedding size and quantization and return them as stored in its config."""
+        if embedding_dimensions is not None and embedding_dimensions <= 0:
+            raise ValueError("embedding_dimensions must be positive")
+        config: Dict[str, Any] = {"quantization": validate_quantization(quantization)}
+        if embedding_dimensions:
+            config["embedding_dimensions"] = embedding_dimensions
+        # Fail early if the embedding function cannot honour the requested size
+        self._get_embedding_function_for(embedding_dimensions)
+        return config
+
+    @staticmethod
+    def _apply_quantization(
+        embeddings: Union[np.ndarray, List[List[float]]], config: Dict[str, Any]
+    ) -> Union[np.ndarray, List[List[float]]]:
+        """Snap vectors to the collection's quantization grid so documents and queries match."""
+        quantization = config.get("quantization")
+        if not quantization or quantization == "float32":
+            return embeddings
+        return apply_quantization(np.asarray(embeddings, dtype=np.float32), quantization)
+
+    @staticmethod
+    def make_document_id(text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Derive a stable chunk ID from its source path and content.
+
+        Re-ingesting the same chunk from the same source always yields the same
+        ID, so unchanged chunks can be recognised without re-embedding them.
+        """
+        source = str((metadata or {}).get("source", ""))
+        return hashlib.sha256(f"{source}\x00{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _prepare_documents(documents: List[Any]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Extract texts and metadata from LangChain Documents, dicts or plain strings."""
+        texts: List[str] = []
+        metadata: List[Dict[str, Any]] = []
+
+        for doc in documents:
+            # Support LangChain Document objects and plain dicts
+            if hasattr(doc, "page_content"):
+                texts.append(str(getattr(doc, "page_content")))
+                meta = getattr(doc, "metadata", {}) or {}
+                metadata.append(meta)
+            elif isinstance(doc, dict):
+                texts.append(str(doc.get("text", "")))
+                metadata.append(doc.get("metadata", {}) or {})
+            else:
+                texts.append(str(doc))
+                metadata.append({})
+        return texts, metadata
+
+    @staticmethod
+    def _write_batches(documents: Iterable[Any], batch_size: int) -> Optional[Iterator[List[Any]]]:
+        """Split documents into write batches, or return None when there are none."""
+        iterator = iter(documents)
+        first_batch = list(islice(iterator, batch_size))
+        if not first_batch:
+            return None
+        return chain([first_batch], iter(lambda: list(islice(iterator, batch_size)), []))
+
+    def _prepare_upsert_batch(
+        self, documents: List[Any], seen: Set[str], sources: Set[str]
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[str], List[int]]:
+        """Return a write batch's texts, metadata and content-derived IDs, and the rows not seen earlier in the upsert.
+
+        Those rows' IDs are added to ``seen`` and the batch's sources to ``sources``.
+        """
+        texts, metadata = self._prepare_documents(documents)
+        sources.update(str(meta["source"]) for meta in metadata if meta.get("source"))
+        ids: List[str] = []
+        candidates: List[int] = []
+        for i, (text, meta) in enumerate(zip(texts, metadata)):
+            doc_id = self.make_document_id(text, meta)
+            ids.append(doc_id)
+            # Keep the first occurrence of chunks repeated within the stream
+            if doc_id not in seen:
+                seen.add(doc_id)
+                candidates.append(i)
+        return texts, metadata, ids, candidates
+
+    @staticmethod
+    def _count_upsert_batch(report: Dict[str, int], batch_size: int, added_texts: List[str]) -> None:
+        """Record a write batch's added, skipped and deduplicated chunks in an upsert report."""
+        report["added"] += len(added_texts)
+        report["skipped"] += batch_size - len(added_texts)
+        report["deduplicated"] += len(added_texts) - len(set(added_texts))
+
+    @staticmethod
+    def _stale_ids(
+        records: Iterable[Tuple[str, Optional[Dict[str, Any]]]], seen: Set[str], sources: Set[str]
+    ) -> List[str]:
+        """Return the IDs of stored chunks of re-ingested sources that are no longer part of them."""
+        return [
+            doc_id for doc_id, meta in records
+            if doc_id not in seen and str((meta or {}).get("source", "")) in sources
+        ]
+
+    @staticmethod
+    def _log_upsert(target: str, report: Dict[str, int]) -> None:
+        logger.info(
+            f"Ingested into {target}: {report['added']} added, {report['skipped']} skipped, "
+            f"{report['replaced']} replaced, {report['deduplicated']} deduplicated"
+        )
+
+    @staticmethod
+    def _metadata_filter_keys(metadatas: Iterable[Optional[Dict[str, Any]]]) -> Set[str]:
+        """Collect the metadata keys whose values can be filtered on."""
+        return {
+            key
+            for meta in metadatas if meta
+            for key, value in meta.items() if isinstance(value, _FILTERABLE_TYPES)
+        }
+
+    @classmethod
+    def _where_keys(cls, where: Dict[str, Any]) -> Set[str]:
+        """Return the metadata keys referenced by a ``where`` filter, including inside $and/$or."""
+        keys: Set[str] = set()
+        for key, value in where.items():
+            if key in ("$and", "$or"):
+                for clause in value:
+                    keys |= cls._where_keys(clause)
+            elif not key.startswith("$"):
+                keys.add(key)
+        return keys
+
+    @classmethod
+    def _unknown_filter_keys(cls, where: Optional[Dict[str, Any]], indexed: Optional[Set[str]]) -> Set[str]:
+        """Return the ``where`` keys missing from a filterable key index (none when there is no index)."""
+        if not where or indexed is None:
+            return set()
+        return cls._where_keys(where) - indexed
+
+    def _check_filter_keys(self, where: Optional[Dict[str, Any]], indexed: Optional[Set[str]]) -> None:
+        """Reject filters on keys no stored chunk has, which are almost always typos."""
+        unknown = self._unknown_filter_keys(where, indexed)
+        if unknown:
+            raise ValueError(
+                f"Unknown metadata filter key(s): {', '.join(sorted(unknown))}. "
+                f"Filterable keys: {', '.join(sorted(indexed or [])) or 'none'}"
+            )
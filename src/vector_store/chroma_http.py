@@ -0,0 +1,31 @@
+import threading
+from typing import Any
+from chromadb.api.fastapi import FastAPI
+from src.http_clients import create_http_client
+
+_lock = threading.Lock()
+
+
+def use_pooled_session(client: Any) -> None:
+    """Back a Chroma HTTP client with a pooled keep-alive session with request timeouts.
+
+    Chroma's stock HTTP client opens an ``httpx.Client`` without timeouts or
+    pool limits. This keeps its headers and TLS verification and swaps in a
+    client configured from the HTTP_* settings, so a stalled Chroma server
+    fails requests instead of hanging API workers. Clients with the same
+    settings share one API instance, which is swapped only once.
+    """
+    api = getattr(client, "_server", None)
+    if not isinstance(api, FastAPI):
+        return
+    with _lock:
+        if getattr(api, "_pooled_session", False):
+            return
+        verify = api._settings.chroma_server_ssl_verify
+        stock_session = api._session
+        api._session = create_http_client(
+            headers=stock_session.headers,
+            verify=True if verify is None else verify
+        )
+        api._pooled_session = True  # type: ignore[attr-defined]
+    stock_session.close()
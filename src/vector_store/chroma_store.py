@@ -1,14 +1,74 @@
+import json
+import logging
 import os
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Set, Tuple
 from dotenv import load_dotenv
 import chromadb
+import numpy as np
 from chromadb.config import Settings
-from src.embeddings.openai_embeddings import OpenAIEmbeddings
+from chromadb.errors import NotFoundError
+from src.config.settings import (
+    CHROMA_CLIENT_MODE,
+    CHROMA_WRITE_BATCH_SIZE,
+    COLLECTION_CACHE_SIZE,
+    HYBRID_CANDIDATES,
+    RRF_K,
+    SEARCH_MODE,
+)
+from src.embeddings.registry import create_embedding_function
+from src.vector_store.base import BaseVectorStore
+from src.vector_store.chroma_http import use_pooled_session
+from src.vector_store.lexical_index import LexicalIndex, reciprocal_rank_fusion, validate_search_mode
+from src.vector_store.numpy_store import DISTANCE_SPACES, NumpyStore
+from src.vector_store.quantization import validate_quantization
+from src.vector_store.snapshot import RecordBatch, iter_snapshot, read_manifest, write_snapshot
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-class ChromaStore:
+# Collection metadata field holding the JSON list of metadata keys that can be filtered on
+FILTERABLE_KEYS_FIELD = "filterable_keys"
+
+# Per-space storage backends: Chroma's HNSW index or the brute-force memory-mapped NumpyStore
+VECTOR_BACKENDS = ("chroma", "flat")
+
+# Per-space HNSW settings and the Chroma configuration keys they map to
+HNSW_SETTINGS = {
+    "space": "space",
+    "m": "max_neighbors",
+    "construction_ef": "ef_construction",
+    "search_ef": "ef_search",
+}
+
+
+def hnsw_configuration(hnsw: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Validate per-space HNSW settings and translate them to Chroma's configuration keys."""
+    configuration: Dict[str, Any] = {}
+    for key, value in (hnsw or {}).items():
+        if value is None:
+            continue
+        if key not in HNSW_SETTINGS:
+            raise ValueError(f"Unknown HNSW setting: {key}. Supported: {', '.join(HNSW_SETTINGS)}")
+        if key == "space":
+            if value not in DISTANCE_SPACES:
+                raise ValueError(f"Unsupported distance space: {value}. Supported: {', '.join(DISTANCE_SPACES)}")
+        elif not isinstance(value, int) or value <= 0:
+            raise ValueError(f"HNSW setting {key} must be a positive integer")
+        configuration[HNSW_SETTINGS[key]] = value
+    return configuration
+
+
+_HTTP_LOCAL_STATE_ERROR = (
+    "{feature} keeps its data on local disk, which replicas talking to a shared Chroma server "
+    "do not share, and is not available in http client mode"
+)
+
+
+class ChromaStore(BaseVectorStore):
     def __init__(
         self,
         host: str = "localhost",
@@ -19,138 +79,824 @@ class ChromaStore:
         ssl: bool = False,
         headers: Optional[Dict[str, str]] = None,
         tenant: str = "default_tenant",
-        database: str = "default_database"
+        database: str = "default_database",
+        embedding_backend: Optional[str] = None,
+        client_mode: Optional[str] = None
     ):
         self._host = host
         self._port = port
         self._collection_name = collection_name
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
-        self._embedding_function = embedding_function or OpenAIEmbeddings(
-            api_key=api_key,
-            model_name="text-embedding-3-small"
-        )
         self._persist_directory = persist_directory or os.path.join(os.getcwd(), "chroma_db")
+        self._embedding_function = embedding_function or create_embedding_function(
+            embedding_backend,
+            cache_directory=self._persist_directory
+        )
+        self._dimension_embedding_functions: Dict[int, Any] = {}
+        self._removal_listeners: List[Callable[[str, List[str]], None]] = []
+        # Spaces configured with the "flat" backend live here and are routed to it
+        self._flat_store = NumpyStore(
+            os.path.join(self._persist_directory, "flat_store"),
+            embedding_function=self._embedding_function
+        )
+        self._flat_store.add_removal_listener(self._notify_removed)
+        self._collections: "OrderedDict[str, Any]" = OrderedDict()
+        self._collection_cache_size = COLLECTION_CACHE_SIZE
+        self._collection_cache_hits = 0
+        self._collection_cache_misses = 0
+        self._collection_lock = threading.Lock()
+        # BM25 indexes of Chroma collections, kept next to the local persist directory
+        # (persistent client mode only)
+        self._lexical_indexes: Dict[str, LexicalIndex] = {}
+        # Serialises backfills so no search sees a half-built index
+        self._lexical_lock = threading.Lock()
+        # Serialises in-process read-modify-writes of the filterable key index
+        self._filter_keys_lock = threading.Lock()
         self._ssl = ssl
         self._headers = headers
         self._tenant = tenant
         self._database = database
         
+        self._client_mode = (client_mode or CHROMA_CLIENT_MODE).lower()
+        
         # Initialize the ChromaDB client
-        self._chroma_client = chromadb.PersistentClient(
-            path=self._persist_directory,
-            settings=Settings(
-                chroma_server_host=host,
-                chroma_server_http_port=port,
-                chroma_server_ssl_enabled=ssl
+        if self._client_mode == "http":
+            # Talk to a shared Chroma server over a pooled keep-alive client with request timeouts.
+            # Replicas share only the server, so state kept on local disk is unavailable
+            if validate_search_mode(SEARCH_MODE) == "hybrid":
+                raise ValueError(_HTTP_LOCAL_STATE_ERROR.format(feature="Hybrid search"))
+            self._chroma_client = chromadb.HttpClient(
+                host=host,
+                port=port,
+                ssl=ssl,
+                headers=headers,
+                tenant=tenant,
+                database=database
             )
-        )
+            use_pooled_session(self._chroma_client)
+        elif self._client_mode == "persistent":
+            self._chroma_client = chromadb.PersistentClient(
+                path=self._persist_directory,
+                settings=Settings(
+                    chroma_server_host=host,
+                    chroma_server_http_port=port,
+                    chroma_server_ssl_enabled=ssl
+                )
+            )
+        else:
+            raise ValueError(f"Unsupported Chroma client mode: {self._client_mode}. Use 'persistent' or 'http'")
         
         # Get or create the collection
         self._collection = self._get_or_create_collection()
 
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "ChromaStore":
+        """Create a store configured from the CHROMA_* environment variables."""
+        chroma_token = os.getenv("CHROMA_AUTH_TOKEN")
+        options: Dict[str, Any] = {
+            "host": os.getenv("CHROMA_HOST", "localhost"),
+            "port": int(os.getenv("CHROMA_PORT", "8001")),
+            "collection_name": "default",
+            "persist_directory": "./chroma_db",
+            "ssl": os.getenv("CHROMA_SSL", "false").lower() == "true",
+            "headers": {"Authorization": f"Bearer {chroma_token}"} if chroma_token else None,
+            "tenant": os.getenv("CHROMA_TENANT", "default_tenant"),
+            "database": os.getenv("CHROMA_DATABASE", "default_database"),
+        }
+        options.update(kwargs)
+        return cls(**options)
+
     def _get_or_create_collection(self) -> Any:
         """Get or create a collection with the specified name."""
         try:
-            return self._chroma_client.get_or_create_collection(
+            collection = self._chroma_client.get_or_create_collection(
                 name=self._collection_name,
                 embedding_function=self._embedding_function  # type: ignore
             )
         except Exception as e:
             raise Exception(f"Failed to get or create collection: {str(e)}")
+        self._cache_collection(self._collection_name, collection)
+        return collection
 
-    def add_documents(self, documents: List[Dict[str, Any]], collection_name: str) -> None:
-        """Add documents to ChromaDB collection."""
-        # Handle empty document list
-        if not documents:
+    def _cache_collection(self, collection_name: str, collection: Any) -> None:
+        """Remember a collection handle, evicting the least recently used one when full."""
+        with self._collection_lock:
+            self._collections[collection_name] = collection
+            self._collections.move_to_end(collection_name)
+            while len(self._collections) > self._collection_cache_size:
+                self._collections.popitem(last=False)
+
+    def _invalidate_collection(self, collection_name: str) -> None:
+        """Forget a cached collection handle."""
+        with self._collection_lock:
+            self._collections.pop(collection_name, None)
+
+    def get_collection(self, collection_name: str, create: bool = False) -> Any:
+        """Return a collection handle, reusing cached handles across calls.
+
+        Handles are kept in a per-store LRU so repeated writes and queries skip
+        the metadata round trip to Chroma. With ``create`` the collection is
+        created if missing; otherwise Chroma's not-found error propagates.
+        """
+        with self._collection_lock:
+            collection = self._collections.get(collection_name)
+            if collection is not None:
+                self._collections.move_to_end(collection_name)
+                self._collection_cache_hits += 1
+                return collection
+            self._collection_cache_misses += 1
+
+        if create:
+            collection = self._chroma_client.get_or_create_collection(
+                collection_name,
+                embedding_function=self._embedding_function  # type: ignore
+            )
+        else:
+            collection = self._chroma_client.get_collection(collection_name)
+        self._cache_collection(collection_name, collection)
+        return collection
+
+    def refresh_collection(self, collection_name: str, create: bool = False) -> Any:
+        """Drop a collection's cached handle and fetch it again, e.g. after another client recreated it."""
+        self._invalidate_collection(collection_name)
+        return self.get_collection(collection_name, create)
+
+    def _get_live_collection(self, collection_name: str, create: bool = False) -> Any:
+        """Return a collection handle checked against Chroma, refetching it if the cached one went stale."""
+        collection = self.get_collection(collection_name, create)
+        try:
+            collection.count()
+        except NotFoundError:
+            # Deleted and recreated elsewhere: the cached handle points at the old collection ID
+            collection = self.refresh_collection(collection_name, create)
+        return collection
+
+    def get_collection_cache_stats(self) -> Dict[str, int]:
+        """Return hit and miss counts for the collection handle cache."""
+        with self._collection_lock:
+            return {
+                "hits": self._collection_cache_hits,
+                "misses": self._collection_cache_misses,
+                "size": len(self._collections),
+            }
+
+    @staticmethod
+    def _get_collection_config(collection: Any) -> Dict[str, Any]:
+        """Read the per-collection embedding settings stored in the collection metadata."""
+        metadata = getattr(collection, "metadata", None)
+        return metadata if isinstance(metadata, dict) else {}
+
+    def is_flat_collection(self, collection_name: str) -> bool:
+        """Whether a space is stored in the flat NumPy backend rather than Chroma."""
+        return self._flat_store.has_collection(collection_name)
+
+    def _embedding_functions(self) -> List[Any]:
+        functions = super()._embedding_functions() + self._flat_store._embedding_functions()
+        return list({id(function): function for function in functions}.values())
+
+    def _get_query_config(self, collection_name: str) -> Optional[Dict[str, Any]]:
+        if self.is_flat_collection(collection_name):
+            return self._flat_store._get_query_config(collection_name)
+        try:
+            return self._get_collection_config(self.get_collection(collection_name))
+        except (ValueError, NotFoundError):
+            return None
+
+    def get_embedding_function(self, collection_name: str) -> Any:
+        """Return the embedding function matching a collection's configured dimensions."""
+        if self.is_flat_collection(collection_name):
+            return self._flat_store.get_embedding_function(collection_name)
+        try:
+            collection = self.get_collection(collection_name)
+        except Exception:
+            return self._embedding_function
+        return self._get_embedding_function_for(self._get_collection_config(collection).get("embedding_dimensions"))
+
+    def configure_collection(
+        self,
+        collection_name: str,
+        embedding_dimensions: Optional[int] = None,
+        quantization: Optional[str] = None,
+        backend: Optional[str] = None,
+        hnsw: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Create a collection with its own embedding size, quantization, vector backend and HNSW settings.
+
+        ``backend="flat"`` stores the space in a memory-mapped NumPy file; ``hnsw`` is fixed at creation.
+        """
+        index_configuration = hnsw_configuration(hnsw)
+        backend = (backend or "chroma").lower()
+        if backend not in VECTOR_BACKENDS:
+            raise ValueError(f"Unsupported vector backend: {backend}. Supported: {', '.join(VECTOR_BACKENDS)}")
+        if backend == "flat" and self._client_mode == "http":
+            raise ValueError(_HTTP_LOCAL_STATE_ERROR.format(feature="The flat backend"))
+        is_flat = self.is_flat_collection(collection_name)
+        if is_flat != (backend == "flat") and (is_flat or collection_name in self._get_chroma_collections()):
+            raise ValueError(f"Collection '{collection_name}' already exists with a different configuration")
+        if backend == "flat":
+            self._flat_store.configure_collection(
+                collection_name, embedding_dimensions, quantization, (hnsw or {}).get("space")
+            )
             return
-        
+
+        config = self._embedding_config(embedding_dimensions, quantization)
+
+        options: Dict[str, Any] = {}
+        if index_configuration:
+            options["configuration"] = {"hnsw": index_configuration}
         try:
-            # Get or create collection
             collection = self._chroma_client.get_or_create_collection(
                 collection_name,
-                embedding_function=self._embedding_function  # type: ignore
+                metadata=config,
+                embedding_function=self._embedding_function,  # type: ignore
+                **options
             )
+        except Exception as e:
+            raise Exception(f"Failed to configure collection: {str(e)}")
+        self._cache_collection(collection_name, collection)
+
+        existing = self._get_collection_config(collection)
+        existing_hnsw = self._get_hnsw_configuration(collection)
+        if any(existing.get(key) != value for key, value in config.items()) or any(
+            existing_hnsw.get(key, value) != value for key, value in index_configuration.items()
+        ):
+            raise ValueError(f"Collection '{collection_name}' already exists with a different configuration")
+
+    @staticmethod
+    def _get_hnsw_configuration(collection: Any) -> Dict[str, Any]:
+        """Read a collection's effective HNSW configuration."""
+        configuration = getattr(collection, "configuration", None)
+        hnsw = configuration.get("hnsw") if isinstance(configuration, dict) else None
+        return hnsw if isinstance(hnsw, dict) else {}
 
-            # Prepare data
-            texts: List[str] = []
-            metadata: List[Dict[str, Any]] = []
-
-            for doc in documents:
-                # Support LangChain Document objects and plain dicts
-                if hasattr(doc, "page_content"):
-                    texts.append(str(getattr(doc, "page_content")))
-                    meta = getattr(doc, "metadata", {}) or {}
-                    metadata.append(meta)
-                elif isinstance(doc, dict):
-                    texts.append(str(doc.get("text", "")))
-                    metadata.append(doc.get("metadata", {}) or {})
-                else:
-                    texts.append(str(doc))
-                    metadata.append({})
-
-            embeddings: List[List[float]] = self._embedding_function.embed_documents(texts)
-            # Generate IDs (ChromaDB requires string IDs)
-            ids = [str(i) for i in range(len(texts))]
-
-            # Add documents
-            collection.add(
-                embeddings=embeddings,  # type: ignore
-                documents=texts,
-                metadatas=metadata,  # type: ignore
-                ids=ids
+    def get_index_settings(self, collection_name: str) -> Dict[str, Any]:
+        """Return a space's backend and index settings in the keys accepted by ``configure_collection``."""
+        if self.is_flat_collection(collection_name):
+            return {"backend": "flat", "hnsw": {"space": self._flat_store.get_distance_space(collection_name)}}
+        hnsw = self._get_hnsw_configuration(self.get_collection(collection_name))
+        return {
+            "backend": "chroma",
+            "hnsw": {key: hnsw[name] for key, name in HNSW_SETTINGS.items() if name in hnsw}
+        }
+
+    @staticmethod
+    def _get_ids(collection: Any, **kwargs: Any) -> List[str]:
+        """Return the IDs matched by a collection.get call."""
+        result = collection.get(include=[], **kwargs)
+        return list(result.get("ids") or []) if isinstance(result, dict) else []
+
+    def _get_write_batch_size(self) -> int:
+        """Write batch size, capped at the largest batch the Chroma client accepts."""
+        batch_size = CHROMA_WRITE_BATCH_SIZE
+        try:
+            max_batch_size = self._chroma_client.get_max_batch_size()
+        except Exception:
+            max_batch_size = None
+        if isinstance(max_batch_size, int) and max_batch_size > 0:
+            batch_size = min(batch_size, max_batch_size)
+        return max(1, batch_size)
+
+    def _get_query_batch_size(self, count: int) -> int:
+        """Query batch size: the whole batch unless the Chroma client accepts fewer."""
+        try:
+            max_batch_size = self._chroma_client.get_max_batch_size()
+        except Exception:
+            max_batch_size = None
+        if isinstance(max_batch_size, int) and max_batch_size > 0:
+            return min(count, max_batch_size)
+        return max(1, count)
+
+    def _prepare_write_batch(
+        self,
+        collection: Any,
+        config: Dict[str, Any],
+        documents: List[Any],
+        seen: Set[str],
+        sources: Set[str],
+        filter_keys: Set[str],
+        report: Dict[str, int]
+    ) -> Optional[Dict[str, Any]]:
+        """Embed the chunks of one write batch that are not stored yet.
+
+        Returns the keyword arguments for ``collection.add``, or None when every
+        chunk in the batch is already stored or was seen earlier in the stream.
+        """
+        texts, metadata, ids, candidates = self._prepare_upsert_batch(documents, seen, sources)
+        existing = set(self._get_ids(collection, ids=[ids[i] for i in candidates])) if candidates else set()
+        new = [i for i in candidates if ids[i] not in existing]
+        new_texts = [texts[i] for i in new]
+        self._count_upsert_batch(report, len(texts), new_texts)
+        if not new:
+            return None
+
+        new_metadata = [metadata[i] for i in new]
+        filter_keys.update(self._metadata_filter_keys(new_metadata))
+        return {
+            "embeddings": self._embed_documents(new_texts, config),
+            "documents": new_texts,
+            "metadatas": self._chroma_metadatas(new_metadata),
+            "ids": [ids[i] for i in new]
+        }
+
+    @staticmethod
+    def _chroma_metadatas(metadatas: Iterable[Optional[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+        """Chroma rejects empty metadata dicts but accepts None."""
+        return [metadata or None for metadata in metadatas]
+
+    @staticmethod
+    def _indexed_filter_keys(config: Dict[str, Any]) -> Optional[Set[str]]:
+        """Return the collection's filterable key index, or None if it has none yet."""
+        indexed = config.get(FILTERABLE_KEYS_FIELD)
+        if not isinstance(indexed, str):
+            return None
+        return set(json.loads(indexed))
+
+    def _scan_filter_keys(self, collection: Any) -> Set[str]:
+        """Collect filterable keys from every stored chunk, one write batch at a time."""
+        keys: Set[str] = set()
+        batch_size = self._get_write_batch_size()
+        offset = 0
+        while True:
+            result = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            metadatas = (result.get("metadatas") or []) if isinstance(result, dict) else []
+            keys.update(self._metadata_filter_keys(metadatas))
+            if len(metadatas) < batch_size:
+                return keys
+            offset += batch_size
+
+    def _update_filterable_keys(self, collection_name: str, keys: Set[str], added: int) -> None:
+        """Merge newly written metadata keys into the collection's filterable key index."""
+        with self._filter_keys_lock:
+            # Merge into the stored index, not the cached handle's copy, so other writers' keys survive
+            collection = self.refresh_collection(collection_name)
+            config = self._get_collection_config(collection)
+            indexed = self._indexed_filter_keys(config)
+            if indexed is None:
+                # Chunks stored before the index existed must be accounted for once
+                count = collection.count()
+                if isinstance(count, int) and count > added:
+                    keys = keys | self._scan_filter_keys(collection)
+            elif keys <= indexed:
+                return
+            merged = sorted((indexed or set()) | keys)
+            # Legacy "hnsw:*" keys cannot be re-sent to modify, and they are fixed anyway
+            metadata = {key: value for key, value in config.items() if not key.startswith("hnsw:")}
+            collection.modify(metadata={**metadata, FILTERABLE_KEYS_FIELD: json.dumps(merged)})
+
+    def get_filterable_keys(self, collection_name: str) -> List[str]:
+        """Return the metadata keys that can be used in ``where`` filters for a collection."""
+        if self.is_flat_collection(collection_name):
+            return self._flat_store.get_filterable_keys(collection_name)
+        try:
+            # Read the stored index; the cached handle's copy may predate other writers' keys
+            collection = self.refresh_collection(collection_name)
+        except (ValueError, NotFoundError):
+            return []
+        return sorted(self._indexed_filter_keys(self._get_collection_config(collection)) or [])
+
+    def _validate_where(self, collection_name: str, where: Optional[Dict[str, Any]], config: Dict[str, Any]) -> None:
+        """Warn about ``where`` keys missing from the collection's filterable key index.
+
+        The cached handle's index may predate another writer's keys, so it is
+        re-read once before warning, and the filter is never rejected.
+        """
+        if not self._unknown_filter_keys(where, self._indexed_filter_keys(config)):
+            return
+        indexed = self._indexed_filter_keys(self._get_collection_config(self.refresh_collection(collection_name)))
+        unknown = self._unknown_filter_keys(where, indexed)
+        if unknown:
+            logger.warning(
+                f"Filter on '{collection_name}' uses key(s) not in its filterable key index: "
+                f"{', '.join(sorted(unknown))}. Filterable keys: {', '.join(sorted(indexed or [])) or 'none'}"
             )
 
+    def validate_filter(self, collection_name: str, where: Optional[Dict[str, Any]]) -> None:
+        """Check ``where`` against the filterable key index: flat spaces raise ValueError, Chroma collections warn."""
+        if self.is_flat_collection(collection_name):
+            self._flat_store.validate_filter(collection_name, where)
+            return
+        try:
+            collection = self.get_collection(collection_name)
+        except (ValueError, NotFoundError):
+            return
+        self._validate_where(collection_name, where, self._get_collection_config(collection))
+
+    def _get_lexical_index(self, collection_name: str, collection: Optional[Any] = None) -> Optional[LexicalIndex]:
+        """Return a collection's BM25 index, building it once from stored chunks if it predates the index.
+
+        Returns None in http client mode, where no local index is kept.
+        """
+        if self._client_mode == "http":
+            return None
+        with self._collection_lock:
+            index = self._lexical_indexes.get(collection_name)
+            if index is None:
+                index = LexicalIndex(os.path.join(self._persist_directory, "lexical_index", f"{collection_name}.jsonl"))
+                self._lexical_indexes[collection_name] = index
+        # The backfill is written aside and renamed into place, so an index
+        # file that exists is complete and searches can use it without the lock
+        if collection is not None and not index.exists():
+            with self._lexical_lock:
+                count = collection.count() if not index.exists() else 0
+                if isinstance(count, int) and count > 0:
+                    index.build(self._iter_stored_documents(collection, count))
+        return index
+
+    def _iter_stored_documents(self, collection: Any, count: int) -> Iterator[Tuple[List[str], List[str]]]:
+        """Page through a collection's stored (ids, documents)."""
+        batch_size = self._get_write_batch_size()
+        for offset in range(0, count, batch_size):
+            result = collection.get(include=["documents"], limit=batch_size, offset=offset)
+            yield list(result.get("ids") or []), list(result.get("documents") or [])
+
+    @staticmethod
+    def _write_batch(write: Callable[..., Any], lexical_index: Optional[LexicalIndex], payload: Dict[str, Any]) -> None:
+        """Write one batch to Chroma and index it only once Chroma has stored it."""
+        write(**payload)
+        if lexical_index is not None:
+            lexical_index.add(payload["ids"], payload["documents"])
+
+    def add_documents(
+        self, documents: Iterable[Any], collection_name: str, replace_sources: bool = False
+    ) -> Dict[str, int]:
+        """Add documents to ChromaDB collection, skipping chunks that are already stored."""
+        return self.upsert_documents(documents, collection_name, replace_sources)
+
+    def upsert_documents(
+        self, documents: Iterable[Any], collection_name: str, replace_sources: bool = False
+    ) -> Dict[str, int]:
+        """Incrementally ingest documents into a collection.
+
+        ``documents`` may be any iterable, including a generator; it is consumed
+        in write batches no larger than the client's max batch size, and the
+        next batch is embedded while the previous one is being written, so
+        memory use is bounded by two batches rather than the corpus size.
+
+        Chunks get content-derived IDs; those already present are skipped
+        without being embedded. With ``replace_sources=True`` the documents
+        are the complete new version of their sources (e.g. a re-uploaded
+        file), and chunks previously stored for those sources that are no
+        longer part of them are deleted; otherwise ingest is purely additive.
+        Returns counts of added, skipped and replaced (deleted stale) chunks,
+        and of new chunks whose text repeats another's and was embedded once.
+        """
+        if self.is_flat_collection(collection_name):
+            return self._flat_store.upsert_documents(documents, collection_name, replace_sources)
+        report = {"added": 0, "skipped": 0, "replaced": 0, "deduplicated": 0}
+        batches = self._write_batches(documents, self._get_write_batch_size())
+        # Handle empty document list
+        if batches is None:
+            return report
+
+        try:
+            # Get or create collection
+            collection = self._get_live_collection(collection_name, create=True)
+            config = self._get_collection_config(collection)
+            lexical_index = self._get_lexical_index(collection_name, collection)
+
+            seen: Set[str] = set()
+            sources: Set[str] = set()
+            filter_keys: Set[str] = set()
+            with ThreadPoolExecutor(max_workers=1) as writer:
+                pending: Optional[Future] = None
+                for batch in batches:
+                    payload = self._prepare_write_batch(
+                        collection, config, batch, seen, sources, filter_keys, report
+                    )
+                    # At most one write is in flight while the next batch is embedded
+                    if pending is not None:
+                        pending.result()
+                        pending = None
+                    if payload is not None:
+                        pending = writer.submit(self._write_batch, collection.add, lexical_index, payload)
+                if pending is not None:
+                    pending.result()
+
+            self._update_filterable_keys(collection_name, filter_keys, report["added"])
+
+            # Drop chunks of re-ingested sources that no longer exist in them
+            if replace_sources and sources:
+                stored = collection.get(where={"source": {"$in": sorted(sources)}}, include=["metadatas"])
+                stale = self._stale_ids(zip(stored.get("ids") or [], stored.get("metadatas") or []), seen, sources)
+                if stale:
+                    collection.delete(ids=stale)
+                    if lexical_index is not None:
+                        lexical_index.delete(stale)
+                    self._notify_removed(collection_name, stale)
+                    report["replaced"] += len(stale)
+
+            self._log_upsert(f"'{collection_name}'", report)
+            return report
+
         except Exception as e:
             raise Exception(f"Failed to add documents to ChromaDB: {str(e)}")
 
-    def similarity_search(self, query: str, collection_name: str, k: int = 4) -> List[Dict[str, Any]]:
-        """Search for similar documents in ChromaDB collection."""
+    @staticmethod
+    def _format_results(results: Dict[str, Any], index: int) -> List[Dict[str, Any]]:
+        """Turn one query's rows of a Chroma query result into result dicts."""
+        documents = []
+        if results["documents"] and results["metadatas"] and results["distances"]:
+            for i in range(len(results["documents"][index])):
+                documents.append({
+                    "text": results["documents"][index][i],
+                    "metadata": results["metadatas"][index][i] or {},
+                    "score": 1.0 - float(results["distances"][index][i])  # Convert distance to similarity score
+                })
+        return documents
+
+    def _fuse_hybrid_results(
+        self,
+        collection: Any,
+        lexical_index: LexicalIndex,
+        query: str,
+        results: Dict[str, Any],
+        index: int,
+        k: int,
+        filters: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Fuse one query's dense rows with its BM25 candidates by reciprocal rank fusion."""
+        dense_ids = list(results["ids"][index]) if results.get("ids") else []
+        documents = dict(zip(dense_ids, self._format_results(results, index)))
+        lexical_ids = [doc_id for doc_id, _ in lexical_index.search(query, max(k, HYBRID_CANDIDATES))]
+
+        # Fetching through get() applies the same filters to lexical candidates
+        missing = [doc_id for doc_id in lexical_ids if doc_id not in documents]
+        if missing:
+            fetched = collection.get(ids=missing, include=["documents", "metadatas"], **filters)
+            for doc_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                documents[doc_id] = {"text": text, "metadata": metadata or {}}
+        lexical_ids = [doc_id for doc_id in lexical_ids if doc_id in documents]
+
+        fused = reciprocal_rank_fusion([dense_ids, lexical_ids], RRF_K)[:k]
+        return [{**documents[doc_id], "score": score} for doc_id, score in fused]
+
+    def similarity_search(
+        self,
+        query: str,
+        collection_name: str,
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        search_mode: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Search for similar documents in ChromaDB collection.
+
+        ``where`` filters on chunk metadata (e.g. ``{"source": "a.pdf"}``) and
+        ``where_document`` on chunk text (e.g. ``{"$contains": "S3"}``); both are
+        applied by Chroma inside the index search.
+
+        ``search_mode="hybrid"`` (default: the SEARCH_MODE setting) also ranks
+        chunks with BM25 over the collection's lexical index and fuses both
+        rankings with reciprocal rank fusion, so exact identifiers such as file
+        names and S3 paths are found even when the embedding misses them.
+        Hybrid results carry the fused RRF score rather than a similarity.
+        """
+        return self.similarity_search_batch([query], collection_name, k, where, where_document, search_mode)[0]
+
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        collection_name: str,
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        search_mode: Optional[str] = None,
+        query_embeddings: Optional[Any] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for many queries at once, returning one result list per query.
+
+        All queries are embedded in a single embeddings call (skipped when
+        ``query_embeddings`` are given) and sent to Chroma as one matrix, split
+        only at the client's max batch size. Filters and the search mode apply
+        to every query.
+        """
+        if not queries:
+            return []
+        search_mode = validate_search_mode(search_mode or SEARCH_MODE)
+        if search_mode == "hybrid" and self._client_mode == "http":
+            raise ValueError(_HTTP_LOCAL_STATE_ERROR.format(feature="Hybrid search"))
+        if self.is_flat_collection(collection_name):
+            return self._flat_store.similarity_search_batch(
+                queries, collection_name, k, where, where_document, search_mode, query_embeddings
+            )
         try:
             # Get collection
             try:
-                collection = self._chroma_client.get_collection(collection_name)
-            except ValueError:
+                collection = self.get_collection(collection_name)
+            except (ValueError, NotFoundError):
                 # Collection doesn't exist
-                return []
+                return [[] for _ in queries]
+
+            try:
+                return self._search_collection(
+                    collection, collection_name, queries, k, where, where_document, search_mode, query_embeddings
+                )
+            except NotFoundError:
+                # Deleted and recreated elsewhere: retry once with a fresh handle
+                try:
+                    collection = self.refresh_collection(collection_name)
+                except (ValueError, NotFoundError):
+                    return [[] for _ in queries]
+                return self._search_collection(
+                    collection, collection_name, queries, k, where, where_document, search_mode, query_embeddings
+                )
+
+        except Exception as e:
+            raise Exception(f"Failed to search in ChromaDB: {str(e)}")
+
+    def _search_collection(
+        self,
+        collection: Any,
+        collection_name: str,
+        queries: List[str],
+        k: int,
+        where: Optional[Dict[str, Any]],
+        where_document: Optional[Dict[str, Any]],
+        search_mode: str,
+        query_embeddings: Optional[Any]
+    ) -> List[List[Dict[str, Any]]]:
+        """Run ``similarity_search_batch`` against one collection handle."""
+        config = self._get_collection_config(collection)
+        self._validate_where(collection_name, where, config)
+        filters: Dict[str, Any] = {}
+        if where:
+            filters["where"] = where
+        if where_document:
+            filters["where_document"] = where_document
 
-            # Generate query embedding
-            query_embedding: List[float] = self._embedding_function.embed_query(query)
+        # Generate query embeddings
+        if query_embeddings is None:
+            query_embeddings = self._embed_queries(queries, config)
+        hybrid = search_mode == "hybrid"
+        lexical_index = self._get_lexical_index(collection_name, collection) if hybrid else None
 
-            # Search
+        # Search
+        batch_size = self._get_query_batch_size(len(queries))
+        all_results: List[List[Dict[str, Any]]] = []
+        for start in range(0, len(queries), batch_size):
             results = collection.query(
-                query_embeddings=[query_embedding],  # type: ignore
-                n_results=k,
-                include=["documents", "metadatas", "distances"]
+                query_embeddings=query_embeddings[start:start + batch_size],  # type: ignore
+                n_results=max(k, HYBRID_CANDIDATES) if hybrid else k,
+                include=["documents", "metadatas", "distances"],
+                **filters
+            )
+            count = min(batch_size, len(queries) - start)
+            if lexical_index is None:
+                all_results.extend(self._format_results(results, i) for i in range(count))
+                continue
+            all_results.extend(
+                self._fuse_hybrid_results(collection, lexical_index, queries[start + i], results, i, k, filters)
+                for i in range(count)
             )
 
-            # Format results
-            documents = []
-            if results["documents"] and results["metadatas"] and results["distances"]:
-                for i in range(len(results["documents"][0])):
-                    documents.append({
-                        "text": results["documents"][0][i],
-                        "metadata": results["metadatas"][0][i],
-                        "score": 1.0 - float(results["distances"][0][i])  # Convert distance to similarity score
-                    })
+        return all_results
 
-            return documents
+    def iter_records(self, collection_name: str, batch_size: Optional[int] = None) -> Iterator[RecordBatch]:
+        """Stream a space's IDs, stored embeddings, texts and metadata in batches."""
+        batch_size = batch_size or self._get_write_batch_size()
+        if self.is_flat_collection(collection_name):
+            yield from self._flat_store.iter_records(collection_name, batch_size)
+            return
+        collection = self._get_live_collection(collection_name)
+        offset = 0
+        while True:
+            result = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            ids = list(result.get("ids") or [])
+            if ids:
+                yield (
+                    ids,
+                    np.asarray(result["embeddings"], dtype=np.float32),
+                    list(result["documents"]),
+                    [metadata or {} for metadata in result["metadatas"]],
+                )
+            if len(ids) < batch_size:
+                return
+            offset += batch_size
+
+    def load_records(self, collection_name: str, batches: Iterable[RecordBatch]) -> int:
+        """Bulk-load pre-computed embeddings into a configured space without calling the embeddings API.
+
+        Rows are upserted by ID, so loading the same records twice is harmless.
+        As in ``upsert_documents``, the next batch is read while the previous
+        one is being written. Returns the number of rows loaded.
+        """
+        if self.is_flat_collection(collection_name):
+            return self._flat_store.load_records(collection_name, batches)
+        loaded = 0
+        try:
+            collection = self._get_live_collection(collection_name, create=True)
+            lexical_index = self._get_lexical_index(collection_name, collection)
+            filter_keys: Set[str] = set()
+            batch_size = self._get_write_batch_size()
+            with ThreadPoolExecutor(max_workers=1) as writer:
+                pending: Optional[Future] = None
+                for ids, embeddings, texts, metadatas in batches:
+                    for start in range(0, len(ids), batch_size):
+                        end = start + batch_size
+                        batch_metadata = metadatas[start:end]
+                        filter_keys.update(self._metadata_filter_keys(batch_metadata))
+                        payload: Dict[str, Any] = {
+                            "ids": ids[start:end],
+                            "embeddings": embeddings[start:end],
+                            "documents": texts[start:end],
+                            "metadatas": self._chroma_metadatas(batch_metadata),
+                        }
+                        if pending is not None:
+                            pending.result()
+                        pending = writer.submit(self._write_batch, collection.upsert, lexical_index, payload)
+                        loaded += len(payload["ids"])
+                if pending is not None:
+                    pending.result()
+
+            self._update_filterable_keys(collection_name, filter_keys, loaded)
+            return loaded
 
         except Exception as e:
-            raise Exception(f"Failed to search in ChromaDB: {str(e)}")
+            raise Exception(f"Failed to load records into ChromaDB: {str(e)}")
 
-    def get_existing_collections(self) -> List[str]:
-        """Get list of existing collections."""
+    def export_snapshot(self, collection_name: str, path: str, dtype: Optional[str] = None) -> Dict[str, Any]:
+        """Export a space to a compact snapshot directory that ``import_snapshot`` can restore.
+
+        The snapshot holds the stored embeddings as one matrix in ``dtype``
+        (float32, float16 or int8; defaults to the space's quantization, which
+        loses nothing since stored vectors already have that precision) next
+        to a JSONL file of IDs, texts and metadata, plus a manifest with the
+        space's embedding, backend and index settings. Records are streamed,
+        so memory use does not grow with the space. Returns the manifest.
+        """
+        if collection_name not in self.get_existing_collections():
+            raise ValueError(f"Collection '{collection_name}' does not exist")
+        if self.is_flat_collection(collection_name):
+            config = self._flat_store.get_collection_config(collection_name)
+        else:
+            config = self._get_collection_config(self.get_collection(collection_name))
+        settings = self.get_index_settings(collection_name)
+        manifest = {
+            "collection": collection_name,
+            "embedding_model": getattr(self._embedding_function, "model_name", None),
+            "embedding_dimensions": config.get("embedding_dimensions"),
+            "quantization": validate_quantization(config.get("quantization")),
+            "backend": settings["backend"],
+            "hnsw": settings["hnsw"],
+        }
+        try:
+            manifest = write_snapshot(
+                path, manifest, self.iter_records(collection_name), dtype or manifest["quantization"]
+            )
+        except Exception as e:
+            raise Exception(f"Failed to export snapshot: {str(e)}")
+        logger.info(f"Exported {manifest['count']} chunks of '{collection_name}' to {path}")
+        return manifest
+
+    def import_snapshot(self, path: str, collection_name: Optional[str] = None) -> Dict[str, Any]:
+        """Restore a snapshot written by ``export_snapshot``, streaming it in write batches.
+
+        The space is created with the snapshot's settings (or must already
+        exist with the same ones) and the stored embeddings are loaded as-is,
+        so nothing is re-embedded. ``collection_name`` restores under a
+        different name. Returns the snapshot manifest with the number of
+        chunks loaded.
+        """
+        manifest = read_manifest(path)
+        collection_name = collection_name or manifest["collection"]
+        model = getattr(self._embedding_function, "model_name", None)
+        if manifest.get("embedding_model") and model and manifest["embedding_model"] != model:
+            raise ValueError(
+                f"Snapshot was embedded with {manifest['embedding_model']}, but this store uses {model}"
+            )
+        self.configure_collection(
+            collection_name,
+            manifest.get("embedding_dimensions"),
+            manifest.get("quantization"),
+            manifest.get("backend"),
+            manifest.get("hnsw") or None
+        )
+        loaded = self.load_records(collection_name, iter_snapshot(path, self._get_write_batch_size()))
+        logger.info(f"Imported {loaded} chunks from {path} into '{collection_name}'")
+        return {**manifest, "collection": collection_name, "loaded": loaded}
+
+    def _get_chroma_collections(self) -> List[str]:
         try:
             return [col.name for col in self._chroma_client.list_collections()]
         except Exception as e:
             raise Exception(f"Failed to get collections from ChromaDB: {str(e)}")
 
+    def get_existing_collections(self) -> List[str]:
+        """Get list of existing collections, including flat spaces."""
+        return self._get_chroma_collections() + self._flat_store.get_existing_collections()
+
     def delete_collection(self, collection_name: str) -> None:
         """Delete a collection from ChromaDB."""
+        if self.is_flat_collection(collection_name):
+            self._flat_store.delete_collection(collection_name)
+            return
+        self._invalidate_collection(collection_name)
         try:
             self._chroma_client.delete_collection(collection_name)
+            lexical_index = self._get_lexical_index(collection_name)
+            if lexical_index is not None:
+                lexical_index.clear()
+            with self._collection_lock:
+                self._lexical_indexes.pop(collection_name, None)
         except Exception as e:
             raise Exception(f"Failed to delete collection from ChromaDB: {str(e)}")
 
@@ -0,0 +1,220 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Retrieval modes: dense vectors only, or dense and BM25 rankings fused with RRF
+SEARCH_MODES = ("vector", "hybrid")
+
+_WORD_PATTERN = re.compile(r"\w+")
+# Identifiers such as file names, S3 paths and dotted/dashed system names, kept whole
+_IDENTIFIER_PATTERN = re.compile(r"\w[\w./:@-]*\w")
+_IDENTIFIER_SEPARATORS = re.compile(r"[./:@-]")
+
+# Rewrite the log once it holds this many entries more than there are live chunks
+_COMPACT_MIN_DEAD_ENTRIES = 1000
+
+
+def validate_search_mode(search_mode: Optional[str]) -> str:
+    """Normalise a search mode name, defaulting to dense vector search."""
+    search_mode = (search_mode or "vector").lower()
+    if search_mode not in SEARCH_MODES:
+        raise ValueError(f"Unsupported search mode: {search_mode}. Supported: {', '.join(SEARCH_MODES)}")
+    return search_mode
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words plus whole identifiers.
+
+    ``s3://bucket/exports/orders.csv`` yields the full path as one term as
+    well as ``s3``, ``bucket``, ``exports``, ``orders`` and ``csv``, so an
+    exact identifier in a query scores far above chunks sharing only its parts.
+    """
+    text = text.lower()
+    tokens = _WORD_PATTERN.findall(text)
+    tokens.extend(
+        identifier for identifier in _IDENTIFIER_PATTERN.findall(text)
+        if _IDENTIFIER_SEPARATORS.search(identifier)
+    )
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists; each list contributes ``1 / (k + rank)`` per ID, best first."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """BM25 inverted index over one collection's chunks, persisted as an append-only log.
+
+    Writes append one JSON line per batch (term frequencies of added chunks or
+    IDs of deleted ones), so indexing cost is proportional to the batch rather
+    than the collection. Readers replay only the log tail written since they
+    last looked, which also picks up writes from other processes sharing the
+    directory. When deletions leave the log mostly dead it is rewritten in
+    place of the old one; readers notice the new file and reload it.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, List[str]] = {}
+        self._total_length = 0
+        self._log_entries = 0
+        self._offset = 0
+        self._inode: Optional[int] = None
+
+    def exists(self) -> bool:
+        """Whether the index has been written to disk."""
+        return os.path.exists(self.path)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._lengths)
+
+    def _refresh(self) -> None:
+        """Apply log entries appended since the last read, reloading if the log was replaced."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._reset()
+            self._inode = stat.st_ino
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # A line still being written has no newline yet; it is picked up next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += end
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        self._log_entries += 1
+        if entry.get("op") == "delete":
+            for doc_id in entry["ids"]:
+                self._remove(doc_id)
+            return
+        for doc_id, frequencies in entry["docs"]:
+            self._remove(doc_id)
+            for term, count in frequencies.items():
+                self._postings.setdefault(term, {})[doc_id] = count
+            length = sum(frequencies.values())
+            self._lengths[doc_id] = length
+            self._terms[doc_id] = list(frequencies)
+            self._total_length += length
+
+    def _remove(self, doc_id: str) -> None:
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._terms.pop(doc_id):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._refresh()
+        # One write per entry keeps concurrent appends from interleaving within a line
+        with open(self.path, "ab") as f:
+            f.write((json.dumps(entry) + "\n").encode("utf-8"))
+        self._refresh()
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index chunks, replacing any earlier entry for the same ID."""
+        if not ids:
+            return
+        docs = [[doc_id, dict(Counter(tokenize(str(text))))] for doc_id, text in zip(ids, texts)]
+        with self._lock:
+            self._append({"op": "add", "docs": docs})
+
+    def build(self, batches: Iterable[Tuple[Sequence[str], Sequence[str]]]) -> None:
+        """Write a new index from (ids, texts) batches; it appears on disk only once complete."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.build"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for ids, texts in batches:
+                    if ids:
+                        docs = [[doc_id, dict(Counter(tokenize(str(text))))] for doc_id, text in zip(ids, texts)]
+                        f.write(json.dumps({"op": "add", "docs": docs}) + "\n")
+            os.replace(tmp_path, self.path)
+            self._reset()
+            self._refresh()
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Remove chunks from the index."""
+        ids = list(ids)
+        if not ids:
+            return
+        with self._lock:
+            self._append({"op": "delete", "ids": ids})
+            if self._log_entries - len(self._lengths) > max(len(self._lengths), _COMPACT_MIN_DEAD_ENTRIES):
+                self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the log as a single entry holding only live chunks."""
+        with self._lock:
+            self._refresh()
+            docs = [
+                [doc_id, {term: self._postings[term][doc_id] for term in terms}]
+                for doc_id, terms in self._terms.items()
+            ]
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"op": "add", "docs": docs}) + "\n")
+            os.replace(tmp_path, self.path)
+            self._reset()
+            self._refresh()
+
+    def clear(self) -> None:
+        """Delete the index and its file."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._reset()
+
+    def search(self, query: str, n: int) -> List[Tuple[str, float]]:
+        """Return up to ``n`` (id, BM25 score) pairs for chunks sharing a term with the query, best first."""
+        with self._lock:
+            self._refresh()
+            count = len(self._lengths)
+            if not count or n <= 0:
+                return []
+            average_length = self._total_length / count or 1.0
+            scores: Dict[str, float] = {}
+            for term, query_count in Counter(tokenize(query)).items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1.0 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1.0 - self.b + self.b * self._lengths[doc_id] / average_length)
+                    score = idf * frequency * (self.k1 + 1.0) / (frequency + norm)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + query_count * score
+            return heapq.nlargest(n, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,721 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import numpy as np
+from src.config.settings import CHROMA_WRITE_BATCH_SIZE, HYBRID_CANDIDATES, RRF_K
+from src.embeddings.registry import create_embedding_function
+from src.vector_store.base import BaseVectorStore
+from src.vector_store.lexical_index import LexicalIndex, reciprocal_rank_fusion, validate_search_mode
+from src.vector_store.quantization import dequantize, quantize, validate_quantization
+from src.vector_store.snapshot import RecordBatch
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+_CONFIG_FILE = "config.json"
+# Vectors are stored in the space's quantization; int8 rows also have a float32 scale
+_VECTOR_FILES = {"float32": "vectors.f32", "float16": "vectors.f16", "int8": "vectors.i8"}
+_VECTOR_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+_SCALES_FILE = "scales.f32"
+_RECORDS_FILE = "records.jsonl"
+_LEXICAL_FILE = "lexical.jsonl"
+
+_SPACE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+# Distance spaces, named as in Chroma; scores are 1 - distance in every backend
+DISTANCE_SPACES = ("l2", "cosine", "ip")
+
+# Queries scored per matrix product; bounds the (rows x queries) distance matrix
+_QUERY_CHUNK_SIZE = 256
+# Stored rows converted to float32 at a time when scoring quantized spaces
+_ROW_CHUNK_SIZE = 65536
+
+
+def _safe_compare(compare: Callable[[Any, Any], bool]) -> Callable[[Any, Any], bool]:
+    def wrapped(value: Any, operand: Any) -> bool:
+        try:
+            return bool(compare(value, operand))
+        except TypeError:
+            # Missing keys and mismatched types never satisfy an ordering comparison
+            return False
+    return wrapped
+
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": _safe_compare(lambda value, operand: value > operand),
+    "$gte": _safe_compare(lambda value, operand: value >= operand),
+    "$lt": _safe_compare(lambda value, operand: value < operand),
+    "$lte": _safe_compare(lambda value, operand: value <= operand),
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Evaluate a Chroma-style ``where`` filter against one chunk's metadata."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator not in _OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                if not _OPERATORS[operator](value, operand):
+                    return False
+    return True
+
+
+def matches_document(text: str, where_document: Dict[str, Any]) -> bool:
+    """Evaluate a Chroma-style ``where_document`` filter against one chunk's text."""
+    for operator, operand in where_document.items():
+        if operator == "$contains":
+            matched = operand in text
+        elif operator == "$not_contains":
+            matched = operand not in text
+        elif operator == "$regex":
+            matched = re.search(operand, text) is not None
+        elif operator == "$and":
+            matched = all(matches_document(text, clause) for clause in operand)
+        elif operator == "$or":
+            matched = any(matches_document(text, clause) for clause in operand)
+        else:
+            raise ValueError(f"Unsupported document filter operator: {operator}")
+        if not matched:
+            return False
+    return True
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class _FlatSpace:
+    """One space loaded from disk: its records plus a read-only mapping of its stored vectors.
+
+    ``vectors`` holds the values as stored: float32, float16 or int8 with
+    per-row ``scales``. Spaces created before vectors were stored quantized
+    have no ``vector_dtype`` in their config and keep float32 files.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.signature = self.current_signature(path)
+        with open(os.path.join(path, _CONFIG_FILE), encoding="utf-8") as f:
+            self.config: Dict[str, Any] = json.load(f)
+        self.vector_dtype = validate_quantization(self.config.get("vector_dtype"))
+
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        records_path = os.path.join(path, _RECORDS_FILE)
+        if os.path.exists(records_path):
+            with open(records_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    self.ids.append(record["id"])
+                    self.texts.append(record["text"])
+                    self.metadatas.append(record.get("metadata") or {})
+
+        dimensions = self.config.get("dimensions") or 0
+        dtype = _VECTOR_DTYPES[self.vector_dtype]
+        vectors_path = self.vectors_path
+        rows = 0
+        if dimensions and os.path.exists(vectors_path):
+            rows = os.path.getsize(vectors_path) // (dimensions * np.dtype(dtype).itemsize)
+            if self.vector_dtype == "int8":
+                rows = min(rows, os.path.getsize(self.scales_path) // 4 if os.path.exists(self.scales_path) else 0)
+        # A writer appends vectors before records, so trust only rows present in both
+        count = min(rows, len(self.ids))
+        del self.ids[count:], self.texts[count:], self.metadatas[count:]
+        self.scales: Optional[np.ndarray] = None
+        if count:
+            self.vectors: np.ndarray = np.memmap(vectors_path, dtype=dtype, mode="r", shape=(count, dimensions))
+            if self.vector_dtype == "int8":
+                self.scales = np.memmap(self.scales_path, dtype=np.float32, mode="r", shape=(count,))
+        else:
+            self.vectors = np.empty((0, dimensions), dtype=dtype)
+            if self.vector_dtype == "int8":
+                self.scales = np.empty(0, dtype=np.float32)
+        self.sq_norms = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _ROW_CHUNK_SIZE):
+            block = self.get_vectors(slice(start, start + _ROW_CHUNK_SIZE))
+            self.sq_norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+        self.row_by_id = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.path, _VECTOR_FILES[self.vector_dtype])
+
+    @property
+    def scales_path(self) -> str:
+        return os.path.join(self.path, _SCALES_FILE)
+
+    def get_vectors(self, index: Any) -> np.ndarray:
+        """Float32 vectors of the rows selected by a slice or an array of row numbers."""
+        values = self.vectors[index]
+        if self.vector_dtype == "float32":
+            return values
+        scales = None if self.scales is None else np.asarray(self.scales[index])
+        return dequantize(np.asarray(values), scales, self.vector_dtype)
+
+    @staticmethod
+    def current_signature(path: str) -> Tuple[Any, ...]:
+        names = (_CONFIG_FILE, *_VECTOR_FILES.values(), _SCALES_FILE, _RECORDS_FILE)
+        return tuple(_file_signature(os.path.join(path, name)) for name in names)
+
+    @property
+    def filter_keys(self) -> Set[str]:
+        return set(self.config.get("filterable_keys") or [])
+
+    def filter_rows(
+        self, where: Optional[Dict[str, Any]], where_document: Optional[Dict[str, Any]]
+    ) -> Optional[np.ndarray]:
+        """Rows matching the filters, or None when every row is a candidate."""
+        if not where and not where_document:
+            return None
+        return np.asarray([
+            row for row, (text, metadata) in enumerate(zip(self.texts, self.metadatas))
+            if (not where or matches_where(metadata, where))
+            and (not where_document or matches_document(text, where_document))
+        ], dtype=np.int64)
+
+
+class NumpyStore(BaseVectorStore):
+    """Brute-force vector store keeping each space in a memory-mapped, optionally quantized vector file.
+
+    Processes share the read-only mapping through the page cache; writers to a space take an ``flock``.
+    """
+
+    def __init__(
+        self,
+        persist_directory: Optional[str] = None,
+        embedding_function: Optional[Any] = None,
+        embedding_backend: Optional[str] = None
+    ):
+        self._persist_directory = persist_directory or os.path.join(os.getcwd(), "flat_store")
+        self._embedding_function = embedding_function or create_embedding_function(
+            embedding_backend,
+            cache_directory=self._persist_directory
+        )
+        self._dimension_embedding_functions: Dict[int, Any] = {}
+        self._removal_listeners: List[Callable[[str, List[str]], None]] = []
+        self._spaces: Dict[str, _FlatSpace] = {}
+        # BM25 indexes keyed by space directory; they follow their log files across remaps
+        self._lexical_indexes: Dict[str, LexicalIndex] = {}
+        # Guards the caches above; never held while waiting for a space's file lock
+        self._lock = threading.RLock()
+        # Per-space write locks within this process, taken before the file lock
+        self._space_locks: Dict[str, threading.RLock] = {}
+        # Spaces whose file lock this process holds, so writes can nest
+        self._file_locked: Set[str] = set()
+
+    def _space_path(self, collection_name: str) -> str:
+        if not _SPACE_NAME_PATTERN.match(collection_name):
+            raise ValueError(f"Invalid space name: {collection_name}")
+        return os.path.join(self._persist_directory, collection_name)
+
+    @contextmanager
+    def _write_lock(self, collection_name: str) -> Iterator[None]:
+        """Hold the exclusive write lock of a space, in this process and across processes."""
+        path = self._space_path(collection_name)
+        with self._lock:
+            space_lock = self._space_locks.setdefault(collection_name, threading.RLock())
+        # Readers only need the cache lock, so they keep going while a writer waits here
+        with space_lock:
+            if fcntl is None or collection_name in self._file_locked:
+                yield
+                return
+            os.makedirs(self._persist_directory, exist_ok=True)
+            lock_path = os.path.join(os.path.dirname(path), f".{collection_name}.lock")
+            with open(lock_path, "a") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                self._file_locked.add(collection_name)
+                try:
+                    yield
+                finally:
+                    self._file_locked.discard(collection_name)
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def has_collection(self, collection_name: str) -> bool:
+        """Whether a space with this name is stored here."""
+        if not _SPACE_NAME_PATTERN.match(collection_name):
+            return False
+        return os.path.isfile(os.path.join(self._persist_directory, collection_name, _CONFIG_FILE))
+
+    def _load_space(self, collection_name: str) -> Optional[_FlatSpace]:
+        """Return the loaded space, remapping it if its files changed since it was loaded."""
+        if not self.has_collection(collection_name):
+            with self._lock:
+                self._spaces.pop(collection_name, None)
+            return None
+        path = self._space_path(collection_name)
+        with self._lock:
+            space = self._spaces.get(collection_name)
+        if space is None or space.signature != _FlatSpace.current_signature(path):
+            space = _FlatSpace(path)
+            with self._lock:
+                self._spaces[collection_name] = space
+        return space
+
+    def _write_config(self, collection_name: str, config: Dict[str, Any]) -> None:
+        path = os.path.join(self._space_path(collection_name), _CONFIG_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        os.replace(tmp_path, path)
+
+    def configure_collection(
+        self,
+        collection_name: str,
+        embedding_dimensions: Optional[int] = None,
+        quantization: Optional[str] = None,
+        space: Optional[str] = None
+    ) -> None:
+        """Create a space with its own embedding size, vector quantization and distance space."""
+        if space is not None and space not in DISTANCE_SPACES:
+            raise ValueError(f"Unsupported distance space: {space}. Supported: {', '.join(DISTANCE_SPACES)}")
+        config = self._embedding_config(embedding_dimensions, quantization)
+        if space:
+            config["space"] = space
+
+        with self._write_lock(collection_name):
+            existing = self._load_space(collection_name)
+            if existing is not None:
+                if any(existing.config.get(key) != value for key, value in config.items()):
+                    raise ValueError(f"Collection '{collection_name}' already exists with a different configuration")
+                return
+            try:
+                os.makedirs(self._space_path(collection_name), exist_ok=True)
+                self._write_config(
+                    collection_name, {**config, "vector_dtype": config["quantization"], "filterable_keys": []}
+                )
+            except Exception as e:
+                raise Exception(f"Failed to configure collection: {str(e)}")
+
+    def _get_query_config(self, collection_name: str) -> Optional[Dict[str, Any]]:
+        space = self._load_space(collection_name)
+        return None if space is None else space.config
+
+    def get_embedding_function(self, collection_name: str) -> Any:
+        """Return the embedding function matching a space's configured dimensions."""
+        space = self._load_space(collection_name)
+        if space is None:
+            return self._embedding_function
+        return self._get_embedding_function_for(space.config.get("embedding_dimensions"))
+
+    def get_collection_config(self, collection_name: str) -> Dict[str, Any]:
+        """Return a space's stored settings (quantization, dimensions, distance space)."""
+        space = self._load_space(collection_name)
+        return dict(space.config) if space is not None else {}
+
+    def get_distance_space(self, collection_name: str) -> str:
+        """Return the distance space a flat space ranks by."""
+        space = self._load_space(collection_name)
+        return space.config.get("space", "l2") if space is not None else "l2"
+
+    def get_filterable_keys(self, collection_name: str) -> List[str]:
+        """Return the metadata keys that can be used in ``where`` filters for a space."""
+        space = self._load_space(collection_name)
+        return sorted(space.filter_keys) if space is not None else []
+
+    def validate_filter(self, collection_name: str, where: Optional[Dict[str, Any]]) -> None:
+        """Raise ValueError if ``where`` uses keys no chunk in the space has."""
+        space = self._load_space(collection_name)
+        if space is not None:
+            self._check_filter_keys(where, space.filter_keys)
+
+    def _get_lexical_index(self, space: _FlatSpace) -> LexicalIndex:
+        """Return a space's BM25 index, building it once from stored chunks if it predates the index."""
+        with self._lock:
+            index = self._lexical_indexes.get(space.path)
+            if index is None:
+                index = self._lexical_indexes[space.path] = LexicalIndex(os.path.join(space.path, _LEXICAL_FILE))
+            if not index.exists() and space.ids:
+                index.add(space.ids, space.texts)
+        return index
+
+    def _append(
+        self,
+        collection_name: str,
+        space: _FlatSpace,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        vectors: np.ndarray
+    ) -> None:
+        """Append rows to a space's files and to its in-memory records."""
+        dimensions = space.config.get("dimensions")
+        if dimensions is None:
+            space.config["dimensions"] = dimensions = int(vectors.shape[1])
+            self._write_config(collection_name, space.config)
+        elif vectors.shape[1] != dimensions:
+            raise ValueError(f"Expected {dimensions}-dimensional embeddings, got {vectors.shape[1]}")
+
+        # Vectors first: readers ignore vectors without a matching record. Rows
+        # left behind by an interrupted writer are cut off so records stay aligned.
+        values, scales = quantize(vectors, space.vector_dtype)
+        with open(space.vectors_path, "ab") as f:
+            f.truncate(len(space.ids) * dimensions * values.dtype.itemsize)
+            f.write(np.ascontiguousarray(values).tobytes())
+        if scales is not None:
+            with open(space.scales_path, "ab") as f:
+                f.truncate(len(space.ids) * scales.dtype.itemsize)
+                f.write(scales.tobytes())
+        with open(os.path.join(space.path, _RECORDS_FILE), "a", encoding="utf-8") as f:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                f.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata}) + "\n")
+
+        self._get_lexical_index(space).add(ids, texts)
+
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            space.row_by_id[doc_id] = len(space.ids)
+            space.ids.append(doc_id)
+            space.texts.append(text)
+            space.metadatas.append(metadata)
+        space.signature = _FlatSpace.current_signature(space.path)
+
+    def _rewrite(self, space: _FlatSpace, keep: List[int]) -> List[str]:
+        """Rewrite a space keeping only the given rows; files are swapped in atomically.
+
+        Returns the IDs of the dropped rows.
+        """
+        dimensions = space.config["dimensions"]
+        vectors_path = space.vectors_path
+        records_path = os.path.join(space.path, _RECORDS_FILE)
+        values = np.fromfile(vectors_path, dtype=_VECTOR_DTYPES[space.vector_dtype]).reshape(-1, dimensions)
+
+        with open(f"{vectors_path}.tmp", "wb") as f:
+            f.write(np.ascontiguousarray(values[keep]).tobytes())
+        if space.vector_dtype == "int8":
+            with open(f"{space.scales_path}.tmp", "wb") as f:
+                f.write(np.fromfile(space.scales_path, dtype=np.float32)[keep].tobytes())
+        with open(f"{records_path}.tmp", "w", encoding="utf-8") as f:
+            for row in keep:
+                record = {"id": space.ids[row], "text": space.texts[row], "metadata": space.metadatas[row]}
+                f.write(json.dumps(record) + "\n")
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+        if space.vector_dtype == "int8":
+            os.replace(f"{space.scales_path}.tmp", space.scales_path)
+        os.replace(f"{records_path}.tmp", records_path)
+        kept = set(keep)
+        removed = [doc_id for row, doc_id in enumerate(space.ids) if row not in kept]
+        self._get_lexical_index(space).delete(removed)
+        return removed
+
+    def _open_session(self, collection_name: str, session: Optional[_FlatSpace] = None) -> _FlatSpace:
+        """Return a private copy of a space for a writer, reloading it only if another writer changed the files.
+
+        Call with the write lock held. Writers append to their copy, so the
+        cached mapping searches use is never modified in place.
+        """
+        path = self._space_path(collection_name)
+        if session is None or session.signature != _FlatSpace.current_signature(path):
+            session = _FlatSpace(path)
+        return session
+
+    def _finish_session(self, collection_name: str, session: _FlatSpace, filter_keys: Set[str]) -> None:
+        """Record new filterable keys and drop the cached mapping so the next read remaps the files once."""
+        if not filter_keys <= session.filter_keys:
+            session.config["filterable_keys"] = sorted(session.filter_keys | filter_keys)
+            self._write_config(collection_name, session.config)
+        with self._lock:
+            self._spaces.pop(collection_name, None)
+
+    def add_documents(
+        self, documents: Iterable[Any], collection_name: str, replace_sources: bool = False
+    ) -> Dict[str, int]:
+        """Add documents to a space, skipping chunks that are already stored."""
+        return self.upsert_documents(documents, collection_name, replace_sources)
+
+    def upsert_documents(
+        self, documents: Iterable[Any], collection_name: str, replace_sources: bool = False
+    ) -> Dict[str, int]:
+        """Incrementally ingest documents into a space.
+
+        Same contract as ``ChromaStore.upsert_documents``: content-derived IDs,
+        existing chunks skipped without embedding, stale chunks of re-ingested
+        sources removed only with ``replace_sources=True``, and an
+        added/skipped/replaced/deduplicated report returned.
+        """
+        report = {"added": 0, "skipped": 0, "replaced": 0, "deduplicated": 0}
+        batches = self._write_batches(documents, CHROMA_WRITE_BATCH_SIZE)
+        # Handle empty document list
+        if batches is None:
+            return report
+
+        try:
+            with self._write_lock(collection_name):
+                if not self.has_collection(collection_name):
+                    self.configure_collection(collection_name)
+                # One session for the whole upsert: batches append to it and the
+                # files are remapped once at the end, not after every batch
+                session = self._open_session(collection_name)
+
+            seen: Set[str] = set()
+            sources: Set[str] = set()
+            filter_keys: Set[str] = set()
+            for batch in batches:
+                texts, metadata, ids, candidates = self._prepare_upsert_batch(batch, seen, sources)
+                new = [i for i in candidates if ids[i] not in session.row_by_id]
+                stored: List[int] = []
+                if new:
+                    # Embed without the write lock; only the file updates are serialised
+                    vectors = np.asarray(
+                        self._embed_documents([texts[i] for i in new], session.config), dtype=np.float32
+                    )
+                    with self._write_lock(collection_name):
+                        session = self._open_session(collection_name, session)
+                        # Another writer may have stored some of these chunks meanwhile
+                        stored = [j for j, i in enumerate(new) if ids[i] not in session.row_by_id]
+                        if stored:
+                            new_metadata = [metadata[new[j]] for j in stored]
+                            self._append(
+                                collection_name,
+                                session,
+                                [ids[new[j]] for j in stored],
+                                [texts[new[j]] for j in stored],
+                                new_metadata,
+                                vectors[stored]
+                            )
+                            filter_keys.update(self._metadata_filter_keys(new_metadata))
+                self._count_upsert_batch(report, len(texts), [texts[new[j]] for j in stored])
+
+            with self._write_lock(collection_name):
+                session = self._open_session(collection_name, session)
+                # Drop chunks of re-ingested sources that no longer exist in them
+                records = zip(session.ids, session.metadatas)
+                stale = set(self._stale_ids(records, seen, sources) if replace_sources else ())
+                if stale:
+                    keep = [row for row, doc_id in enumerate(session.ids) if doc_id not in stale]
+                    report["replaced"] = len(session.ids) - len(keep)
+                    self._notify_removed(collection_name, self._rewrite(session, keep))
+                self._finish_session(collection_name, session, filter_keys)
+
+            self._log_upsert(f"flat space '{collection_name}'", report)
+            return report
+
+        except Exception as e:
+            raise Exception(f"Failed to add documents to flat store: {str(e)}")
+
+    def iter_records(self, collection_name: str, batch_size: int) -> Iterator[RecordBatch]:
+        """Stream a space's IDs, stored vectors, texts and metadata in row order."""
+        space = self._load_space(collection_name)
+        if space is None:
+            raise ValueError(f"Collection '{collection_name}' does not exist")
+        for start in range(0, len(space.ids), batch_size):
+            end = start + batch_size
+            yield (
+                space.ids[start:end],
+                np.asarray(space.get_vectors(slice(start, end)), dtype=np.float32),
+                space.texts[start:end],
+                space.metadatas[start:end],
+            )
+
+    def load_records(self, collection_name: str, batches: Iterable[RecordBatch]) -> int:
+        """Bulk-load pre-computed vectors into a configured space without embedding.
+
+        Rows whose ID is already stored are skipped. Returns the number of rows added.
+        """
+        added = 0
+        try:
+            with self._write_lock(collection_name):
+                if not self.has_collection(collection_name):
+                    raise ValueError(f"Collection '{collection_name}' does not exist")
+                space = self._open_session(collection_name)
+                filter_keys: Set[str] = set()
+                for ids, vectors, texts, metadatas in batches:
+                    new = [i for i, doc_id in enumerate(ids) if doc_id not in space.row_by_id]
+                    if not new:
+                        continue
+                    new_metadata = [metadatas[i] or {} for i in new]
+                    self._append(
+                        collection_name,
+                        space,
+                        [ids[i] for i in new],
+                        [texts[i] for i in new],
+                        new_metadata,
+                        np.asarray(vectors, dtype=np.float32)[new]
+                    )
+                    filter_keys.update(self._metadata_filter_keys(new_metadata))
+                    added += len(new)
+                self._finish_session(collection_name, space, filter_keys)
+            return added
+
+        except Exception as e:
+            raise Exception(f"Failed to load records into flat store: {str(e)}")
+
+    def similarity_search(
+        self,
+        query: str,
+        collection_name: str,
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        search_mode: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Search for similar documents in a space."""
+        return self.similarity_search_batch([query], collection_name, k, where, where_document, search_mode)[0]
+
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        collection_name: str,
+        k: int = 4,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        search_mode: Optional[str] = None,
+        query_embeddings: Optional[Any] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for many queries at once with one embeddings call and one matrix product per chunk.
+
+        ``search_mode="hybrid"`` fuses the vector ranking with BM25 over the
+        space's lexical index by reciprocal rank fusion, as in ``ChromaStore``.
+        ``query_embeddings`` skips embedding when the caller already did it.
+        """
+        if not queries:
+            return []
+        hybrid = validate_search_mode(search_mode) == "hybrid"
+        try:
+            space = self._load_space(collection_name)
+            if space is None or not space.ids or k <= 0:
+                return [[] for _ in queries]
+            self._check_filter_keys(where, space.filter_keys)
+
+            rows = space.filter_rows(where, where_document)
+            if rows is not None and not len(rows):
+                return [[] for _ in queries]
+            sq_norms = space.sq_norms if rows is None else space.sq_norms[rows]
+            top_k = min(max(k, HYBRID_CANDIDATES) if hybrid else k, len(sq_norms))
+            lexical_index = self._get_lexical_index(space) if hybrid else None
+            allowed = None if rows is None else set(rows.tolist())
+
+            if query_embeddings is None:
+                query_embeddings = self._embed_queries(queries, space.config)
+            query_matrix = np.asarray(query_embeddings, dtype=np.float32)
+            distance_space = space.config.get("space", "l2")
+            all_results: List[List[Dict[str, Any]]] = []
+            for start in range(0, len(query_matrix), _QUERY_CHUNK_SIZE):
+                block = query_matrix[start:start + _QUERY_CHUNK_SIZE]
+                distances = self._space_distances(space, rows, sq_norms, block, distance_space)
+                for column in distances.T:
+                    if top_k < len(column):
+                        nearest = np.argpartition(column, top_k - 1)[:top_k]
+                    else:
+                        nearest = np.arange(len(column))
+                    nearest = nearest[np.argsort(column[nearest], kind="stable")]
+                    ranked = [(int(rows[index]) if rows is not None else int(index), index) for index in nearest]
+                    if lexical_index is not None:
+                        all_results.append(self._fuse_hybrid_results(
+                            space, lexical_index, queries[len(all_results)], [row for row, _ in ranked], allowed, k
+                        ))
+                        continue
+                    all_results.append([
+                        {
+                            "text": space.texts[row],
+                            "metadata": space.metadatas[row],
+                            "score": 1.0 - float(column[index])
+                        }
+                        for row, index in ranked
+                    ])
+            return all_results
+
+        except Exception as e:
+            raise Exception(f"Failed to search in flat store: {str(e)}")
+
+    @staticmethod
+    def _fuse_hybrid_results(
+        space: _FlatSpace,
+        lexical_index: LexicalIndex,
+        query: str,
+        dense_rows: List[int],
+        allowed: Optional[Set[int]],
+        k: int
+    ) -> List[Dict[str, Any]]:
+        """Fuse one query's vector ranking with its BM25 candidates by reciprocal rank fusion."""
+        lexical_rows = []
+        for doc_id, _ in lexical_index.search(query, max(k, HYBRID_CANDIDATES)):
+            row = space.row_by_id.get(doc_id)
+            if row is not None and (allowed is None or row in allowed):
+                lexical_rows.append(row)
+        rankings = [[space.ids[row] for row in dense_rows], [space.ids[row] for row in lexical_rows]]
+        return [
+            {
+                "text": space.texts[space.row_by_id[doc_id]],
+                "metadata": space.metadatas[space.row_by_id[doc_id]],
+                "score": score
+            }
+            for doc_id, score in reciprocal_rank_fusion(rankings, RRF_K)[:k]
+        ]
+
+    @classmethod
+    def _space_distances(
+        cls,
+        space: _FlatSpace,
+        rows: Optional[np.ndarray],
+        sq_norms: np.ndarray,
+        queries: np.ndarray,
+        distance_space: str
+    ) -> np.ndarray:
+        """(rows x queries) distances over a space's stored vectors, converting one row chunk at a time."""
+        distances = np.empty((len(sq_norms), len(queries)), dtype=np.float32)
+        for start in range(0, len(sq_norms), _ROW_CHUNK_SIZE):
+            end = min(start + _ROW_CHUNK_SIZE, len(sq_norms))
+            index = slice(start, end) if rows is None else rows[start:end]
+            distances[start:end] = cls._distances(
+                space.get_vectors(index), sq_norms[start:end], queries, distance_space
+            )
+        return distances
+
+    @staticmethod
+    def _distances(vectors: np.ndarray, sq_norms: np.ndarray, queries: np.ndarray, space: str) -> np.ndarray:
+        """(rows x queries) distances, defined as in Chroma so scores match across backends."""
+        dots = vectors @ queries.T
+        if space == "ip":
+            return 1.0 - dots
+        query_sq_norms = np.einsum("ij,ij->i", queries, queries)
+        if space == "cosine":
+            norms = np.sqrt(np.maximum(sq_norms, 1e-12))[:, None] * np.sqrt(np.maximum(query_sq_norms, 1e-12))[None, :]
+            return 1.0 - dots / norms
+        # Squared L2, Chroma's default space
+        return sq_norms[:, None] + query_sq_norms[None, :] - 2.0 * dots
+
+    def get_existing_collections(self) -> List[str]:
+        """Get list of existing spaces."""
+        if not os.path.isdir(self._persist_directory):
+            return []
+        return sorted(name for name in os.listdir(self._persist_directory) if self.has_collection(name))
+
+    def delete_collection(self, collection_name: str) -> None:
+        """Delete a space and its files."""
+        try:
+            with self._write_lock(collection_name):
+                with self._lock:
+                    self._spaces.pop(collection_name, None)
+                    self._lexical_indexes.pop(self._space_path(collection_name), None)
+                shutil.rmtree(self._space_path(collection_name))
+        except Exception as e:
+            raise Exception(f"Failed to delete collection from flat store: {str(e)}")
@@ -0,0 +1,72 @@
+from typing import Optional, Tuple
+import numpy as np
+
+QUANTIZATION_TYPES = ("float32", "float16", "int8")
+
+
+def validate_quantization(quantization: Optional[str]) -> str:
+    """Normalise a quantization name, defaulting to full float32 precision."""
+    quantization = (quantization or "float32").lower()
+    if quantization not in QUANTIZATION_TYPES:
+        raise ValueError(f"Unsupported quantization: {quantization}. Expected one of {QUANTIZATION_TYPES}")
+    return quantization
+
+
+def quantize(matrix: np.ndarray, quantization: Optional[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Quantize a (n, dim) float matrix.
+
+    Returns the compact values and, for int8, the per-row float32 scales needed
+    to reconstruct them (symmetric scaling so that each row's largest
+    magnitude maps to 127).
+    """
+    quantization = validate_quantization(quantization)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if quantization == "float32":
+        return matrix, None
+    if quantization == "float16":
+        return matrix.astype(np.float16), None
+
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    values = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return values, scales.astype(np.float32)
+
+
+def dequantize(values: np.ndarray, scales: Optional[np.ndarray], quantization: Optional[str]) -> np.ndarray:
+    """Reconstruct a float32 matrix from quantized values."""
+    quantization = validate_quantization(quantization)
+    if quantization == "int8":
+        if scales is None:
+            raise ValueError("int8 dequantization requires per-row scales")
+        return values.astype(np.float32) * scales[:, None]
+    return values.astype(np.float32, copy=False)
+
+
+def apply_quantization(matrix: np.ndarray, quantization: Optional[str]) -> np.ndarray:
+    """Round-trip vectors through a quantization so stored and query vectors share its precision."""
+    values, scales = quantize(matrix, quantization)
+    return dequantize(values, scales, quantization)
+
+
+def bytes_per_vector(dimensions: int, quantization: Optional[str]) -> int:
+    """Storage cost of one vector, including the int8 scale."""
+    quantization = validate_quantization(quantization)
+    if quantization == "int8":
+        return dimensions + 4
+    return dimensions * (2 if quantization == "float16" else 4)
+
+
+def truncate_dimensions(matrix: np.ndarray, dimensions: Optional[int]) -> np.ndarray:
+    """Shorten embeddings to their first ``dimensions`` components and re-normalise.
+
+    This mirrors what the OpenAI ``dimensions`` parameter does for the
+    text-embedding-3 models, so full-size vectors can be compared against
+    reduced ones without re-embedding.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if not dimensions or dimensions >= matrix.shape[1]:
+        return matrix
+    truncated = matrix[:, :dimensions]
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return truncated / norms
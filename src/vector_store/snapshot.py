@@ -0,0 +1,146 @@
+import json
+import os
+import shutil
+import tempfile
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from src.vector_store.quantization import dequantize, quantize, validate_quantization
+
+SNAPSHOT_VERSION = 1
+
+_MANIFEST_FILE = "manifest.json"
+_EMBEDDINGS_FILE = "embeddings.bin"
+_SCALES_FILE = "scales.f32"
+_RECORDS_FILE = "records.jsonl"
+
+_NUMPY_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# One batch of a space: IDs, a (rows, dim) float32 matrix, texts and metadata in row order
+RecordBatch = Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]
+
+
+def _check_replaceable(path: str) -> None:
+    """Refuse to overwrite anything at ``path`` other than an earlier snapshot."""
+    if os.path.lexists(path) and not (
+        os.path.isdir(path) and not os.path.islink(path) and os.path.isfile(os.path.join(path, _MANIFEST_FILE))
+    ):
+        raise ValueError(f"Refusing to overwrite {path}: it exists and is not a snapshot directory")
+
+
+def write_snapshot(
+    path: str,
+    manifest: Dict[str, Any],
+    batches: Iterable[RecordBatch],
+    dtype: Optional[str] = None
+) -> Dict[str, Any]:
+    """Write a space snapshot directory from a stream of record batches.
+
+    Embeddings are appended to ``embeddings.bin`` as a raw row-major matrix in
+    ``dtype`` (float32, float16 or int8 with per-row scales in
+    ``scales.f32``); IDs, texts and metadata go to ``records.jsonl`` in the
+    same row order. Only one batch is held in memory. The snapshot is built
+    next to ``path`` and moved into place when complete, so an interrupted
+    export never leaves a partial snapshot behind. An existing snapshot at
+    ``path`` is replaced; anything else there raises ValueError. Returns the
+    manifest.
+    """
+    dtype = validate_quantization(dtype)
+    path = path.rstrip(os.sep) or os.sep
+    _check_replaceable(path)
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=parent)
+
+    count = 0
+    dimensions: Optional[int] = None
+    try:
+        with open(os.path.join(tmp_path, _EMBEDDINGS_FILE), "wb") as vectors_file, \
+                open(os.path.join(tmp_path, _RECORDS_FILE), "w", encoding="utf-8") as records_file:
+            scales_file = open(os.path.join(tmp_path, _SCALES_FILE), "wb") if dtype == "int8" else None
+            try:
+                for ids, embeddings, texts, metadatas in batches:
+                    if not ids:
+                        continue
+                    embeddings = np.asarray(embeddings, dtype=np.float32)
+                    if dimensions is None:
+                        dimensions = int(embeddings.shape[1])
+                    elif embeddings.shape[1] != dimensions:
+                        raise ValueError(f"Expected {dimensions}-dimensional embeddings, got {embeddings.shape[1]}")
+                    values, scales = quantize(embeddings, dtype)
+                    vectors_file.write(np.ascontiguousarray(values).tobytes())
+                    if scales_file is not None and scales is not None:
+                        scales_file.write(scales.tobytes())
+                    for doc_id, text, metadata in zip(ids, texts, metadatas):
+                        records_file.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata or {}}) + "\n")
+                    count += len(ids)
+            finally:
+                if scales_file is not None:
+                    scales_file.close()
+
+        manifest = {
+            **manifest,
+            "version": SNAPSHOT_VERSION,
+            "count": count,
+            "dimensions": dimensions,
+            "dtype": dtype,
+        }
+        with open(os.path.join(tmp_path, _MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        _check_replaceable(path)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return manifest
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    """Read and validate a snapshot's manifest."""
+    manifest_path = os.path.join(path, _MANIFEST_FILE)
+    if not os.path.isfile(manifest_path):
+        raise ValueError(f"Not a snapshot directory: {path}")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+    return manifest
+
+
+def iter_snapshot(path: str, batch_size: int) -> Iterator[RecordBatch]:
+    """Stream a snapshot's records in batches with float32 embeddings.
+
+    The embedding file is memory-mapped, so only the current batch is read
+    into memory.
+    """
+    manifest = read_manifest(path)
+    count = manifest["count"]
+    if not count:
+        return
+    dtype = manifest["dtype"]
+    shape = (count, manifest["dimensions"])
+    values = np.memmap(os.path.join(path, _EMBEDDINGS_FILE), dtype=_NUMPY_DTYPES[dtype], mode="r", shape=shape)
+    scales = None
+    if dtype == "int8":
+        scales = np.memmap(os.path.join(path, _SCALES_FILE), dtype=np.float32, mode="r", shape=(count,))
+
+    with open(os.path.join(path, _RECORDS_FILE), encoding="utf-8") as f:
+        records = (json.loads(line) for line in f if line.strip())
+        for start in range(0, count, batch_size):
+            batch = list(islice(records, batch_size))
+            end = start + len(batch)
+            if end > count or len(batch) < min(batch_size, count - start):
+                raise ValueError(f"Snapshot records do not match its {count} embeddings")
+            embeddings = dequantize(
+                np.asarray(values[start:end]),
+                None if scales is None else np.asarray(scales[start:end]),
+                dtype
+            )
+            yield (
+                [record["id"] for record in batch],
+                embeddings,
+                [record["text"] for record in batch],
+                [record.get("metadata") or {} for record in batch],
+            )
@@ -9,6 +9,17 @@ from langchain_openai import ChatOpenAI
 from langchain_core.retrievers import BaseRetriever
 
 
+@pytest.fixture(autouse=True)
+def isolated_llm_cache(monkeypatch, tmp_path):
+    """Keep the shared LLM response cache out of the working directory and separate per test."""
+    import src.llm.llm_cache as llm_cache
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite3"))
+    monkeypatch.setattr(llm_cache, "_llm_cache", None)
+    yield
+    if llm_cache._llm_cache is not None:
+        llm_cache._llm_cache.close()
+
+
 @pytest.fixture
 def temp_document() -> Generator[Path, None, None]:
     with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
@@ -47,6 +58,10 @@ def mock_openai(mocker, mock_openai_key) -> dict[str, Union[Mock, Mock]]:
 
     # Provide an embedding function with the correct __call__(input) signature
     class DummyEmbeddings:
+        @staticmethod
+        def name():
+            return NotImplemented
+
         def __call__(self, input):
             if isinstance(input, list):
                 return [[0.1, 0.2, 0.3] for _ in input]
@@ -61,7 +76,7 @@ def mock_openai(mocker, mock_openai_key) -> dict[str, Union[Mock, Mock]]:
     mock_embeddings = DummyEmbeddings()
 
     # Patch classes to return our mocks
-    mocker.patch('src.vector_store.chroma_store.OpenAIEmbeddings', return_value=mock_embeddings)
+    mocker.patch('src.embeddings.registry.OpenAIEmbeddings', return_value=mock_embeddings)
     mocker.patch('src.rag.rag_chain.ChatOpenAI', return_value=mock_chat)
 
     return {'embeddings': mock_embeddings, 'chat': mock_chat}
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from src.rag.answer_cache import SemanticAnswerCache
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_lookup_returns_answer_above_threshold():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store("space", "scope", [1.0, 0.0, 0.0], "answer", ["chunk-1"])
+
+    assert cache.lookup("space", "scope", unit(1.0, 0.1, 0.0)) == "answer"
+    assert cache.lookup("space", "scope", unit(1.0, 1.0, 0.0)) is None
+    assert cache.lookup("space", "other-scope", [1.0, 0.0, 0.0]) is None
+    assert cache.lookup("other-space", "scope", [1.0, 0.0, 0.0]) is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 3, 1)
+
+
+def test_lookup_picks_most_similar_entry():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("space", "scope", [1.0, 0.0], "x", [])
+    cache.store("space", "scope", [0.0, 1.0], "y", [])
+    assert cache.lookup("space", "scope", unit(0.1, 1.0)) == "y"
+
+
+def test_removed_source_chunk_invalidates_entries():
+    cache = SemanticAnswerCache()
+    cache.store("space", "scope", [1.0, 0.0], "a", ["chunk-1", "chunk-2"])
+    cache.store("space", "scope", [0.0, 1.0], "b", ["chunk-3"])
+
+    cache.invalidate_chunks("space", ["chunk-2"])
+    assert cache.lookup("space", "scope", [1.0, 0.0]) is None
+    assert cache.lookup("space", "scope", [0.0, 1.0]) == "b"
+
+    # The freed row is reused
+    cache.store("space", "scope", [1.0, 1.0], "c", ["chunk-4"])
+    assert cache.get_stats()["size"] == 2
+
+
+def test_unsourced_and_space_invalidation():
+    cache = SemanticAnswerCache()
+    cache.store("space", "scope", [1.0, 0.0], "I don't know", [])
+    cache.store("space", "scope", [0.0, 1.0], "b", ["chunk-1"])
+
+    cache.invalidate_unsourced("space")
+    assert cache.lookup("space", "scope", [1.0, 0.0]) is None
+    assert cache.lookup("space", "scope", [0.0, 1.0]) == "b"
+
+    cache.invalidate_space("space")
+    assert cache.get_stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store("space", "scope", [1.0, 0.0, 0.0], "a", [])
+    cache.store("space", "scope", [0.0, 1.0, 0.0], "b", [])
+    assert cache.lookup("space", "scope", [1.0, 0.0, 0.0]) == "a"
+
+    cache.store("space", "scope", [0.0, 0.0, 1.0], "c", [])
+    assert cache.lookup("space", "scope", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("space", "scope", [1.0, 0.0, 0.0]) == "a"
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(mocker):
+    clock = mocker.patch("src.rag.answer_cache.time.monotonic", return_value=1000.0)
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    cache.store("space", "scope", [1.0, 0.0], "old answer", ["chunk-1"])
+    clock.return_value = 1059.0
+    assert cache.lookup("space", "scope", [1.0, 0.0]) == "old answer"
+
+    # Lookups refresh recency but not age
+    clock.return_value = 1061.0
+    assert cache.lookup("space", "scope", [1.0, 0.0]) is None
+    assert cache.get_stats()["expirations"] == 1
+    assert cache.get_stats()["size"] == 0
+
+
+def test_table_grows_beyond_initial_capacity():
+    cache = SemanticAnswerCache(threshold=0.99, max_entries=500)
+    vectors = np.eye(200, dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        cache.store("space", "scope", vector, i, [f"chunk-{i}"])
+    assert cache.get_stats()["size"] == 200
+    assert cache.lookup("space", "scope", vectors[150]) == 150
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        SemanticAnswerCache(threshold=0.0)
+    with pytest.raises(ValueError):
+        SemanticAnswerCache(max_entries=0)
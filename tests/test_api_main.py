@@ -21,8 +21,10 @@ def mock_rag_chain():
     mock_chain.query.return_value = [{"text": "Test response", "metadata": {}}]
     mock_chain.add_documents.return_value = None
     mock_chain.initialize_chain.return_value = None
+    mock_chain.get_cache_stats.return_value = {"collections": {"hits": 0, "misses": 0, "size": 0}}
     mock_chain.vector_store = Mock()
     mock_chain.vector_store.delete_collection.return_value = None
+    mock_chain.delete_space.return_value = None
     return mock_chain
 
 
@@ -122,6 +124,37 @@ def test_query_space_success(client):
         mock_query.assert_called_once()
 
 
+def test_query_space_passes_filters(client):
+    """Test metadata and document filters reach RAGChain.query."""
+    test_client, mock_chain = client
+    payload = {
+        "query": "Where are exports stored?",
+        "space_name": "test-space",
+        "where": {"source": "exports.pdf"},
+        "where_document": {"$contains": "S3"},
+        "search_mode": "hybrid"
+    }
+    with patch('src.api.main.rag_chain.query', return_value=[]) as mock_query:
+        response = test_client.post("/spaces/test-space/query", json=payload)
+        assert response.status_code == 200
+        mock_query.assert_called_once_with(
+            "Where are exports stored?",
+            "test-space",
+            where={"source": "exports.pdf"},
+            where_document={"$contains": "S3"},
+            search_mode="hybrid"
+        )
+
+
+def test_list_filters(client):
+    """Test the filterable metadata keys of a space are listed."""
+    test_client, mock_chain = client
+    with patch('src.api.main.rag_chain.get_filterable_keys', return_value=["page", "source"]):
+        response = test_client.get("/spaces/test-space/filters")
+        assert response.status_code == 200
+        assert response.json() == {"keys": ["page", "source"]}
+
+
 def test_query_space_error(client):
     """Test query endpoint handles errors."""
     test_client, mock_chain = client
@@ -156,14 +189,17 @@ def test_upload_document_success(client):
             mock_doc.metadata = {}
             mock_loader.load_documents.return_value = [mock_doc]
             
-            with patch('src.api.main.rag_chain.add_documents') as mock_add:
+            report = {"added": 1, "skipped": 0, "replaced": 0, "deduplicated": 0}
+            with patch('src.api.main.rag_chain.add_documents', return_value=report) as mock_add:
                 with open(temp_path, 'rb') as file:
                     files = {'file': ('test.txt', file, 'text/plain')}
                     response = test_client.post("/api/spaces/test-space/documents", files=files)
             assert response.status_code == 200
             data = response.json()
             assert "message" in data
+            assert data["report"] == report
             mock_add.assert_called_once()
+            assert mock_add.call_args.kwargs["replace_sources"] is True
     finally:
         if temp_path.exists():
             temp_path.unlink()
@@ -196,7 +232,7 @@ def test_delete_space_success(client):
     space_dir.mkdir(parents=True, exist_ok=True)
     
     try:
-        with patch('src.api.main.rag_chain.vector_store.delete_collection') as mock_del:
+        with patch('src.api.main.rag_chain.delete_space') as mock_del:
             response = test_client.delete("/spaces/test-space")
             assert response.status_code == 200
             data = response.json()
@@ -219,7 +255,7 @@ def test_delete_space_default_protected(client):
 def test_delete_space_error(client):
     """Test delete space handles errors."""
     test_client, mock_chain = client
-    mock_chain.vector_store.delete_collection.side_effect = Exception("Delete failed")
+    mock_chain.delete_space.side_effect = Exception("Delete failed")
     response = test_client.delete("/spaces/test-space")
     assert response.status_code == 500
 
@@ -239,3 +275,141 @@ def test_space_request_validation(client):
     response = test_client.post("/spaces", json={"name": "test"})
     assert response.status_code == 422  # Validation error
 
+
+def test_create_space_with_embedding_config(client):
+    """Test space creation forwards dimensions and quantization settings."""
+    test_client, mock_chain = client
+    payload = {
+        "name": "compact-space",
+        "documents": [{"text": "Test", "metadata": {}}],
+        "embedding_dimensions": 256,
+        "quantization": "int8"
+    }
+    with patch('src.api.main.rag_chain.configure_space') as mock_configure, \
+         patch('src.api.main.rag_chain.add_documents'), \
+         patch('src.api.main.rag_chain.initialize_chain'):
+        response = test_client.post("/spaces", json=payload)
+        assert response.status_code == 200
+        mock_configure.assert_called_once_with("compact-space", 256, "int8", None, None)
+
+
+def test_create_space_with_hnsw_config(client):
+    """Test space creation forwards HNSW tuning without unset fields."""
+    test_client, mock_chain = client
+    payload = {
+        "name": "tuned-space",
+        "documents": [],
+        "hnsw": {"space": "cosine", "m": 32, "search_ef": 64}
+    }
+    with patch('src.api.main.rag_chain.configure_space') as mock_configure, \
+         patch('src.api.main.rag_chain.add_documents'), \
+         patch('src.api.main.rag_chain.initialize_chain'):
+        response = test_client.post("/spaces", json=payload)
+        assert response.status_code == 200
+        mock_configure.assert_called_once_with(
+            "tuned-space", None, None, None, {"space": "cosine", "m": 32, "search_ef": 64}
+        )
+
+
+def test_metrics_endpoint(client):
+    """Test metrics endpoint reports shared HTTP connection, cache and embedding counters."""
+    test_client, _ = client
+    response = test_client.get("/api/metrics")
+    assert response.status_code == 200
+    assert "reuse_rate" in response.json()["http_connections"]
+    assert response.json()["caches"]["collections"]["hits"] == 0
+    assert response.json()["embeddings"]["deduplication"].keys() == {"inputs", "saved"}
+
+
+def test_stream_query_space_sends_server_sent_events(client):
+    """Test the streaming endpoint relays sources and tokens as SSE events."""
+    test_client, mock_chain = client
+
+    async def fake_stream(*args, **kwargs):
+        yield {"type": "sources", "sources": [{"text": "doc", "metadata": {"source": "a.pdf"}}]}
+        yield {"type": "token", "text": "Hel"}
+        yield {"type": "token", "text": "lo"}
+        yield {"type": "done"}
+
+    with patch('src.api.main.rag_chain.astream_query', side_effect=fake_stream) as mock_stream:
+        response = test_client.post("/spaces/test-space/query/stream", json={"query": "hi", "space_name": "test-space"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block]
+    assert [block.splitlines()[0] for block in events] == [
+        "event: sources", "event: token", "event: token", "event: done"
+    ]
+    assert '"text": "Hel"' in events[1]
+    mock_stream.assert_called_once_with("hi", "test-space", where=None, where_document=None, search_mode=None)
+
+
+def test_stream_query_space_reports_errors_in_stream(client):
+    test_client, mock_chain = client
+
+    async def failing_stream(*args, **kwargs):
+        yield {"type": "sources", "sources": []}
+        raise Exception("LLM unavailable")
+
+    with patch('src.api.main.rag_chain.astream_query', side_effect=failing_stream):
+        response = test_client.post("/spaces/test-space/query/stream", json={"query": "hi", "space_name": "test-space"})
+
+    assert response.status_code == 200
+    assert "event: error" in response.text
+    assert "LLM unavailable" in response.text
+
+
+@pytest.mark.parametrize("error,status_code", [(ValueError("Unknown metadata filter key"), 400), (Exception("down"), 500)])
+def test_stream_query_space_rejects_failures_before_streaming(client, error, status_code):
+    """Test validation and retrieval errors are returned as HTTP errors rather than inside a 200 stream."""
+    test_client, mock_chain = client
+
+    async def failing_stream(*args, **kwargs):
+        raise error
+        yield
+
+    with patch('src.api.main.rag_chain.astream_query', side_effect=failing_stream):
+        response = test_client.post("/spaces/test-space/query/stream", json={"query": "hi", "space_name": "test-space"})
+
+    assert response.status_code == status_code
+    assert response.json()["detail"] == str(error)
+
+
+def test_concurrent_queries_share_embedding_batches(client):
+    """Test /query runs off the event loop, so concurrent requests reach the coalescer together."""
+    import asyncio
+    import httpx
+    from src.api.main import app
+    from src.embeddings.query_coalescer import QueryCoalescer
+
+    class RecordingEmbeddings:
+        def __init__(self):
+            self.calls = []
+
+        def embed_documents(self, texts):
+            self.calls.append(list(texts))
+            return [[1.0] for _ in texts]
+
+    embeddings = RecordingEmbeddings()
+    coalescer = QueryCoalescer(embeddings, window_ms=200, max_batch_size=16)
+
+    def query(text, space_name, **kwargs):
+        coalescer.embed_query(text)
+        return [{"text": text, "metadata": {}}]
+
+    async def fire():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post("/spaces/s/query", json={"query": f"q{i}", "space_name": "s"}) for i in range(8)
+            ))
+
+    try:
+        with patch('src.api.main.rag_chain.query', side_effect=query):
+            responses = asyncio.run(fire())
+    finally:
+        coalescer.close()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert coalescer.get_stats()["requests"] == 8
+    assert len(embeddings.calls) < 8
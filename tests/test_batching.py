@@ -0,0 +1,37 @@
+import pytest
+from src.embeddings.batching import deduplicate, estimate_tokens, make_batches
+
+
+def test_make_batches_respects_item_count():
+    assert make_batches(["a"] * 5, max_batch_size=2) == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_make_batches_respects_token_budget():
+    texts = ["x" * 40, "x" * 40, "x" * 40]  # 11 estimated tokens each
+    assert make_batches(texts, max_batch_tokens=25) == [(0, 2), (2, 3)]
+
+
+def test_make_batches_oversized_text_gets_own_batch():
+    texts = ["small", "x" * 400, "small"]
+    assert make_batches(texts, max_batch_tokens=50) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_make_batches_empty_and_invalid():
+    assert make_batches([]) == []
+    with pytest.raises(ValueError):
+        make_batches(["a"], max_batch_size=0)
+
+
+def test_estimate_tokens_is_positive():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("abcdefgh") == 3
+
+
+def test_deduplicate_scatters_positions():
+    unique, positions = deduplicate(["Header", "body", "Header ", "  header", "body"])
+    assert unique == ["Header", "body", "  header"]
+    assert positions == [0, 1, 0, 2, 1]
+
+
+def test_deduplicate_without_duplicates():
+    assert deduplicate(["a", "b"]) == (["a", "b"], None)
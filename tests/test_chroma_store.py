@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from unittest.mock import Mock
 from langchain_core.documents import Document
@@ -18,7 +19,7 @@ def test_chroma_store_initialization(chroma_store, mock_openai):
 
 def test_add_documents(chroma_store, sample_documents, mock_chroma):
     result = chroma_store.add_documents(sample_documents, "test_collection")
-    assert result is None  # add_documents doesn't return anything
+    assert result["added"] + result["skipped"] == 2  # add_documents returns the ingest report
 
 
 def test_similarity_search_without_documents(chroma_store):
@@ -69,7 +70,7 @@ def test_delete_collection(chroma_store, mocker):
 def test_add_documents_empty_list(chroma_store):
     """Test add_documents handles empty document list."""
     result = chroma_store.add_documents([], "test_collection")
-    assert result is None
+    assert result == {"added": 0, "skipped": 0, "replaced": 0, "deduplicated": 0}
 
 
 def test_add_documents_error_handling(chroma_store, sample_documents, mocker):
@@ -93,23 +94,22 @@ def test_similarity_search_empty_query(chroma_store):
 def test_similarity_search_different_k_values(chroma_store, mocker):
     """Test similarity_search with different k values."""
     # Mock collection that respects k parameter in query
-    mock_collection_k1 = Mock()
-    mock_collection_k1.query.return_value = {
-        "documents": [["Doc 1"]],
-        "metadatas": [[{}]],
-        "distances": [[0.1]],
-    }
-    
-    mock_collection_k3 = Mock()
-    mock_collection_k3.query.return_value = {
-        "documents": [["Doc 1", "Doc 2", "Doc 3"]],
-        "metadatas": [[{}, {}, {}]],
-        "distances": [[0.1, 0.2, 0.3]],
-    }
+    mock_collection = Mock()
+    mock_collection.query.side_effect = [
+        {
+            "documents": [["Doc 1"]],
+            "metadatas": [[{}]],
+            "distances": [[0.1]],
+        },
+        {
+            "documents": [["Doc 1", "Doc 2", "Doc 3"]],
+            "metadatas": [[{}, {}, {}]],
+            "distances": [[0.1, 0.2, 0.3]],
+        },
+    ]
     
     mock_client = Mock()
-    # Return different mocks based on call order
-    mock_client.get_collection.side_effect = [mock_collection_k1, mock_collection_k3]
+    mock_client.get_collection.return_value = mock_collection
     mocker.patch.object(chroma_store, "_chroma_client", mock_client)
     
     results_k1 = chroma_store.similarity_search("query", "test_collection", k=1)
@@ -202,3 +202,736 @@ def test_get_existing_collections_error_handling(chroma_store, mocker):
     
     with pytest.raises(Exception, match="Failed to get collections from ChromaDB: List error"):
         chroma_store.get_existing_collections()
+
+
+def test_add_documents_passes_numpy_embeddings_through(chroma_store, mocker):
+    """Test float32 matrices from the embedding function reach Chroma unconverted."""
+    import numpy as np
+
+    mock_collection = Mock()
+    mock_client = Mock()
+    mock_client.get_or_create_collection.return_value = mock_collection
+    mock_client.get_collection.return_value = mock_collection
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+
+    matrix = np.ones((2, 3), dtype=np.float32)
+    mock_embedding = Mock(supports_numpy_embeddings=True)
+    mock_embedding.embed_documents_array.return_value = matrix
+    mock_embedding.embed_query_array.return_value = matrix[0]
+    mocker.patch.object(chroma_store, "_embedding_function", mock_embedding)
+
+    chroma_store.add_documents([{"text": "a"}, {"text": "b"}], "test_collection")
+    assert mock_collection.add.call_args.kwargs["embeddings"] is matrix
+    mock_embedding.embed_documents.assert_not_called()
+
+    mock_collection.query.return_value = {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+    chroma_store.similarity_search("query", "test_collection")
+    query_embeddings = mock_collection.query.call_args.kwargs["query_embeddings"]
+    assert isinstance(query_embeddings, np.ndarray) and query_embeddings.shape == (1, 3)
+
+
+def test_configure_collection_uses_reduced_dimensions(chroma_store, mocker):
+    """Test a configured collection embeds with its own dimensions and quantization."""
+    mock_collection = Mock(metadata={"quantization": "int8", "embedding_dimensions": 2})
+    mock_client = Mock()
+    mock_client.get_or_create_collection.return_value = mock_collection
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+
+    reduced = Mock()
+    reduced.embed_documents.return_value = [[0.5, -1.0]]
+    mock_embedding = Mock()
+    mock_embedding.with_dimensions.return_value = reduced
+    mocker.patch.object(chroma_store, "_embedding_function", mock_embedding)
+
+    chroma_store.configure_collection("small", embedding_dimensions=2, quantization="int8")
+    assert mock_client.get_or_create_collection.call_args.kwargs["metadata"] == {
+        "quantization": "int8", "embedding_dimensions": 2
+    }
+
+    chroma_store.add_documents([{"text": "a"}], "small")
+    mock_embedding.with_dimensions.assert_called_once_with(2)
+    stored = mock_collection.add.call_args.kwargs["embeddings"]
+    assert np.allclose(stored, [[0.5, -1.0]], atol=0.01)
+
+
+def test_configure_collection_rejects_conflicting_config(chroma_store, mocker):
+    """Test reconfiguring an existing collection differently raises."""
+    mock_client = Mock()
+    mock_client.get_or_create_collection.return_value = Mock(metadata={"quantization": "float32"})
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+
+    with pytest.raises(ValueError, match="different configuration"):
+        chroma_store.configure_collection("space", quantization="int8")
+
+
+def test_make_document_id_is_stable():
+    """Test chunk IDs depend only on source and content."""
+    from src.vector_store.chroma_store import ChromaStore
+
+    first = ChromaStore.make_document_id("chunk", {"source": "a.txt", "page": 1})
+    assert first == ChromaStore.make_document_id("chunk", {"source": "a.txt", "page": 2})
+    assert first != ChromaStore.make_document_id("chunk", {"source": "b.txt"})
+    assert first != ChromaStore.make_document_id("other chunk", {"source": "a.txt"})
+
+
+def test_upsert_documents_is_incremental(mock_openai, tmp_path):
+    """Test re-ingesting skips unchanged chunks and replaces stale ones."""
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(persist_directory=str(tmp_path))
+    first = [
+        {"text": "intro", "metadata": {"source": "doc.txt"}},
+        {"text": "body v1", "metadata": {"source": "doc.txt"}},
+        {"text": "no source"},
+    ]
+    assert store.upsert_documents(first, "incremental") == {"added": 3, "skipped": 0, "replaced": 0, "deduplicated": 0}
+
+    second = [
+        {"text": "intro", "metadata": {"source": "doc.txt"}},
+        {"text": "body v2", "metadata": {"source": "doc.txt"}},
+        {"text": "body v2", "metadata": {"source": "doc.txt"}},
+    ]
+    embed = Mock(wraps=store._embedding_function.embed_documents)
+    store._embedding_function.embed_documents = embed
+    assert store.upsert_documents(second, "incremental", replace_sources=True) == {
+        "added": 1, "skipped": 2, "replaced": 1, "deduplicated": 0
+    }
+    embed.assert_called_once_with(["body v2"])
+
+    collection = store._chroma_client.get_collection("incremental")
+    assert sorted(collection.get()["documents"]) == ["body v2", "intro", "no source"]
+
+
+def test_upsert_documents_streams_in_bounded_batches(chroma_store, mocker):
+    """Test a generator is consumed in write batches capped at the client's max batch size."""
+    mock_collection = Mock()
+    mock_collection.metadata = None
+    mock_collection.get.return_value = {"ids": []}
+    mock_client = Mock()
+    mock_client.get_or_create_collection.return_value = mock_collection
+    mock_client.get_max_batch_size.return_value = 3
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+    embed = mocker.patch.object(
+        chroma_store, "_embed_documents", side_effect=lambda texts, config: [[0.1, 0.2]] * len(texts)
+    )
+
+    report = chroma_store.upsert_documents(({"text": f"chunk {i}"} for i in range(7)), "test_collection")
+
+    assert report == {"added": 7, "skipped": 0, "replaced": 0, "deduplicated": 0}
+    assert [len(call.args[0]) for call in embed.call_args_list] == [3, 3, 1]
+    assert [len(call.kwargs["ids"]) for call in mock_collection.add.call_args_list] == [3, 3, 1]
+
+
+def test_upsert_documents_indexes_only_stored_batches(chroma_store, mocker):
+    """Test chunks reach the lexical index only after Chroma accepted their write."""
+    mock_collection = Mock()
+    mock_collection.metadata = None
+    mock_collection.get.return_value = {"ids": []}
+    mock_collection.add.side_effect = [None, RuntimeError("write failed")]
+    mock_client = Mock()
+    mock_client.get_or_create_collection.return_value = mock_collection
+    mock_client.get_max_batch_size.return_value = 2
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+    mocker.patch.object(chroma_store, "_embed_documents", side_effect=lambda texts, config: [[0.1, 0.2]] * len(texts))
+    lexical_index = Mock()
+    mocker.patch.object(chroma_store, "_get_lexical_index", return_value=lexical_index)
+
+    with pytest.raises(Exception, match="write failed"):
+        chroma_store.upsert_documents([{"text": f"chunk {i}"} for i in range(4)], "test_collection")
+
+    assert lexical_index.add.call_count == 1
+    assert lexical_index.add.call_args.args[0] == mock_collection.add.call_args_list[0].kwargs["ids"]
+
+
+def test_upsert_documents_embeds_next_batch_while_writing(chroma_store, mocker):
+    """Test embedding of the next batch overlaps the write of the previous one."""
+    import threading
+
+    write_started = threading.Event()
+    release_write = threading.Event()
+    overlapped = []
+
+    def slow_add(**kwargs):
+        write_started.set()
+        assert release_write.wait(timeout=5)
+
+    def embed(texts, config):
+        if texts[0] != "chunk 0":
+            # The first write must be in progress while the second batch is embedded
+            overlapped.append(write_started.wait(timeout=5) and not release_write.is_set())
+            release_write.set()
+        return [[0.1, 0.2]] * len(texts)
+
+    mock_collection = Mock()
+    mock_collection.metadata = None
+    mock_collection.get.return_value = {"ids": []}
+    mock_collection.add.side_effect = slow_add
+    mock_client = Mock()
+    mock_client.get_or_create_collection.return_value = mock_collection
+    mock_client.get_max_batch_size.return_value = 2
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+    mocker.patch.object(chroma_store, "_embed_documents", side_effect=embed)
+
+    chroma_store.upsert_documents([{"text": f"chunk {i}"} for i in range(4)], "test_collection")
+
+    assert overlapped == [True]
+    assert mock_collection.add.call_count == 2
+
+
+def test_collection_handles_are_cached(chroma_store, mocker):
+    """Test repeated searches reuse the collection handle and count cache hits."""
+    mock_collection = Mock()
+    mock_collection.metadata = None
+    mock_collection.query.return_value = {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+    mock_client = Mock()
+    mock_client.get_collection.return_value = mock_collection
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+    hits_before = chroma_store.get_collection_cache_stats()["hits"]
+
+    for _ in range(3):
+        chroma_store.similarity_search("query", "cached_collection")
+
+    mock_client.get_collection.assert_called_once_with("cached_collection")
+    assert chroma_store.get_collection_cache_stats()["hits"] - hits_before == 2
+
+
+def test_delete_collection_invalidates_cached_handle(chroma_store, mocker):
+    """Test a deleted collection is fetched again rather than served from the cache."""
+    mock_client = Mock()
+    mock_client.get_collection.side_effect = [Mock(name="old"), Mock(name="new")]
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+
+    old = chroma_store.get_collection("recreated")
+    assert chroma_store.get_collection("recreated") is old
+    chroma_store.delete_collection("recreated")
+    assert chroma_store.get_collection("recreated") is not old
+
+
+def test_stale_collection_handle_is_refetched(tmp_path):
+    """Test a handle cached before another store recreated the collection is refreshed instead of failing."""
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+
+    def make_store():
+        return ChromaStore(
+            persist_directory=str(tmp_path), embedding_function=HashingEmbeddings(), client_mode="persistent"
+        )
+
+    store, other = make_store(), make_store()
+    store.add_documents([{"text": "old exports", "metadata": {"source": "old"}}], "space")
+    assert store.similarity_search("exports", "space", k=1)[0]["text"] == "old exports"
+
+    other.delete_collection("space")
+    other.add_documents([{"text": "new exports", "metadata": {"source": "new"}}], "space")
+
+    assert store.similarity_search("exports", "space", k=1)[0]["text"] == "new exports"
+    assert store.add_documents([{"text": "more exports"}], "space")["added"] == 1
+    assert other.get_collection("space").count() == 2
+
+
+def test_collection_cache_evicts_least_recently_used(chroma_store, mocker):
+    """Test the handle cache is bounded."""
+    mock_client = Mock()
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+    chroma_store._collection_cache_size = 2
+
+    for name in ["a", "b", "a", "c"]:
+        chroma_store.get_collection(name)
+
+    assert list(chroma_store._collections) == ["a", "c"]
+
+
+def test_similarity_search_batch_single_embedding_and_query_call(chroma_store, mocker):
+    """Test a batch of queries is embedded once and sent to Chroma as one matrix."""
+    mock_collection = Mock()
+    mock_collection.metadata = None
+    mock_collection.query.return_value = {
+        "documents": [["Doc A"], ["Doc B"], []],
+        "metadatas": [[{"source": "a"}], [None], []],
+        "distances": [[0.1], [0.3], []],
+    }
+    mock_client = Mock()
+    mock_client.get_collection.return_value = mock_collection
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+
+    mock_embedding = Mock(supports_numpy_embeddings=True)
+    mock_embedding.embed_documents_array.return_value = np.ones((3, 4), dtype=np.float32)
+    mocker.patch.object(chroma_store, "_embedding_function", mock_embedding)
+
+    results = chroma_store.similarity_search_batch(["q1", "q2", "q3"], "test_collection", k=1)
+
+    mock_embedding.embed_documents_array.assert_called_once_with(["q1", "q2", "q3"])
+    mock_embedding.embed_query_array.assert_not_called()
+    mock_collection.query.assert_called_once()
+    assert mock_collection.query.call_args.kwargs["query_embeddings"].shape == (3, 4)
+    assert [[doc["text"] for doc in result] for result in results] == [["Doc A"], ["Doc B"], []]
+    assert results[1][0]["metadata"] == {}
+
+
+def test_asimilarity_search_awaits_async_query_embedding(chroma_store, mocker):
+    """Test async search embeds through the async client and passes the vector to Chroma."""
+    import asyncio
+
+    mock_collection = Mock()
+    mock_collection.metadata = None
+    mock_collection.query.return_value = {"documents": [["Doc A"]], "metadatas": [[{"source": "a"}]], "distances": [[0.1]]}
+    mock_client = Mock()
+    mock_client.get_collection.return_value = mock_collection
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+
+    mock_embedding = Mock(supports_numpy_embeddings=True)
+    mock_embedding.aembed_query = mocker.AsyncMock(return_value=[0.5, 0.5, 0.5, 0.5])
+    mocker.patch.object(chroma_store, "_embedding_function", mock_embedding)
+
+    results = asyncio.run(chroma_store.asimilarity_search("q1", "test_collection", k=1))
+
+    mock_embedding.aembed_query.assert_awaited_once_with("q1")
+    mock_embedding.embed_documents_array.assert_not_called()
+    assert mock_collection.query.call_args.kwargs["query_embeddings"].shape == (1, 4)
+    assert [doc["text"] for doc in results] == ["Doc A"]
+
+
+def test_similarity_search_batch_splits_at_max_batch_size(chroma_store, mocker):
+    """Test query matrices larger than the client's max batch size are split."""
+    mock_collection = Mock()
+    mock_collection.metadata = None
+    mock_collection.query.side_effect = lambda query_embeddings, **kwargs: {
+        "documents": [["Doc"]] * len(query_embeddings),
+        "metadatas": [[{}]] * len(query_embeddings),
+        "distances": [[0.0]] * len(query_embeddings),
+    }
+    mock_client = Mock()
+    mock_client.get_collection.return_value = mock_collection
+    mock_client.get_max_batch_size.return_value = 2
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+
+    results = chroma_store.similarity_search_batch(["a", "b", "c"], "test_collection")
+
+    assert mock_collection.query.call_count == 2
+    assert len(results) == 3
+
+
+def test_similarity_search_batch_ignores_write_batch_size(chroma_store, mocker):
+    """Test query batches are bounded by the client's max batch size, not the write batch size."""
+    mock_collection = Mock()
+    mock_collection.metadata = None
+    mock_collection.query.side_effect = lambda query_embeddings, **kwargs: {
+        "documents": [["Doc"]] * len(query_embeddings),
+        "metadatas": [[{}]] * len(query_embeddings),
+        "distances": [[0.0]] * len(query_embeddings),
+    }
+    mock_client = Mock()
+    mock_client.get_collection.return_value = mock_collection
+    mock_client.get_max_batch_size.return_value = 100
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+    mocker.patch("src.vector_store.chroma_store.CHROMA_WRITE_BATCH_SIZE", 2)
+
+    results = chroma_store.similarity_search_batch(["a", "b", "c"], "test_collection")
+
+    assert mock_collection.query.call_count == 1
+    assert len(results) == 3
+
+
+def test_similarity_search_batch_missing_collection(chroma_store):
+    """Test a missing collection yields an empty result list per query."""
+    assert chroma_store.similarity_search_batch(["a", "b"], "non_existent_collection") == [[], []]
+    assert chroma_store.similarity_search_batch([], "non_existent_collection") == []
+
+
+def test_similarity_search_pushes_filters_into_query(chroma_store, mocker):
+    """Test where / where_document are passed to Chroma rather than applied afterwards."""
+    mock_collection = Mock()
+    mock_collection.metadata = None
+    mock_collection.query.return_value = {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+    mock_client = Mock()
+    mock_client.get_collection.return_value = mock_collection
+    mocker.patch.object(chroma_store, "_chroma_client", mock_client)
+
+    chroma_store.similarity_search(
+        "query", "test_collection", where={"source": "a.txt"}, where_document={"$contains": "S3"}
+    )
+
+    kwargs = mock_collection.query.call_args.kwargs
+    assert kwargs["where"] == {"source": "a.txt"}
+    assert kwargs["where_document"] == {"$contains": "S3"}
+
+
+def test_filterable_key_index(mock_openai, tmp_path, caplog):
+    """Test written metadata keys are indexed and unknown filter keys are warned about."""
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(persist_directory=str(tmp_path))
+    store.add_documents([
+        {"text": "exports land in S3", "metadata": {"source": "a.txt", "page": 1}},
+        {"text": "loyalty data", "metadata": {"source": "b.txt", "fields": "name"}},
+    ], "filtered")
+    store.add_documents([{"text": "more", "metadata": {"source": "c.txt", "year": 2024}}], "filtered")
+
+    assert store.get_filterable_keys("filtered") == ["fields", "page", "source", "year"]
+
+    results = store.similarity_search("exports", "filtered", k=4, where={"source": "b.txt"})
+    assert [doc["text"] for doc in results] == ["loyalty data"]
+    results = store.similarity_search("data", "filtered", k=4, where_document={"$contains": "S3"})
+    assert [doc["text"] for doc in results] == ["exports land in S3"]
+
+    with caplog.at_level("WARNING", logger="src.vector_store.chroma_store"):
+        results = store.similarity_search("exports", "filtered", where={"$and": [{"source": "a.txt"}, {"sorce": "x"}]})
+    assert results == []
+    assert "not in its filterable key index: sorce" in caplog.text
+
+
+def test_filterable_key_index_is_shared_between_stores(mock_openai, tmp_path, caplog):
+    """Test keys written through one store are seen by another store's cached handle and never dropped."""
+    from src.vector_store.chroma_store import ChromaStore
+
+    store, other = ChromaStore(persist_directory=str(tmp_path)), ChromaStore(persist_directory=str(tmp_path))
+    other.add_documents([{"text": "seed", "metadata": {"source": "seed.txt"}}], "shared")
+    store.add_documents([{"text": "team notes", "metadata": {"source": "a.txt", "team": "data"}}], "shared")
+
+    with caplog.at_level("WARNING", logger="src.vector_store.chroma_store"):
+        other.validate_filter("shared", {"team": "data"})
+    assert caplog.text == ""
+
+    other.add_documents([{"text": "dated", "metadata": {"source": "b.txt", "year": 2024}}], "shared")
+    assert store.get_filterable_keys("shared") == other.get_filterable_keys("shared") == ["source", "team", "year"]
+
+
+def test_filterable_key_index_backfills_existing_chunks(mock_openai, tmp_path):
+    """Test a collection written before the index existed is scanned once."""
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(persist_directory=str(tmp_path))
+    collection = store.get_collection("legacy", create=True)
+    collection.add(ids=["old"], embeddings=[[0.1, 0.2, 0.3]], documents=["old"], metadatas=[{"author": "x"}])
+
+    store.add_documents([{"text": "new", "metadata": {"source": "n.txt"}}], "legacy")
+    assert store.get_filterable_keys("legacy") == ["author", "source"]
+
+
+def test_flat_backend_is_selectable_per_space(mock_openai, tmp_path):
+    """Test spaces configured with the flat backend are routed to the NumPy store."""
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(persist_directory=str(tmp_path), embedding_function=HashingEmbeddings(dimensions=32))
+    store.configure_collection("small-space", backend="flat")
+    store.add_documents([{"text": "exports land in S3", "metadata": {"source": "a.txt"}}], "small-space")
+    store.add_documents([{"text": "exports land in S3", "metadata": {"source": "a.txt"}}], "chroma-space")
+
+    assert store.is_flat_collection("small-space") and not store.is_flat_collection("chroma-space")
+    assert "small-space" not in store._get_chroma_collections()
+    assert sorted(store.get_existing_collections()) == ["chroma-space", "default", "small-space"]
+    flat = store.similarity_search("exports", "small-space")
+    chroma = store.similarity_search("exports", "chroma-space")
+    assert flat[0]["text"] == chroma[0]["text"]
+    assert flat[0]["score"] == pytest.approx(chroma[0]["score"], abs=1e-4)
+
+    with pytest.raises(ValueError, match="different configuration"):
+        store.configure_collection("chroma-space", backend="flat")
+    with pytest.raises(ValueError, match="Unsupported vector backend"):
+        store.configure_collection("other", backend="faiss")
+
+    store.delete_collection("small-space")
+    assert not store.is_flat_collection("small-space")
+
+
+def test_configure_collection_with_hnsw_settings(mock_openai, tmp_path):
+    """Test HNSW settings reach the Chroma index and conflicting settings are rejected."""
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(persist_directory=str(tmp_path))
+    hnsw = {"space": "cosine", "m": 32, "construction_ef": 200, "search_ef": 64}
+    store.configure_collection("tuned", hnsw=hnsw)
+    store.configure_collection("tuned", hnsw=hnsw)
+
+    assert store.get_index_settings("tuned") == {"backend": "chroma", "hnsw": hnsw}
+    store.add_documents([{"text": "a"}, {"text": "b"}], "tuned")
+    # Cosine distance of identical vectors is 0, so the score is 1
+    assert store.similarity_search("a", "tuned", k=1)[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+    with pytest.raises(ValueError, match="different configuration"):
+        store.configure_collection("tuned", hnsw={"space": "l2"})
+    with pytest.raises(ValueError, match="Unsupported distance space"):
+        store.configure_collection("other", hnsw={"space": "hamming"})
+    with pytest.raises(ValueError, match="positive integer"):
+        store.configure_collection("other", hnsw={"m": 0})
+    with pytest.raises(ValueError, match="Unknown HNSW setting"):
+        store.configure_collection("other", hnsw={"ef": 10})
+
+
+def test_flat_space_honours_distance_space(mock_openai, tmp_path):
+    """Test flat spaces rank and score by the configured distance space."""
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(persist_directory=str(tmp_path), embedding_function=HashingEmbeddings(dimensions=32))
+    store.configure_collection("flat-cosine", backend="flat", hnsw={"space": "cosine"})
+    store.configure_collection("chroma-cosine", hnsw={"space": "cosine"})
+    docs = [{"text": "exports land in S3"}, {"text": "loyalty data over SFTP"}]
+    store.add_documents(docs, "flat-cosine")
+    store.add_documents(docs, "chroma-cosine")
+
+    assert store.get_index_settings("flat-cosine") == {"backend": "flat", "hnsw": {"space": "cosine"}}
+    flat = store.similarity_search("S3 exports", "flat-cosine", k=2)
+    chroma = store.similarity_search("S3 exports", "chroma-cosine", k=2)
+    assert [doc["text"] for doc in flat] == [doc["text"] for doc in chroma]
+    assert [doc["score"] for doc in flat] == pytest.approx([doc["score"] for doc in chroma], abs=1e-4)
+
+
+def test_http_client_mode_uses_pooled_server_client(mock_openai, tmp_path):
+    """Test http mode builds a real Chroma HttpClient and sends its requests over the pooled session."""
+    import json
+    import os
+    import threading
+    import uuid
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from chromadb.api.shared_system_client import SharedSystemClient
+    from src import http_clients
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+    requests = []
+
+    class ChromaServer(BaseHTTPRequestHandler):
+        """Answers the calls a client makes on startup: identity, tenant, database, get-or-create collection."""
+
+        def _reply(self, body):
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            requests.append((self.command, self.path, self.headers.get("Authorization")))
+            if self.path.endswith("/auth/identity"):
+                self._reply({"user_id": "", "tenant": "team", "databases": ["rag"]})
+            else:
+                self._reply({"id": str(uuid.uuid4()), "name": self.path.rsplit("/", 1)[-1], "tenant": "team"})
+
+        def do_POST(self):
+            requests.append((self.command, self.path, self.headers.get("Authorization")))
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            self._reply({
+                "id": str(uuid.uuid4()), "name": body["name"], "metadata": body.get("metadata"),
+                "configuration_json": {}, "tenant": "team", "database": "rag",
+                "dimension": None, "log_position": 0, "version": 0
+            })
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChromaServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        before = http_clients.get_connection_stats()["requests"]
+        store = ChromaStore(
+            host="127.0.0.1", port=server.server_address[1], headers={"Authorization": "Bearer t"},
+            tenant="team", database="rag", persist_directory=str(tmp_path), client_mode="http",
+            embedding_function=HashingEmbeddings()
+        )
+
+        session = store._chroma_client._server._session
+        assert session.timeout.read is not None
+        assert session.timeout.connect is not None
+        assert [request[:2] for request in requests][-1] == ("POST", "/api/v2/tenants/team/databases/rag/collections")
+        assert all(request[2] == "Bearer t" for request in requests)
+        # The collection was created through the pooled session's request hook
+        assert http_clients.get_connection_stats()["requests"] == before + 1
+        assert not os.path.exists(tmp_path / "lexical_index")
+    finally:
+        server.shutdown()
+        server.server_close()
+        SharedSystemClient.clear_system_cache()
+
+
+def test_http_client_mode_keeps_no_local_state(mock_openai, mocker, tmp_path):
+    """Test http mode rejects the disk-backed flat backend and hybrid search and writes no lexical index."""
+    import os
+    from src.vector_store.chroma_store import ChromaStore
+    client = mocker.patch("src.vector_store.chroma_store.chromadb.HttpClient").return_value
+    collection = client.get_or_create_collection.return_value
+    collection.metadata = None
+    collection.get.return_value = {"ids": []}
+    store = ChromaStore(persist_directory=str(tmp_path), client_mode="http")
+
+    with pytest.raises(ValueError, match="not available in http client mode"):
+        store.configure_collection("flat-space", backend="flat")
+    with pytest.raises(ValueError, match="not available in http client mode"):
+        store.similarity_search("query", "docs", search_mode="hybrid")
+    store.add_documents([{"text": "chunk", "metadata": {"source": "a.txt"}}], "docs")
+    assert collection.add.called
+    assert not os.path.exists(tmp_path / "lexical_index")
+
+    mocker.patch("src.vector_store.chroma_store.SEARCH_MODE", "hybrid")
+    with pytest.raises(ValueError, match="Hybrid search"):
+        ChromaStore(persist_directory=str(tmp_path), client_mode="http")
+
+
+def test_unknown_client_mode_is_rejected(mock_openai, tmp_path):
+    from src.vector_store.chroma_store import ChromaStore
+    with pytest.raises(ValueError, match="Unsupported Chroma client mode"):
+        ChromaStore(persist_directory=str(tmp_path), client_mode="embedded")
+
+
+def test_snapshot_round_trip_restores_without_embedding(tmp_path):
+    from langchain_core.documents import Document
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+
+    source = ChromaStore(
+        persist_directory=str(tmp_path / "source"), embedding_function=HashingEmbeddings(), client_mode="persistent"
+    )
+    source.configure_collection("docs", quantization="float16", hnsw={"space": "cosine"})
+    source.add_documents(
+        [Document(page_content=f"chunk {i} about topic {i % 3}", metadata={"source": f"s{i % 2}"}) for i in range(20)],
+        "docs"
+    )
+    manifest = source.export_snapshot("docs", str(tmp_path / "snapshot"))
+    assert manifest["count"] == 20
+    assert manifest["dtype"] == "float16"
+
+    target_embeddings = HashingEmbeddings()
+    target = ChromaStore(
+        persist_directory=str(tmp_path / "target"), embedding_function=target_embeddings, client_mode="persistent"
+    )
+    embed = Mock(wraps=target_embeddings.embed_documents_array)
+    target_embeddings.embed_documents_array = embed
+    result = target.import_snapshot(str(tmp_path / "snapshot"), "restored")
+
+    assert result["loaded"] == 20
+    embed.assert_not_called()
+    assert target.get_index_settings("restored")["hnsw"]["space"] == "cosine"
+    assert target.get_filterable_keys("restored") == ["source"]
+    expected = source.similarity_search("topic 1", "docs", k=3)
+    restored = target.similarity_search("topic 1", "restored", k=3)
+    assert [doc["text"] for doc in restored] == [doc["text"] for doc in expected]
+
+
+def test_write_snapshot_only_replaces_snapshots(tmp_path):
+    """Test exporting over a non-snapshot path raises and leaves it untouched, while snapshots are replaced."""
+    import os
+    from src.vector_store.snapshot import read_manifest, write_snapshot
+    batch = (["a"], np.ones((1, 4), dtype=np.float32), ["text"], [{}])
+    target = tmp_path / "data"
+    target.mkdir()
+    (target / "keep.txt").write_text("precious")
+    with pytest.raises(ValueError, match="not a snapshot directory"):
+        write_snapshot(str(target), {"collection": "docs"}, [batch])
+    assert (target / "keep.txt").read_text() == "precious"
+    (tmp_path / "file").write_text("precious")
+    with pytest.raises(ValueError, match="not a snapshot directory"):
+        write_snapshot(str(tmp_path / "file"), {"collection": "docs"}, [batch])
+
+    snapshot = str(tmp_path / "snapshot")
+    write_snapshot(snapshot, {"collection": "docs"}, [batch])
+    write_snapshot(snapshot, {"collection": "docs"}, [batch, (["b"], batch[1], ["more"], [{}])])
+    assert read_manifest(snapshot)["count"] == 2
+    assert sorted(os.listdir(tmp_path)) == ["data", "file", "snapshot"]
+
+
+def test_import_snapshot_rejects_other_embedding_model(tmp_path):
+    from langchain_core.documents import Document
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+
+    source = ChromaStore(
+        persist_directory=str(tmp_path / "source"), embedding_function=HashingEmbeddings(), client_mode="persistent"
+    )
+    source.add_documents([Document(page_content="only chunk", metadata={"source": "a"})], "docs")
+    source.export_snapshot("docs", str(tmp_path / "snapshot"))
+
+    target = ChromaStore(
+        persist_directory=str(tmp_path / "target"), embedding_function=HashingEmbeddings(128), client_mode="persistent"
+    )
+    with pytest.raises(ValueError, match="embedded with hashing-384"):
+        target.import_snapshot(str(tmp_path / "snapshot"))
+
+
+def test_hybrid_search_finds_exact_identifier(tmp_path):
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(
+        persist_directory=str(tmp_path), embedding_function=HashingEmbeddings(), client_mode="persistent"
+    )
+    documents = [{"text": f"Team {i} notes about weekly exports and loads", "metadata": {"source": f"n{i}"}} for i in range(30)]
+    documents.append({"text": "Loyalty feed lands at s3://acme/loyalty/lty_feed_v2.parquet", "metadata": {"source": "feeds"}})
+    store.add_documents(documents, "docs")
+
+    results = store.similarity_search("lty_feed_v2.parquet", "docs", k=2, search_mode="hybrid")
+    assert "lty_feed_v2.parquet" in results[0]["text"]
+
+    # Lexical candidates respect metadata filters
+    filtered = store.similarity_search(
+        "lty_feed_v2.parquet", "docs", k=2, where={"source": "n1"}, search_mode="hybrid"
+    )
+    assert [doc["metadata"]["source"] for doc in filtered] == ["n1"]
+
+    # The index is maintained on write and removed with the collection
+    assert len(store._get_lexical_index("docs")) == 31
+    store.delete_collection("docs")
+    assert not store._get_lexical_index("docs").exists()
+
+
+def test_lexical_index_is_backfilled_for_existing_collections(tmp_path):
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(
+        persist_directory=str(tmp_path), embedding_function=HashingEmbeddings(), client_mode="persistent"
+    )
+    store.add_documents([{"text": "alpha report", "metadata": {"source": "a"}}, {"text": "beta report"}], "docs")
+    store._get_lexical_index("docs").clear()
+
+    results = store.similarity_search("beta", "docs", k=1, search_mode="hybrid")
+    assert results[0]["text"] == "beta report"
+    assert len(store._get_lexical_index("docs")) == 2
+
+
+def test_lexical_backfill_is_invisible_until_complete(tmp_path, mocker):
+    """Test searches racing a backfill never see an index file holding only some pages."""
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(
+        persist_directory=str(tmp_path), embedding_function=HashingEmbeddings(), client_mode="persistent"
+    )
+    store.add_documents([{"text": f"report {i}", "metadata": {"source": str(i)}} for i in range(5)], "docs")
+    index = store._get_lexical_index("docs")
+    index.clear()
+    mocker.patch.object(store, "_get_write_batch_size", return_value=2)
+    collection = store.get_collection("docs")
+    get = collection.get
+    visible_during_backfill = []
+
+    def get_page(**kwargs):
+        visible_during_backfill.append(index.exists())
+        return get(**kwargs)
+
+    mocker.patch.object(collection, "get", side_effect=get_page)
+    store._get_lexical_index("docs", collection)
+    assert visible_during_backfill == [False, False, False]
+    assert len(index) == 5
+
+
+def test_removal_listeners_receive_replaced_chunk_ids(tmp_path):
+    from src.embeddings.local_embeddings import HashingEmbeddings
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(
+        persist_directory=str(tmp_path), embedding_function=HashingEmbeddings(), client_mode="persistent"
+    )
+    removed = []
+    store.add_removal_listener(lambda name, ids: removed.append((name, ids)))
+    old = {"text": "old export path", "metadata": {"source": "a.txt"}}
+    store.add_documents([old], "docs")
+    store.add_documents([{"text": "new export path", "metadata": {"source": "a.txt"}}], "docs", replace_sources=True)
+    assert removed == [("docs", [store.make_document_id(old["text"], old["metadata"])])]
+
+    store.configure_collection("flat-docs", backend="flat")
+    store.add_documents([old], "flat-docs")
+    store.add_documents(
+        [{"text": "newer export path", "metadata": {"source": "a.txt"}}], "flat-docs", replace_sources=True
+    )
+    assert removed[-1] == ("flat-docs", [store.make_document_id(old["text"], old["metadata"])])
@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import Mock
+from langchain_core.documents import Document
+from src.rag.context_packer import (
+    CHUNK_ID_KEY,
+    ContextPacker,
+    PackedRetriever,
+    _get_encoding,
+    count_tokens,
+    get_context_token_budget,
+)
+from src.embeddings.batching import estimate_tokens
+from src.vector_store.base import BaseVectorStore
+
+
+@pytest.fixture(autouse=True)
+def approximate_tokens(mocker):
+    # Count ~4 characters per token so budgets do not depend on downloaded encodings
+    mocker.patch('src.rag.context_packer._get_encoding', return_value=None)
+
+
+def doc(text: str, source: str = "a.txt") -> Document:
+    return Document(page_content=text, metadata={"source": source})
+
+
+def test_count_tokens_estimates_without_encoding():
+    assert count_tokens("a" * 40) == 11
+
+
+def test_pack_drops_exact_and_near_duplicates():
+    packer = ContextPacker(token_budget=1000)
+    documents = [
+        doc("Exports are written to the orders bucket every night at two"),
+        doc("exports are written to the   orders bucket every night at two", source="b.txt"),
+        doc("Exports are written to the orders bucket every night at two am UTC"),
+        doc("Retention for exports is thirty days"),
+    ]
+
+    packed = packer.pack(documents)
+
+    assert [d.page_content for d in packed] == [documents[0].page_content, documents[3].page_content]
+
+
+def test_pack_keeps_retrieval_order_and_honours_k():
+    packer = ContextPacker(token_budget=1000)
+    documents = [doc(f"chunk number {i} about topic {i}") for i in range(5)]
+
+    assert packer.pack(documents, k=2) == documents[:2]
+
+
+def test_pack_skips_chunks_beyond_the_budget():
+    packer = ContextPacker(token_budget=30)
+    documents = [doc("first " * 10), doc("second " * 20), doc("third " * 5)]
+
+    packed = packer.pack(documents)
+
+    assert [d.page_content for d in packed] == [documents[0].page_content, documents[2].page_content]
+    assert sum(count_tokens(d.page_content) for d in packed) <= 30
+
+
+def test_pack_truncates_a_best_chunk_larger_than_the_budget():
+    packer = ContextPacker(token_budget=5)
+
+    packed = packer.pack([doc("x" * 100)])
+
+    assert len(packed) == 1
+    assert count_tokens(packed[0].page_content) <= 5
+    assert packed[0].metadata == {
+        "source": "a.txt",
+        CHUNK_ID_KEY: BaseVectorStore.make_document_id("x" * 100, {"source": "a.txt"}),
+    }
+
+
+def test_unknown_model_without_default_encoding_counts_approximately(mocker):
+    from src.rag import context_packer
+    mocker.patch.object(context_packer, "_get_encoding", _get_encoding)
+    tiktoken = mocker.patch.object(context_packer, "tiktoken")
+    tiktoken.encoding_for_model.side_effect = KeyError("unknown-model")
+    tiktoken.get_encoding.side_effect = ConnectionError("offline")
+    _get_encoding.cache_clear()
+    try:
+        assert _get_encoding("unknown-model") is None
+        assert count_tokens("abcd" * 10, "unknown-model") == estimate_tokens("abcd" * 10)
+    finally:
+        _get_encoding.cache_clear()
+
+
+def test_budget_can_be_set_per_model(mocker):
+    mocker.patch('src.rag.context_packer.CONTEXT_TOKEN_BUDGETS', {"gpt-4o": 8000})
+    mocker.patch('src.rag.context_packer.CONTEXT_TOKEN_BUDGET', 3000)
+
+    assert get_context_token_budget("gpt-4o") == 8000
+    assert get_context_token_budget("gpt-3.5-turbo") == 3000
+    assert get_context_token_budget(None) == 3000
+
+
+def test_packed_retriever_packs_inner_results():
+    inner = Mock()
+    inner.invoke.return_value = [doc("same text"), doc("same text"), doc("other text"), doc("more text")]
+    retriever = PackedRetriever(retriever=inner, packer=ContextPacker(token_budget=1000), k=2)
+
+    documents = retriever.invoke("query")
+
+    assert [d.page_content for d in documents] == ["same text", "other text"]
@@ -0,0 +1,52 @@
+import pytest
+from src.embeddings.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path) -> EmbeddingCache:
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    yield cache
+    cache.close()
+
+
+def test_get_many_returns_none_for_misses(cache):
+    cache.put_many("model", None, ["a"], [[0.5, 0.25]])
+
+    results = cache.get_many("model", None, ["a", "b"])
+
+    assert results == [[0.5, 0.25], None]
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_keys_include_model_and_dimensions(cache):
+    cache.put_many("model", 256, ["a"], [[1.0]])
+
+    assert cache.get_many("model", None, ["a"]) == [None]
+    assert cache.get_many("other-model", 256, ["a"]) == [None]
+    assert cache.get_many("model", 256, ["a"]) == [[1.0]]
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = EmbeddingCache(path)
+    first.put_many("model", None, ["hello"], [[0.5]])
+    first.close()
+
+    second = EmbeddingCache(path)
+    assert second.get_many("model", None, ["hello"]) == [[0.5]]
+    second.close()
+
+
+def test_eviction_is_size_bounded(cache):
+    cache.put_many("model", None, ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    cache.put_many("model", None, ["d"], [[4.0]])
+
+    stats = cache.get_stats()
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 1
+
+
+def test_put_many_length_mismatch(cache):
+    with pytest.raises(ValueError, match="same length"):
+        cache.put_many("model", None, ["a", "b"], [[1.0]])
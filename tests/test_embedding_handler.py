@@ -9,10 +9,20 @@ def set_api_key(monkeypatch):
 
 def test_embedding_handler_initializes_embeddings(mocker):
     mock_embeddings = Mock()
-    mocker.patch('src.embeddings.embedding_handler.OpenAIEmbeddings', return_value=mock_embeddings)
+    embeddings_cls = mocker.patch('src.embeddings.registry.OpenAIEmbeddings', return_value=mock_embeddings)
+    mocker.patch('src.embeddings.registry.EMBEDDING_CACHE_ENABLED', False)
+    mocker.patch('src.embeddings.registry.QUERY_COALESCE_WINDOW_MS', 0)
 
     from src.embeddings.embedding_handler import EmbeddingHandler
 
     handler = EmbeddingHandler()
     assert handler.get_embeddings() is mock_embeddings
+    assert embeddings_cls.call_args.kwargs["api_key"] == "test-key-123"
 
+
+def test_embedding_handler_uses_registry_for_other_backends():
+    from src.embeddings.embedding_handler import EmbeddingHandler
+    from src.embeddings.local_embeddings import HashingEmbeddings
+
+    handler = EmbeddingHandler(backend="hashing")
+    assert isinstance(handler.get_embeddings(), HashingEmbeddings)
@@ -0,0 +1,70 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src import http_clients
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    monkeypatch.setattr(http_clients, "_stats", http_clients.ConnectionStats())
+    http_clients.close_http_clients()
+    yield
+    http_clients.close_http_clients()
+
+
+def test_shared_client_is_reused():
+    assert http_clients.get_http_client() is http_clients.get_http_client()
+    assert http_clients.get_async_http_client() is http_clients.get_async_http_client()
+
+
+def test_connection_reuse_is_measured(server):
+    client = http_clients.get_http_client()
+    for _ in range(3):
+        assert client.get(server).text == "ok"
+
+    stats = http_clients.get_connection_stats()
+    assert stats["requests"] == 3
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 2
+
+
+def test_closed_client_is_recreated():
+    client = http_clients.get_http_client()
+    http_clients.close_http_clients()
+    assert client.is_closed
+    assert http_clients.get_http_client() is not client
+
+
+def test_created_client_is_pooled_and_counted(server):
+    client = http_clients.create_http_client(headers={"X-Test": "1"})
+    try:
+        assert client.timeout.read is not None
+        assert client.headers["X-Test"] == "1"
+        client.get(server)
+        assert http_clients.get_connection_stats()["requests"] == 1
+    finally:
+        client.close()
@@ -0,0 +1,84 @@
+import os
+import pytest
+from src.vector_store.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize, validate_search_mode
+
+
+def test_tokenize_keeps_identifiers_whole():
+    tokens = tokenize("Exports land in s3://acme-data/exports/orders_2024.csv nightly")
+    assert "s3://acme-data/exports/orders_2024.csv" in tokens
+    assert {"s3", "acme", "data", "exports", "orders_2024", "csv", "nightly"} <= set(tokens)
+
+
+def test_bm25_ranks_exact_identifier_first(tmp_path):
+    index = LexicalIndex(str(tmp_path / "index.jsonl"))
+    index.add(
+        ["a", "b", "c"],
+        [
+            "Orders export stored in s3://acme/exports/orders.csv",
+            "Customer export stored in s3://acme/exports/customers.csv",
+            "Reviews are pulled monthly",
+        ]
+    )
+    results = index.search("where is orders.csv", 3)
+    assert [doc_id for doc_id, _ in results][:1] == ["a"]
+    assert "c" not in [doc_id for doc_id, _ in results]
+
+
+def test_build_replaces_the_index_in_one_step(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical" / "index.jsonl"))
+    index.add(["old"], ["stale chunk"])
+
+    def batches():
+        yield ["a", "b"], ["alpha report", "beta report"]
+        assert [doc_id for doc_id, _ in index.search("stale", 5)] == ["old"]
+        yield ["c"], ["gamma report"]
+
+    index.build(batches())
+    assert len(index) == 3
+    assert index.search("stale", 5) == []
+    assert not os.path.exists(f"{index.path}.build")
+
+
+def test_index_is_persisted_and_read_incrementally(tmp_path):
+    path = str(tmp_path / "index.jsonl")
+    writer = LexicalIndex(path)
+    reader = LexicalIndex(path)
+    writer.add(["a"], ["alpha beta"])
+    assert len(reader) == 1
+
+    # The reader only replays entries appended since its last read
+    offset = reader._offset
+    writer.add(["b"], ["gamma"])
+    writer.delete(["a"])
+    assert reader.search("gamma", 5)[0][0] == "b"
+    assert reader._offset > offset
+    assert reader.search("alpha", 5) == []
+    assert len(LexicalIndex(path)) == 1
+
+
+def test_compact_keeps_live_chunks_only(tmp_path):
+    path = str(tmp_path / "index.jsonl")
+    index = LexicalIndex(path)
+    index.add(["a", "b"], ["alpha", "beta"])
+    index.add(["a"], ["alpha again"])
+    index.delete(["b"])
+    size = os.path.getsize(path)
+
+    index.compact()
+    assert os.path.getsize(path) < size
+    reloaded = LexicalIndex(path)
+    assert len(reloaded) == 1
+    assert reloaded.search("again", 1)[0][0] == "a"
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["b", "c", "a"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_validate_search_mode():
+    assert validate_search_mode(None) == "vector"
+    assert validate_search_mode("HYBRID") == "hybrid"
+    with pytest.raises(ValueError, match="Unsupported search mode"):
+        validate_search_mode("sparse")
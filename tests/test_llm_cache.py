@@ -0,0 +1,88 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+from src.llm.llm_cache import LLMCache
+
+
+@pytest.fixture
+def cache(tmp_path) -> LLMCache:
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite3"), max_entries=2)
+    yield cache
+    cache.close()
+
+
+def test_lookup_returns_stored_generations(cache):
+    cache.update("prompt", "model=a", [ChatGeneration(message=AIMessage(content="answer"))])
+
+    result = cache.lookup("prompt", "model=a")
+
+    assert result[0].message.content == "answer"
+    assert cache.lookup("prompt", "model=b") is None
+    assert cache.lookup("other prompt", "model=a") is None
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_plain_generations_round_trip(cache):
+    cache.update("prompt", "llm", [Generation(text="text answer")])
+
+    assert cache.lookup("prompt", "llm")[0].text == "text answer"
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    first = LLMCache(path)
+    first.update("prompt", "llm", [Generation(text="kept")])
+    first.close()
+
+    second = LLMCache(path)
+    assert second.lookup("prompt", "llm")[0].text == "kept"
+    second.close()
+
+
+def test_least_recently_used_entries_are_evicted(cache, mocker):
+    clock = mocker.patch("src.llm.llm_cache.time.time", return_value=1.0)
+    cache.update("a", "llm", [Generation(text="a")])
+    clock.return_value = 2.0
+    cache.update("b", "llm", [Generation(text="b")])
+    clock.return_value = 3.0
+    cache.lookup("a", "llm")
+    clock.return_value = 4.0
+    cache.update("c", "llm", [Generation(text="c")])
+
+    assert cache.lookup("b", "llm") is None
+    assert cache.lookup("a", "llm") is not None
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.count() == 2
+
+
+def test_expired_entries_are_misses(tmp_path, mocker):
+    clock = mocker.patch("src.llm.llm_cache.time.time", return_value=100.0)
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite3"), ttl_seconds=60)
+    cache.update("prompt", "llm", [Generation(text="old")])
+
+    clock.return_value = 150.0
+    assert cache.lookup("prompt", "llm") is not None
+    clock.return_value = 170.0
+    assert cache.lookup("prompt", "llm") is None
+    assert cache.get_stats()["expirations"] == 1
+    assert cache.count() == 0
+    cache.close()
+
+
+def test_clear_removes_entries(cache):
+    cache.update("prompt", "llm", [Generation(text="x")])
+
+    cache.clear()
+
+    assert cache.count() == 0
+
+
+def test_chat_model_skips_provider_call_on_cache_hit(cache):
+    llm = FakeListChatModel(responses=["first", "second"], cache=cache)
+
+    assert llm.invoke("same question").content == "first"
+    assert llm.invoke("same question").content == "first"
+    assert llm.invoke("different question").content == "second"
+    assert cache.get_stats()["hits"] == 1
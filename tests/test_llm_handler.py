@@ -21,3 +21,13 @@ def test_llm_handler_initializes_and_prompt(mocker):
     assert "ctx" in rendered
     assert "q?" in rendered
 
+
+def test_llm_handler_uses_shared_llm_cache(mocker):
+    cache = Mock()
+    mocker.patch('src.llm.llm_handler.get_llm_cache', return_value=cache)
+    chat_openai = mocker.patch('src.llm.llm_handler.ChatOpenAI')
+
+    from src.llm.llm_handler import LLMHandler
+
+    LLMHandler()
+    assert chat_openai.call_args.kwargs["cache"] is cache
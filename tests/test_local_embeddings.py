@@ -0,0 +1,32 @@
+import numpy as np
+from src.embeddings.local_embeddings import HashingEmbeddings
+
+
+def test_hashing_embeddings_are_deterministic_and_normalised():
+    emb = HashingEmbeddings(dimensions=64)
+
+    first = emb.embed_documents_array(["the quick brown fox", "lorem ipsum"])
+    second = HashingEmbeddings(dimensions=64).embed_documents_array(["the quick brown fox", "lorem ipsum"])
+
+    assert first.shape == (2, 64) and first.dtype == np.float32
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+
+
+def test_hashing_embeddings_reflect_lexical_overlap():
+    emb = HashingEmbeddings(dimensions=256)
+    query = emb.embed_query_array("S3 bucket for marketing exports")
+    docs = emb.embed_documents_array(["marketing exports land in an S3 bucket", "daily weather report"])
+
+    scores = docs @ query
+    assert scores[0] > scores[1]
+
+
+def test_hashing_embeddings_list_interfaces():
+    emb = HashingEmbeddings(dimensions=16)
+
+    assert len(emb("hello")) == 1
+    assert len(emb.embed_query("hello")) == 16
+    assert emb.embed_documents([]) == []
+    assert emb.with_dimensions(8).dimensions == 8
+    assert emb.embed_query("") == [0.0] * 16
@@ -0,0 +1,317 @@
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from src.embeddings.local_embeddings import HashingEmbeddings
+from src.embeddings.query_coalescer import QueryCoalescer, close_query_coalescers
+from src.vector_store.numpy_store import NumpyStore, matches_document, matches_where
+
+
+DOCUMENTS = [
+    {"text": "Marketing exports land in the S3 bucket nightly", "metadata": {"source": "exports.txt", "year": 2023}},
+    {"text": "Loyalty data arrives over SFTP every 15 minutes", "metadata": {"source": "loyalty.txt", "year": 2024}},
+    {"text": "Reviews are pulled from BazaarVoice monthly", "metadata": {"source": "reviews.txt", "year": 2024}},
+]
+
+
+@pytest.fixture
+def store(tmp_path) -> NumpyStore:
+    return NumpyStore(str(tmp_path / "flat"), embedding_function=HashingEmbeddings(dimensions=64))
+
+
+def test_add_and_search(store):
+    """Test vectors are stored in a memory-mapped file and ranked by distance."""
+    store.add_documents(DOCUMENTS, "space")
+
+    results = store.similarity_search("S3 bucket exports", "space", k=2)
+    assert [doc["metadata"]["source"] for doc in results][0] == "exports.txt"
+    assert len(results) == 2
+    assert results[0]["score"] >= results[1]["score"]
+
+    space = store._load_space("space")
+    assert isinstance(space.vectors, np.memmap) and not space.vectors.flags.writeable
+    assert store.get_existing_collections() == ["space"]
+
+
+def test_search_matches_exact_squared_l2(store):
+    """Test top-k and scores equal a full sort of squared L2 distances."""
+    embeddings = HashingEmbeddings(dimensions=64)
+    texts = [f"document number {i} about topic {i % 7}" for i in range(50)]
+    store.add_documents([{"text": text} for text in texts], "space")
+
+    query = "topic 3 document"
+    matrix = np.asarray(embeddings.embed_documents(texts))
+    distances = ((matrix - np.asarray(embeddings.embed_query(query))) ** 2).sum(axis=1)
+    expected = np.argsort(distances)[:5]
+
+    results = store.similarity_search(query, "space", k=5)
+    assert [doc["text"] for doc in results] == [texts[i] for i in expected]
+    assert results[0]["score"] == pytest.approx(1.0 - distances[expected[0]], abs=1e-5)
+
+
+def test_upsert_is_incremental(store):
+    """Test unchanged chunks are skipped and stale chunks of a source replaced."""
+    assert store.upsert_documents(DOCUMENTS, "space") == {"added": 3, "skipped": 0, "replaced": 0, "deduplicated": 0}
+    updated = [DOCUMENTS[0], {"text": "Loyalty data now arrives hourly", "metadata": {"source": "loyalty.txt"}}]
+    assert store.upsert_documents(updated, "space", replace_sources=True) == {"added": 1, "skipped": 1, "replaced": 1, "deduplicated": 0}
+
+    texts = [doc["text"] for doc in store.similarity_search("data", "space", k=10)]
+    assert sorted(texts) == sorted([DOCUMENTS[0]["text"], DOCUMENTS[2]["text"], "Loyalty data now arrives hourly"])
+
+
+def test_add_documents_is_additive_without_replace_sources(store):
+    """Test a batch naming an existing source keeps that source's other chunks."""
+    store.add_documents(DOCUMENTS, "space")
+    extra = {"text": "Loyalty data now arrives hourly", "metadata": {"source": "loyalty.txt"}}
+    assert store.upsert_documents([extra], "space") == {"added": 1, "skipped": 0, "replaced": 0, "deduplicated": 0}
+    assert len(next(store.iter_records("space", 10))[0]) == 4
+
+
+def test_asimilarity_search_embeds_through_the_async_client(store, mocker):
+    """Test async search awaits the embeddings client instead of blocking on it."""
+    import asyncio
+
+    store.add_documents(DOCUMENTS, "space")
+    embeddings = store._embedding_function
+    mocker.patch.object(embeddings, "embed_query", side_effect=AssertionError("blocking embed"))
+
+    async def aembed_query(text):
+        return HashingEmbeddings(dimensions=64).embed_query(text)
+
+    embeddings.aembed_query = aembed_query
+    results = asyncio.run(store.asimilarity_search("S3 bucket exports", "space", k=1))
+
+    assert [doc["metadata"]["source"] for doc in results] == ["exports.txt"]
+    assert asyncio.run(store.asimilarity_search("anything", "missing")) == []
+
+
+def test_upsert_reports_texts_embedded_once(store):
+    """Test new chunks repeating another chunk's text are counted as deduplicated."""
+    repeated = [{"text": "Same boilerplate", "metadata": {"source": source}} for source in ("a.txt", "b.txt", "c.txt")]
+    assert store.upsert_documents(repeated, "space") == {"added": 3, "skipped": 0, "replaced": 0, "deduplicated": 2}
+
+
+def test_embedding_stats_sum_dimension_variants(tmp_path):
+    """Test embedding stats share the default's cache counters and sum deduplication and coalescing."""
+    def coalesced(saved):
+        inner = Mock(spec=["embed_documents", "get_cache_stats", "get_retry_stats", "get_dedup_stats"])
+        inner.embed_documents.side_effect = lambda texts: [[1.0, 0.0]] * len(texts)
+        inner.get_cache_stats.return_value = {"hits": 3}
+        inner.get_retry_stats.return_value = {"retries": 1}
+        inner.get_dedup_stats.return_value = {"inputs": 10, "saved": saved}
+        return QueryCoalescer(inner, window_ms=0)
+
+    default, reduced = coalesced(2), coalesced(1)
+    store = NumpyStore(str(tmp_path), embedding_function=default)
+    store._dimension_embedding_functions[8] = reduced
+    try:
+        for embeddings, text in ((default, "a"), (reduced, "b"), (reduced, "c")):
+            embeddings.embed_query(text)
+        stats = store.get_embedding_stats()
+    finally:
+        close_query_coalescers()
+
+    assert stats["cache"] == {"hits": 3}
+    assert stats["retries"] == {"retries": 1}
+    assert stats["deduplication"] == {"inputs": 20, "saved": 3}
+    assert stats["query_coalescing"] == {"requests": 3, "batches": 3, "average_batch_size": 1.0}
+
+
+def test_filters(store):
+    """Test where and where_document filters restrict candidates before ranking."""
+    store.add_documents(DOCUMENTS, "space")
+
+    results = store.similarity_search("S3 bucket exports", "space", k=3, where={"year": {"$gte": 2024}})
+    assert {doc["metadata"]["source"] for doc in results} == {"loyalty.txt", "reviews.txt"}
+    results = store.similarity_search("data", "space", where_document={"$contains": "SFTP"})
+    assert [doc["metadata"]["source"] for doc in results] == ["loyalty.txt"]
+    assert store.similarity_search("data", "space", where={"source": "missing.txt"}) == []
+    assert store.get_filterable_keys("space") == ["source", "year"]
+
+    with pytest.raises(Exception, match="Unknown metadata filter key"):
+        store.similarity_search("data", "space", where={"yaer": 2024})
+
+
+def test_reader_remaps_after_another_writer(tmp_path):
+    """Test a second store on the same directory (e.g. another worker) sees new writes."""
+    writer = NumpyStore(str(tmp_path), embedding_function=HashingEmbeddings(dimensions=32))
+    reader = NumpyStore(str(tmp_path), embedding_function=HashingEmbeddings(dimensions=32))
+    writer.add_documents(DOCUMENTS[:1], "shared")
+    assert len(reader.similarity_search("anything", "shared", k=10)) == 1
+
+    writer.add_documents(DOCUMENTS[1:], "shared")
+    assert len(reader.similarity_search("anything", "shared", k=10)) == 3
+
+
+def test_embedding_runs_outside_the_write_lock(tmp_path, mocker):
+    """Test another writer can write while a batch is embedded, and chunks it stored are not duplicated."""
+    import threading
+    store = NumpyStore(str(tmp_path), embedding_function=HashingEmbeddings(dimensions=32))
+    other = NumpyStore(str(tmp_path), embedding_function=HashingEmbeddings(dimensions=32))
+    store.configure_collection("shared")
+    embed = store._embed_documents
+
+    def embed_while_other_writes(texts, config):
+        writer = threading.Thread(target=other.add_documents, args=(DOCUMENTS[:1], "shared"))
+        writer.start()
+        writer.join(timeout=10)
+        assert not writer.is_alive()
+        return embed(texts, config)
+
+    mocker.patch.object(store, "_embed_documents", side_effect=embed_while_other_writes)
+    assert store.upsert_documents(DOCUMENTS, "shared") == {"added": 2, "skipped": 1, "replaced": 0, "deduplicated": 0}
+    assert len(next(store.iter_records("shared", 10))[0]) == 3
+
+
+def test_upsert_loads_the_space_once_across_batches(store, mocker):
+    """Test batches append to one write session instead of remapping the space after each one."""
+    from src.vector_store import numpy_store
+    mocker.patch.object(numpy_store, "CHROMA_WRITE_BATCH_SIZE", 2)
+    documents = [{"text": f"chunk {i}", "metadata": {"source": "many.txt"}} for i in range(20)]
+    store.configure_collection("space")
+    loads = mocker.spy(numpy_store._FlatSpace, "__init__")
+
+    assert store.upsert_documents(documents, "space", replace_sources=True)["added"] == 20
+    assert loads.call_count == 1
+    assert len(store.similarity_search("chunk", "space", k=50)) == 20
+    assert loads.call_count == 2
+
+
+def test_readers_are_not_blocked_by_a_waiting_writer(tmp_path):
+    """Test searches keep running while a writer of this process waits for another process's file lock."""
+    import fcntl
+    import threading
+    store = NumpyStore(str(tmp_path), embedding_function=HashingEmbeddings(dimensions=32))
+    store.add_documents(DOCUMENTS, "shared")
+    with open(tmp_path / ".shared.lock", "a") as f:
+        # Another process's writer; flock locks taken through separate opens conflict
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        writer = threading.Thread(
+            target=store.add_documents, args=([{"text": "late chunk", "metadata": {}}], "shared"), daemon=True
+        )
+        writer.start()
+        writer.join(timeout=0.2)
+        assert writer.is_alive()
+
+        reader = threading.Thread(target=store.similarity_search, args=("data", "shared"), daemon=True)
+        reader.start()
+        reader.join(timeout=5)
+        assert not reader.is_alive()
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    writer.join(timeout=5)
+    assert len(store.similarity_search("data", "shared", k=10)) == 4
+
+
+def test_append_drops_vectors_of_an_interrupted_write(store):
+    """Test vector rows written without their records do not shift later rows."""
+    store.add_documents(DOCUMENTS[:1], "space")
+    with open(f"{store._space_path('space')}/vectors.f32", "ab") as f:
+        f.write(np.ones(64, dtype=np.float32).tobytes())
+    store.add_documents(DOCUMENTS[1:], "space")
+
+    results = store.similarity_search(DOCUMENTS[2]["text"], "space", k=1)
+    assert results[0]["text"] == DOCUMENTS[2]["text"]
+    assert results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_delete_collection_and_invalid_names(store):
+    """Test spaces can be deleted and names cannot escape the store directory."""
+    store.add_documents(DOCUMENTS, "space")
+    store.delete_collection("space")
+    assert store.get_existing_collections() == []
+    assert store.similarity_search("query", "space") == []
+
+    with pytest.raises(Exception, match="Invalid space name"):
+        store.add_documents(DOCUMENTS, "../outside")
+
+
+def test_filter_evaluation():
+    """Test the Chroma-style filter operators."""
+    metadata = {"source": "a.txt", "page": 3}
+    assert matches_where(metadata, {"source": "a.txt"})
+    assert matches_where(metadata, {"page": {"$gt": 2, "$lte": 3}})
+    assert matches_where(metadata, {"$or": [{"source": "b.txt"}, {"page": {"$in": [1, 3]}}]})
+    assert not matches_where(metadata, {"$and": [{"source": "a.txt"}, {"page": {"$ne": 3}}]})
+    assert not matches_where(metadata, {"missing": {"$gt": 1}})
+    assert matches_document("S3 bucket", {"$and": [{"$contains": "S3"}, {"$not_contains": "SFTP"}]})
+    with pytest.raises(ValueError):
+        matches_where(metadata, {"page": {"$near": 1}})
+
+
+def test_flat_snapshot_round_trip_int8(tmp_path):
+    from src.vector_store.snapshot import iter_snapshot, write_snapshot
+    store = NumpyStore(str(tmp_path / "a"), embedding_function=HashingEmbeddings())
+    store.add_documents([{"text": f"chunk {i}", "metadata": {"source": "a"}} for i in range(10)], "docs")
+
+    manifest = write_snapshot(str(tmp_path / "snap"), {"collection": "docs"}, store.iter_records("docs", 4), "int8")
+    assert manifest["count"] == 10
+
+    target = NumpyStore(str(tmp_path / "b"), embedding_function=HashingEmbeddings())
+    target.configure_collection("docs")
+    assert target.load_records("docs", iter_snapshot(str(tmp_path / "snap"), 3)) == 10
+    assert target.load_records("docs", iter_snapshot(str(tmp_path / "snap"), 3)) == 0
+
+    original = store.similarity_search("chunk 7", "docs", k=1)[0]
+    restored = target.similarity_search("chunk 7", "docs", k=1)[0]
+    assert restored["text"] == original["text"] == "chunk 7"
+    assert restored["score"] == pytest.approx(original["score"], abs=0.02)
+
+
+def test_flat_hybrid_search_uses_lexical_index(tmp_path):
+    store = NumpyStore(str(tmp_path), embedding_function=HashingEmbeddings())
+    store.add_documents(DOCUMENTS, "docs")
+
+    results = store.similarity_search("BazaarVoice", "docs", k=1, search_mode="hybrid")
+    assert results[0]["metadata"]["source"] == "reviews.txt"
+    filtered = store.similarity_search("BazaarVoice", "docs", k=3, where={"year": 2023}, search_mode="hybrid")
+    assert [doc["metadata"]["source"] for doc in filtered] == ["exports.txt"]
+
+    # Stale chunks of a re-ingested source leave the lexical index too
+    store.add_documents(
+        [{"text": "Reviews now come from Trustpilot", "metadata": {"source": "reviews.txt"}}], "docs", replace_sources=True
+    )
+    results = store.similarity_search("BazaarVoice", "docs", k=3, search_mode="hybrid")
+    assert all("BazaarVoice" not in doc["text"] for doc in results)
+
+
+@pytest.mark.parametrize("quantization,filename,bytes_per_value", [("float16", "vectors.f16", 2), ("int8", "vectors.i8", 1)])
+def test_quantized_spaces_store_compact_vectors(tmp_path, quantization, filename, bytes_per_value):
+    """Test float16/int8 spaces persist the compact values and still rank like float32."""
+    import os
+    texts = [f"document number {i} about topic {i % 7}" for i in range(40)]
+    full = NumpyStore(str(tmp_path / "full"), embedding_function=HashingEmbeddings(dimensions=64))
+    full.add_documents([{"text": text} for text in texts], "space")
+    store = NumpyStore(str(tmp_path / "compact"), embedding_function=HashingEmbeddings(dimensions=64))
+    store.configure_collection("space", quantization=quantization)
+    store.add_documents([{"text": text} for text in texts], "space")
+
+    path = tmp_path / "compact" / "space"
+    assert os.path.getsize(path / filename) == 40 * 64 * bytes_per_value
+    assert not (path / "vectors.f32").exists()
+    assert (path / "scales.f32").exists() == (quantization == "int8")
+
+    expected = full.similarity_search("topic 3 document", "space", k=1)[0]
+    result = store.similarity_search("topic 3 document", "space", k=1)[0]
+    assert result["text"] == expected["text"]
+    assert result["score"] == pytest.approx(expected["score"], abs=0.05)
+
+    # Rewrites after a re-ingested source keep vectors and scales aligned with records
+    store.add_documents([{"text": "replacement", "metadata": {"source": "x"}}], "space")
+    store.add_documents([{"text": "replacement two", "metadata": {"source": "x"}}], "space", replace_sources=True)
+    assert store.similarity_search("replacement two", "space", k=1)[0]["text"] == "replacement two"
+    assert len(next(store.iter_records("space", 100))[0]) == 41
+
+
+def test_spaces_without_vector_dtype_read_float32_files(store):
+    """Test spaces written before quantized storage keep reading their float32 vectors."""
+    import json
+    store.configure_collection("legacy", quantization="int8")
+    config_path = f"{store._space_path('legacy')}/config.json"
+    with open(config_path) as f:
+        config = json.load(f)
+    del config["vector_dtype"]
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+
+    store.add_documents(DOCUMENTS, "legacy")
+    assert store._load_space("legacy").vectors.dtype == np.float32
+    assert store.similarity_search("S3 bucket exports", "legacy", k=1)[0]["metadata"]["source"] == "exports.txt"
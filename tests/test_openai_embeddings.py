@@ -70,3 +70,183 @@ def test_openai_embeddings_embed_query_error_handling(mocker):
     with pytest.raises(Exception, match="Failed to generate query embedding: API Error"):
         emb.embed_query("test")
 
+
+def test_openai_embeddings_only_sends_cache_misses(mocker, tmp_path):
+    """Test cached texts are served locally and only misses reach the API."""
+    from src.embeddings.embedding_cache import EmbeddingCache
+
+    mock_client = mocker.Mock()
+    mock_client.embeddings.create.return_value = mocker.Mock(
+        data=[mocker.Mock(embedding=[0.5, 0.25])]
+    )
+    mocker.patch('src.embeddings.openai_embeddings.OpenAI', return_value=mock_client)
+
+    from src.embeddings.openai_embeddings import OpenAIEmbeddings
+
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many("text-embedding-3-small", None, ["cached"], [[1.0, 2.0]])
+    emb = OpenAIEmbeddings(api_key="test-key", cache=cache)
+
+    out = emb.embed_documents(["cached", "new"])
+
+    assert out == [[1.0, 2.0], [0.5, 0.25]]
+    mock_client.embeddings.create.assert_called_once_with(model="text-embedding-3-small", input=["new"])
+    # The miss is now cached, so repeating the query makes no API call
+    assert emb.embed_query("new") == [0.5, 0.25]
+    assert mock_client.embeddings.create.call_count == 1
+    assert emb.get_cache_stats()["hits"] == 2
+
+
+def test_openai_embeddings_batches_preserve_input_order(mocker):
+    """Test large inputs are split into batches and reassembled in order."""
+    mock_client = mocker.Mock()
+
+    def create(model, input):
+        return mocker.Mock(data=[mocker.Mock(embedding=[float(text)]) for text in input])
+
+    mock_client.embeddings.create.side_effect = create
+    mocker.patch('src.embeddings.openai_embeddings.OpenAI', return_value=mock_client)
+
+    from src.embeddings.openai_embeddings import OpenAIEmbeddings
+
+    emb = OpenAIEmbeddings(api_key="test-key", max_batch_size=3, max_workers=3)
+    texts = [str(i) for i in range(10)]
+
+    out = emb.embed_documents(texts)
+
+    assert out == [[float(i)] for i in range(10)]
+    assert mock_client.embeddings.create.call_count == 4
+    assert all(len(call.kwargs["input"]) <= 3 for call in mock_client.embeddings.create.call_args_list)
+
+
+def test_openai_embeddings_async_paths(mocker):
+    """Test aembed_documents and aembed_query use the async client."""
+    import asyncio
+
+    mock_async_client = mocker.Mock()
+    mock_async_client.embeddings.create = mocker.AsyncMock(
+        return_value=mocker.Mock(data=[mocker.Mock(embedding=[0.1, 0.2, 0.3])])
+    )
+    mocker.patch('src.embeddings.openai_embeddings.OpenAI')
+    mocker.patch('src.embeddings.openai_embeddings.AsyncOpenAI', return_value=mock_async_client)
+
+    from src.embeddings.openai_embeddings import OpenAIEmbeddings
+
+    emb = OpenAIEmbeddings(api_key="test-key")
+
+    assert asyncio.run(emb.aembed_documents(["a"])) == [[0.1, 0.2, 0.3]]
+    assert asyncio.run(emb.aembed_query("a")) == [0.1, 0.2, 0.3]
+    assert mock_async_client.embeddings.create.await_count == 2
+
+
+def test_openai_embeddings_async_cache_io_runs_off_event_loop(mocker, tmp_path):
+    """Test the async path reads and writes the SQLite cache in a worker thread."""
+    import asyncio
+    import threading
+    from src.embeddings.embedding_cache import EmbeddingCache
+
+    mock_async_client = mocker.Mock()
+    mock_async_client.embeddings.create = mocker.AsyncMock(
+        return_value=mocker.Mock(data=[mocker.Mock(embedding=[0.1, 0.2])])
+    )
+    mocker.patch('src.embeddings.openai_embeddings.OpenAI')
+    mocker.patch('src.embeddings.openai_embeddings.AsyncOpenAI', return_value=mock_async_client)
+
+    from src.embeddings.openai_embeddings import OpenAIEmbeddings
+
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    threads = []
+    for name in ("get_many", "put_many"):
+        original = getattr(cache, name)
+
+        def record(*args, _original=original, **kwargs):
+            threads.append(threading.current_thread())
+            return _original(*args, **kwargs)
+
+        mocker.patch.object(cache, name, side_effect=record)
+    emb = OpenAIEmbeddings(api_key="test-key", cache=cache)
+
+    assert asyncio.run(emb.aembed_query("a")) == [0.1, 0.2]
+    assert len(threads) == 2
+    assert all(thread is not threading.main_thread() for thread in threads)
+
+
+def test_openai_embeddings_async_error_handling(mocker):
+    """Test error handling in aembed_query."""
+    import asyncio
+
+    mock_async_client = mocker.Mock()
+    mock_async_client.embeddings.create = mocker.AsyncMock(side_effect=Exception("API Error"))
+    mocker.patch('src.embeddings.openai_embeddings.OpenAI')
+    mocker.patch('src.embeddings.openai_embeddings.AsyncOpenAI', return_value=mock_async_client)
+
+    from src.embeddings.openai_embeddings import OpenAIEmbeddings
+
+    emb = OpenAIEmbeddings(api_key="test-key")
+    with pytest.raises(Exception, match="Failed to generate query embedding: API Error"):
+        asyncio.run(emb.aembed_query("test"))
+
+
+def _b64(values):
+    import base64
+    import numpy as np
+    return base64.b64encode(np.asarray(values, dtype=np.float32).tobytes()).decode()
+
+
+def test_decode_base64_embeddings_builds_contiguous_matrix():
+    import numpy as np
+    from src.embeddings.openai_embeddings import decode_base64_embeddings
+
+    matrix = decode_base64_embeddings([_b64([0.5, 1.0]), _b64([2.0, -1.0])])
+
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    assert matrix.tolist() == [[0.5, 1.0], [2.0, -1.0]]
+
+
+def test_openai_embeddings_array_mode_uses_base64_and_cache(mocker, tmp_path):
+    """Test array mode requests base64 and merges cached rows with fresh ones."""
+    from src.embeddings.embedding_cache import EmbeddingCache
+
+    mock_client = mocker.Mock()
+    mock_client.embeddings.create.return_value = mocker.Mock(
+        data=[mocker.Mock(embedding=_b64([0.5, 0.25]))]
+    )
+    mocker.patch('src.embeddings.openai_embeddings.OpenAI', return_value=mock_client)
+
+    from src.embeddings.openai_embeddings import OpenAIEmbeddings
+
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many("text-embedding-3-small", None, ["cached"], [[1.0, 2.0]])
+    emb = OpenAIEmbeddings(api_key="test-key", cache=cache)
+
+    matrix = emb.embed_documents_array(["cached", "new"])
+
+    assert matrix.tolist() == [[1.0, 2.0], [0.5, 0.25]]
+    mock_client.embeddings.create.assert_called_once_with(
+        model="text-embedding-3-small", input=["new"], encoding_format="base64"
+    )
+    assert emb.embed_query_array("new").tolist() == [0.5, 0.25]
+    assert mock_client.embeddings.create.call_count == 1
+
+
+def test_openai_embeddings_deduplicates_before_embedding(mocker):
+    """Test repeated texts are embedded once and scattered back to every position."""
+    mock_client = mocker.Mock()
+
+    def create(model, input):
+        return mocker.Mock(data=[mocker.Mock(embedding=[float(len(text))]) for text in input])
+
+    mock_client.embeddings.create.side_effect = create
+    mocker.patch('src.embeddings.openai_embeddings.OpenAI', return_value=mock_client)
+
+    from src.embeddings.openai_embeddings import OpenAIEmbeddings
+
+    emb = OpenAIEmbeddings(api_key="test-key")
+    out = emb.embed_documents(["footer", "body text", "footer", "footer\n"])
+
+    assert out == [[6.0], [9.0], [6.0], [6.0]]
+    mock_client.embeddings.create.assert_called_once_with(
+        model="text-embedding-3-small", input=["footer", "body text"]
+    )
+    assert emb.get_dedup_stats() == {"inputs": 4, "saved": 2}
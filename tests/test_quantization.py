@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from src.vector_store.quantization import (
+    apply_quantization,
+    bytes_per_vector,
+    dequantize,
+    quantize,
+    truncate_dimensions,
+    validate_quantization,
+)
+
+
+@pytest.fixture
+def matrix() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((8, 16)).astype(np.float32)
+
+
+def test_int8_round_trip_is_close(matrix):
+    values, scales = quantize(matrix, "int8")
+    assert values.dtype == np.int8
+    restored = dequantize(values, scales, "int8")
+    assert np.allclose(restored, matrix, atol=np.abs(matrix).max() / 127)
+
+
+def test_float16_round_trip(matrix):
+    values, scales = quantize(matrix, "float16")
+    assert values.dtype == np.float16 and scales is None
+    assert apply_quantization(matrix, "float16").dtype == np.float32
+
+
+def test_bytes_per_vector():
+    assert bytes_per_vector(1536, "float32") == 6144
+    assert bytes_per_vector(1536, "float16") == 3072
+    assert bytes_per_vector(1536, "int8") == 1540
+
+
+def test_truncate_dimensions_renormalises(matrix):
+    truncated = truncate_dimensions(matrix, 4)
+    assert truncated.shape == (8, 4)
+    assert np.allclose(np.linalg.norm(truncated, axis=1), 1.0)
+    assert truncate_dimensions(matrix, None) is not None
+
+
+def test_validate_quantization():
+    assert validate_quantization(None) == "float32"
+    with pytest.raises(ValueError, match="Unsupported quantization"):
+        validate_quantization("int4")
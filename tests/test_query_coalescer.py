@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import Mock
+from src.embeddings.query_coalescer import QueryCoalescer
+
+
+class RecordingEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def test_concurrent_queries_share_one_call():
+    embeddings = RecordingEmbeddings()
+    coalescer = QueryCoalescer(embeddings, window_ms=200, max_batch_size=8)
+    results = {}
+    barrier = threading.Barrier(8)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = coalescer.embed_query("x" * i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: [float(i)] for i in range(8)}
+    assert len(embeddings.calls) < 8
+    assert coalescer.get_stats()["requests"] == 8
+
+
+def test_duplicate_queries_are_embedded_once():
+    embeddings = RecordingEmbeddings()
+    coalescer = QueryCoalescer(embeddings, window_ms=1)
+
+    assert coalescer.embed_query("same") == [4.0]
+    assert embeddings.calls == [["same"]]
+
+
+def test_errors_reach_every_caller():
+    embeddings = Mock()
+    embeddings.embed_documents.side_effect = Exception("API Error")
+    coalescer = QueryCoalescer(embeddings, window_ms=1)
+
+    with pytest.raises(Exception, match="API Error"):
+        coalescer.embed_query("q")
+
+
+def test_async_query_and_delegation():
+    embeddings = RecordingEmbeddings()
+    embeddings.model_name = "test-model"
+    coalescer = QueryCoalescer(embeddings, window_ms=1)
+
+    assert asyncio.run(coalescer.aembed_query("abc")) == [3.0]
+    assert coalescer.model_name == "test-model"
+    assert coalescer.wrapped is embeddings
+
+
+def test_close_stops_worker_and_executor():
+    from src.embeddings.query_coalescer import close_query_coalescers
+
+    coalescer = QueryCoalescer(RecordingEmbeddings(), window_ms=1)
+    assert coalescer.embed_query("before") == [6.0]
+    worker, executor = coalescer._worker, coalescer._executor
+
+    close_query_coalescers()
+
+    assert not worker.is_alive()
+    assert executor._shutdown
+    # A later query transparently starts a new worker
+    assert coalescer.embed_query("after") == [5.0]
+    coalescer.close()
+
+
+def test_close_racing_new_queries_never_hangs():
+    """Test a worker started while close() runs never steals the old worker's stop signal."""
+    coalescer = QueryCoalescer(RecordingEmbeddings(), window_ms=0)
+    results = []
+
+    def query():
+        for _ in range(50):
+            results.append(coalescer.embed_query("abc"))
+
+    clients = [threading.Thread(target=query, daemon=True) for _ in range(4)]
+    for client in clients:
+        client.start()
+    for _ in range(50):
+        closer = threading.Thread(target=coalescer.close, daemon=True)
+        closer.start()
+        closer.join(timeout=5)
+        assert not closer.is_alive()
+    for client in clients:
+        client.join(timeout=5)
+        assert not client.is_alive()
+    coalescer.close()
+    assert results == [[3.0]] * 200
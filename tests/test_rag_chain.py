@@ -4,7 +4,7 @@ from src.rag.rag_chain import RAGChain
 
 
 def test_rag_chain_initialization(rag_chain: RAGChain, mock_openai):
-    assert rag_chain.qa_chain is None
+    assert rag_chain.get_cache_stats()["qa_chains"]["size"] == 0
     assert rag_chain.vector_store is not None
     assert rag_chain.llm is not None
 
@@ -22,8 +22,37 @@ def test_initialize_chain_initializes_with_space(rag_chain: RAGChain):
 
 
 def test_initialize_chain_with_documents(rag_chain: RAGChain, mock_chroma):
-    rag_chain.initialize_chain("test_collection")
-    assert rag_chain.qa_chain is not None
+    qa_chain = rag_chain.initialize_chain("test_collection")
+    assert qa_chain is not None
+    assert rag_chain.get_chain("test_collection") is qa_chain
+
+
+def test_initialize_chain_reuses_vectorstore(rag_chain: RAGChain, mock_chroma):
+    """Test the LangChain wrapper is built once per collection handle."""
+    with patch('src.rag.rag_chain.Chroma', return_value=mock_chroma) as chroma_cls:
+        rag_chain.initialize_chain("test_collection")
+        rag_chain.initialize_chain("test_collection")
+        assert chroma_cls.call_count == 1
+
+        rag_chain.vector_store.delete_collection("test_collection")
+        rag_chain.initialize_chain("test_collection")
+        assert chroma_cls.call_count == 2
+
+
+def test_initialize_chain_uses_store_retriever_for_flat_spaces(rag_chain: RAGChain, mock_chroma):
+    """Test flat spaces get a retriever over the store instead of a Chroma wrapper."""
+    from src.rag.retriever import StoreRetriever
+
+    rag_chain.vector_store.configure_collection("flat-space", backend="flat")
+    try:
+        rag_chain.vector_store.add_documents([{"text": "flat doc", "metadata": {"source": "f.txt"}}], "flat-space")
+        retriever = rag_chain._get_retriever("flat-space", {"k": 1})
+        assert isinstance(retriever, StoreRetriever)
+        docs = retriever.invoke("flat")
+        assert [doc.page_content for doc in docs] == ["flat doc"]
+        mock_chroma.as_retriever.assert_not_called()
+    finally:
+        rag_chain.vector_store.delete_collection("flat-space")
 
 
 def test_initialize_chain_error_handling(rag_chain: RAGChain, mock_openai):
@@ -34,56 +63,250 @@ def test_initialize_chain_error_handling(rag_chain: RAGChain, mock_openai):
 
 
 def test_query_initializes_chain(rag_chain: RAGChain, mock_openai):
-    mock_response = {"result": "Test response"}
-    rag_chain.qa_chain = Mock()
-    rag_chain.qa_chain.invoke.return_value = mock_response
+    mock_qa = Mock()
+    mock_qa.invoke.return_value = {"result": "Test response"}
+    # Identical queries would otherwise be answered from the semantic cache
+    rag_chain.answer_cache = None
 
-    result = rag_chain.query("test question", space_name="test_collection")
+    with patch.object(rag_chain, '_build_chain', return_value=mock_qa) as build:
+        result = rag_chain.query("test question", space_name="test_collection")
+        rag_chain.query("test question", space_name="test_collection")
 
     assert result == [{"text": "Test response", "metadata": {"source": "qa_chain"}}]
-    rag_chain.qa_chain.invoke.assert_called_once()
+    build.assert_called_once()
+    assert mock_qa.invoke.call_count == 2
+
+
+def test_query_rebuilds_chain_after_space_was_recreated(rag_chain: RAGChain, mock_openai):
+    """Test a stale collection handle drops the space's cached handles and chain, then retries once."""
+    from chromadb.errors import NotFoundError
+
+    stale, fresh = Mock(), Mock()
+    stale.invoke.side_effect = NotFoundError("Collection [old-id] does not exists.")
+    fresh.invoke.return_value = {"result": "Fresh response"}
+    rag_chain.answer_cache = None
+    rag_chain._vectorstores["test_collection"] = (Mock(), Mock())
+
+    with patch.object(rag_chain, '_build_chain', side_effect=[stale, fresh]), \
+            patch.object(rag_chain.vector_store, 'refresh_collection') as refresh:
+        result = rag_chain.query("test question", space_name="test_collection")
+
+    assert result == [{"text": "Fresh response", "metadata": {"source": "qa_chain"}}]
+    refresh.assert_called_once_with("test_collection")
+    assert "test_collection" not in rag_chain._vectorstores
+    assert rag_chain.get_chain("test_collection") is fresh
 
 
 def test_query_without_initialization(rag_chain: RAGChain, mock_chroma):
     """Test query auto-initializes chain if not initialized."""
-    mock_response = {"result": "Auto-init response"}
-    
-    # Create a mock QA chain
     mock_qa = Mock()
-    mock_qa.invoke.return_value = mock_response
-    
-    # Clear qa_chain
-    rag_chain.qa_chain = None
-    
-    # Mock initialize_chain to set qa_chain
-    def mock_init(collection_name):
-        rag_chain.qa_chain = mock_qa
-    
-    with patch.object(rag_chain, 'initialize_chain', side_effect=mock_init):
+    mock_qa.invoke.return_value = {"result": "Auto-init response"}
+
+    with patch.object(rag_chain, 'initialize_chain', return_value=mock_qa) as mock_init:
         result = rag_chain.query("test", "test_collection")
-        # Should have called initialize_chain
-        assert rag_chain.qa_chain is not None
+        mock_init.assert_called_once_with("test_collection", "vector", 4)
         assert result == [{"text": "Auto-init response", "metadata": {"source": "qa_chain"}}]
 
 
+def test_chains_are_kept_per_space(rag_chain: RAGChain, mock_chroma):
+    """Test each space gets its own warm chain instead of reusing the first one built."""
+    chains = {"space-a": Mock(), "space-b": Mock()}
+    with patch.object(rag_chain, '_build_chain', side_effect=lambda name, kwargs=None: chains[name]) as build:
+        assert rag_chain.get_chain("space-a") is chains["space-a"]
+        assert rag_chain.get_chain("space-b") is chains["space-b"]
+        assert rag_chain.get_chain("space-a") is chains["space-a"]
+        assert build.call_count == 2
+    stats = rag_chain.get_cache_stats()["qa_chains"]
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 2)
+
+
+def test_chain_is_invalidated_on_write_and_delete(rag_chain: RAGChain, mock_chroma):
+    """Test writing to or deleting a space drops only that space's chain."""
+    with patch.object(rag_chain, '_build_chain', side_effect=lambda name, kwargs=None: Mock()) as build, \
+            patch.object(rag_chain.vector_store, 'add_documents'), \
+            patch.object(rag_chain.vector_store, 'delete_collection'):
+        first = rag_chain.get_chain("space-a")
+        other = rag_chain.get_chain("space-b")
+        rag_chain.add_documents([{"text": "new", "metadata": {}}], "space-a")
+        assert rag_chain.get_chain("space-a") is not first
+        assert rag_chain.get_chain("space-b") is other
+
+        rag_chain.delete_space("space-b")
+        assert rag_chain.get_chain("space-b") is not other
+        assert build.call_count == 4
+
+
+def test_chain_pool_evicts_least_recently_used(rag_chain: RAGChain, mock_chroma):
+    rag_chain._qa_chain_cache_size = 2
+    with patch.object(rag_chain, '_build_chain', side_effect=lambda name, kwargs=None: Mock()) as build:
+        rag_chain.get_chain("space-a")
+        rag_chain.get_chain("space-b")
+        rag_chain.get_chain("space-a")
+        rag_chain.get_chain("space-c")
+        rag_chain.get_chain("space-a")
+        assert build.call_count == 3
+        rag_chain.get_chain("space-b")
+        assert build.call_count == 4
+
+
+def test_concurrent_queries_build_chain_once(rag_chain: RAGChain, mock_chroma):
+    import threading
+    import time
+
+    def slow_build(name, kwargs=None):
+        time.sleep(0.05)
+        return Mock()
+
+    with patch.object(rag_chain, '_build_chain', side_effect=slow_build) as build:
+        chains = []
+        threads = [threading.Thread(target=lambda: chains.append(rag_chain.get_chain("space-a"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    build.assert_called_once()
+    assert len({id(chain) for chain in chains}) == 1
+
+
+def test_query_with_filters_uses_filtered_retriever(rag_chain: RAGChain, mock_chroma):
+    """Test filters are pushed into the retriever's search kwargs."""
+    mock_qa = Mock()
+    mock_qa.invoke.return_value = {"result": "Filtered response"}
+
+    with patch('src.rag.rag_chain.RetrievalQA.from_chain_type', return_value=mock_qa):
+        result = rag_chain.query(
+            "test", "test_collection", where={"source": "a.pdf"}, where_document={"$contains": "S3"}
+        )
+
+    mock_chroma.as_retriever.assert_called_with(
+        search_kwargs={"k": 8, "filter": {"source": "a.pdf"}, "where_document": {"$contains": "S3"}}
+    )
+    assert result == [{"text": "Filtered response", "metadata": {"source": "qa_chain"}}]
+    assert rag_chain.get_cache_stats()["qa_chains"]["size"] == 0
+
+
+def test_query_hybrid_uses_store_retriever(rag_chain: RAGChain, mock_chroma):
+    """Test hybrid search bypasses the Chroma wrapper and reaches the store's fused search."""
+    from src.rag.retriever import StoreRetriever
+
+    with patch('src.rag.rag_chain.RetrievalQA.from_chain_type', return_value=Mock(invoke=Mock(return_value={"result": "ok"}))) as build:
+        rag_chain.query("test", "test_collection", search_mode="hybrid")
+
+    retriever = build.call_args.kwargs["retriever"].retriever
+    assert isinstance(retriever, StoreRetriever)
+    assert retriever.search_kwargs == {"k": 8, "search_mode": "hybrid"}
+    mock_chroma.as_retriever.assert_not_called()
+
+
+def test_astream_query_yields_sources_then_tokens(rag_chain: RAGChain, mock_chroma):
+    """Test streaming sends retrieved sources before any LLM token."""
+    import asyncio
+    from langchain_core.documents import Document
+    from langchain_core.messages import AIMessageChunk
+
+    retriever = Mock()
+
+    async def ainvoke(query, config=None):
+        return [Document(page_content="S3 exports", metadata={"source": "a.pdf"})]
+
+    retriever.ainvoke = ainvoke
+
+    async def astream(messages):
+        assert "S3 exports" in messages[0].content
+        for token in ["The ", "", "bucket"]:
+            yield AIMessageChunk(content=token)
+
+    rag_chain.llm.astream = astream
+
+    async def collect():
+        return [event async for event in rag_chain.astream_query("where?", "test_collection", k=2)]
+
+    with patch.object(rag_chain, '_get_retriever', return_value=retriever) as get_retriever, \
+            patch.object(rag_chain.vector_store, 'get_existing_collections', return_value=["test_collection"]):
+        events = asyncio.run(collect())
+
+    get_retriever.assert_called_once_with("test_collection", {"k": 4}, True)
+    assert events == [
+        {"type": "sources", "sources": [{"text": "S3 exports", "metadata": {"source": "a.pdf"}}]},
+        {"type": "token", "text": "The "},
+        {"type": "token", "text": "bucket"},
+        {"type": "done"},
+    ]
+
+
+def test_astream_query_rejects_missing_space_before_streaming(rag_chain: RAGChain):
+    """Test an unknown space raises before the first event instead of streaming an empty answer."""
+    import asyncio
+
+    async def first_event():
+        return await rag_chain.astream_query("where?", "missing").__anext__()
+
+    with patch.object(rag_chain.vector_store, 'get_existing_collections', return_value=["other"]), \
+            pytest.raises(ValueError, match="does not exist"):
+        asyncio.run(first_event())
+
+
+def test_query_reuses_answer_until_source_chunk_is_removed(rag_chain: RAGChain, mock_chroma):
+    """Test near-identical queries skip the LLM until a chunk the answer cites is removed."""
+    from langchain_core.documents import Document
+
+    source = Document(page_content="Exports land in S3", metadata={"source": "exports.txt"})
+    mock_qa = Mock()
+    mock_qa.invoke.return_value = {"result": "In S3", "source_documents": [source]}
+
+    with patch.object(rag_chain, '_build_chain', return_value=mock_qa):
+        first = rag_chain.query("Where do exports land?", "test_collection")
+        assert rag_chain.query("Where do exports land?", "test_collection") == first
+        assert mock_qa.invoke.call_count == 1
+
+        # Different retrieval options are cached separately
+        rag_chain.query("Where do exports land?", "test_collection", k=2)
+        assert mock_qa.invoke.call_count == 2
+
+        chunk_id = rag_chain.vector_store.make_document_id(source.page_content, source.metadata)
+        rag_chain.vector_store._notify_removed("test_collection", [chunk_id])
+        rag_chain.query("Where do exports land?", "test_collection")
+        assert mock_qa.invoke.call_count == 3
+
+    stats = rag_chain.get_cache_stats()["answers"]
+    assert stats["hits"] == 1
+    assert stats["invalidations"] == 2
+
+
+def test_truncated_source_chunk_still_invalidates_answer(rag_chain: RAGChain, mock_chroma):
+    """Test an answer built from a truncated chunk is dropped when the stored chunk is removed."""
+    from langchain_core.documents import Document
+    from src.rag.context_packer import ContextPacker
+
+    stored = Document(page_content="Exports land in S3 " * 20, metadata={"source": "exports.txt"})
+    truncated = ContextPacker(token_budget=10).pack([stored])[0]
+    assert truncated.page_content != stored.page_content
+    mock_qa = Mock()
+    mock_qa.invoke.return_value = {"result": "In S3", "source_documents": [truncated]}
+
+    with patch.object(rag_chain, '_build_chain', return_value=mock_qa):
+        rag_chain.query("Where do exports land?", "test_collection")
+        chunk_id = rag_chain.vector_store.make_document_id(stored.page_content, stored.metadata)
+        rag_chain.vector_store._notify_removed("test_collection", [chunk_id])
+        rag_chain.query("Where do exports land?", "test_collection")
+
+    assert mock_qa.invoke.call_count == 2
+
+
 def test_query_error_handling(rag_chain: RAGChain, mock_openai):
     """Test query handles errors appropriately."""
-    rag_chain.qa_chain = Mock()
-    rag_chain.qa_chain.invoke.side_effect = Exception("Query failed")
+    mock_qa = Mock()
+    mock_qa.invoke.side_effect = Exception("Query failed")
     
-    with pytest.raises(Exception, match="Failed to query"):
-        rag_chain.query("test", "test_collection")
+    with patch.object(rag_chain, '_build_chain', return_value=mock_qa):
+        with pytest.raises(Exception, match="Failed to query"):
+            rag_chain.query("test", "test_collection")
 
 
 def test_query_none_chain_error(rag_chain: RAGChain, mock_openai):
-    """Test query raises error when chain is None after initialization attempt."""
-    rag_chain.qa_chain = None
-    # Mock initialize_chain to not set qa_chain (returns None without setting qa_chain)
-    def noop_init(collection_name):
-        pass  # Don't set qa_chain
-    
-    with patch.object(rag_chain, 'initialize_chain', side_effect=noop_init):
-        rag_chain.qa_chain = None  # Ensure it stays None
+    """Test query raises error when no chain could be built."""
+    with patch.object(rag_chain, 'initialize_chain', return_value=None):
         with pytest.raises(Exception, match="Failed to query"):
             rag_chain.query("test", "test_collection")
 
@@ -107,11 +330,26 @@ def test_add_documents(rag_chain: RAGChain):
     rag_chain.vector_store.add_documents = Mock()
     
     rag_chain.add_documents(test_docs, "test_space")
-    rag_chain.vector_store.add_documents.assert_called_once_with(test_docs, "test_space")
+    rag_chain.vector_store.add_documents.assert_called_once_with(test_docs, "test_space", replace_sources=False)
 
 
 def test_add_documents_empty_list(rag_chain: RAGChain):
     """Test add_documents handles empty list."""
     rag_chain.vector_store.add_documents = Mock()
     rag_chain.add_documents([], "test_space")
-    rag_chain.vector_store.add_documents.assert_called_once_with([], "test_space")
+    rag_chain.vector_store.add_documents.assert_called_once_with([], "test_space", replace_sources=False)
+
+
+def test_query_k_limits_packed_chunks(rag_chain: RAGChain, mock_chroma):
+    """Test k reaches the pooled chain's retriever, which fetches extra candidates for deduplication."""
+    from src.rag.context_packer import PackedRetriever
+
+    rag_chain.answer_cache = None
+    with patch('src.rag.rag_chain.RetrievalQA.from_chain_type', return_value=Mock(invoke=Mock(return_value={"result": "ok"}))) as build:
+        rag_chain.query("test", "test_collection", k=2)
+        rag_chain.query("test", "test_collection", k=6)
+
+    first, second = (call.kwargs["retriever"] for call in build.call_args_list)
+    assert isinstance(first, PackedRetriever)
+    assert (first.k, second.k) == (2, 6)
+    assert mock_chroma.as_retriever.call_args_list[0].kwargs == {"search_kwargs": {"k": 4}}
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from src.embeddings.rate_limiter import RateLimiter, get_shared_rate_limiter
+
+
+def test_try_acquire_consumes_quota():
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1000)
+
+    assert limiter.try_acquire(100) == 0.0
+    assert limiter.try_acquire(100) == 0.0
+    # Out of requests: roughly 30s until the next one refills at 2 RPM
+    assert limiter.try_acquire(100) == pytest.approx(30.0, rel=0.05)
+
+
+def test_try_acquire_tracks_tokens():
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=600)
+
+    assert limiter.try_acquire(600) == 0.0
+    # 10 tokens per second refill, so 50 tokens needs about 5 seconds
+    assert limiter.try_acquire(50) == pytest.approx(5.0, rel=0.05)
+
+
+def test_oversized_request_is_clamped():
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=60)
+    assert limiter.try_acquire(10_000) == 0.0
+
+
+def test_async_acquire_waits_for_refill(mocker):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=60_000)
+    mocker.patch.object(limiter, "try_acquire", side_effect=[0.5, 0.0])
+    sleep = mocker.patch("src.embeddings.rate_limiter.asyncio.sleep", new=mocker.AsyncMock())
+
+    asyncio.run(limiter.acquire(10))
+
+    sleep.assert_awaited_once_with(0.5)
+    assert limiter.total_wait_seconds == 0.5
+
+
+def test_shared_rate_limiter_is_reused():
+    assert get_shared_rate_limiter("model-a") is get_shared_rate_limiter("model-a")
+    assert get_shared_rate_limiter("model-a") is not get_shared_rate_limiter("model-b")
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        RateLimiter(0, 100)
@@ -0,0 +1,48 @@
+import pytest
+from src.embeddings.local_embeddings import HashingEmbeddings
+from src.embeddings.registry import create_embedding_function, get_embedding_backends, register_embedding_backend
+
+
+def test_builtin_backends_are_registered():
+    assert {"openai", "hashing"} <= set(get_embedding_backends())
+
+
+def test_create_hashing_backend():
+    assert isinstance(create_embedding_function("hashing"), HashingEmbeddings)
+
+
+def test_unknown_backend_raises():
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        create_embedding_function("does-not-exist")
+
+
+def test_openai_backend_requires_api_key(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+        create_embedding_function("openai")
+
+
+def test_custom_backend_receives_options():
+    received = {}
+
+    def factory(**options):
+        received.update(options)
+        return "custom-embedder"
+
+    register_embedding_backend("Custom", factory)
+    assert create_embedding_function("custom", cache_directory="/tmp/x") == "custom-embedder"
+    assert received == {"cache_directory": "/tmp/x"}
+
+
+def test_chroma_store_with_offline_backend(monkeypatch, tmp_path):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    from src.vector_store.chroma_store import ChromaStore
+
+    store = ChromaStore(persist_directory=str(tmp_path), embedding_backend="hashing")
+    store.add_documents([
+        {"text": "alpha beta", "metadata": {"source": "a.txt"}},
+        {"text": "gamma delta", "metadata": {"source": "b.txt"}}
+    ], "offline")
+
+    results = store.similarity_search("alpha beta", "offline", k=1)
+    assert results[0]["text"] == "alpha beta"
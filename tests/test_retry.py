@@ -0,0 +1,95 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from src.embeddings.retry import (
+    RetryPolicy,
+    RetryStats,
+    acall_with_retry,
+    call_with_retry,
+    get_retry_after,
+    is_payload_too_large,
+    is_retryable,
+)
+
+
+def make_error(status_code: int, message: str = "error", headers=None) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    response = httpx.Response(status_code, request=request, headers=headers or {})
+    error_cls = {429: openai.RateLimitError, 400: openai.BadRequestError}.get(status_code, openai.APIStatusError)
+    return error_cls(message, response=response, body=None)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(mocker):
+    return mocker.patch("src.embeddings.retry.time.sleep")
+
+
+def test_error_classification():
+    assert is_retryable(make_error(429))
+    assert is_retryable(make_error(503))
+    assert not is_retryable(make_error(401))
+    assert not is_retryable(Exception("boom"))
+    assert is_payload_too_large(make_error(413))
+    assert is_payload_too_large(make_error(400, "This model's maximum context length is 8192 tokens"))
+    assert not is_payload_too_large(make_error(400, "invalid model"))
+
+
+def test_retry_after_header_is_honoured():
+    assert get_retry_after(make_error(429, headers={"retry-after": "3"})) == 3.0
+    assert get_retry_after(make_error(429, headers={"retry-after-ms": "250"})) == 0.25
+    assert get_retry_after(Exception("no response")) is None
+    assert RetryPolicy().compute_delay(5, retry_after=3.0) == 3.0
+
+
+def test_call_with_retry_backs_off_on_rate_limit(no_sleep):
+    calls = []
+
+    def request(texts):
+        calls.append(texts)
+        if len(calls) < 3:
+            raise make_error(429, headers={"retry-after": "1"})
+        return [[1.0] for _ in texts]
+
+    stats = RetryStats()
+    assert call_with_retry(request, ["a"], RetryPolicy(), stats) == [[1.0]]
+    assert stats.as_dict() == {"retries": 2, "backoff_seconds": 2.0, "batch_splits": 0}
+    assert no_sleep.call_count == 2
+
+
+def test_call_with_retry_gives_up_after_max_retries():
+    def request(texts):
+        raise make_error(500)
+
+    stats = RetryStats()
+    with pytest.raises(openai.APIStatusError):
+        call_with_retry(request, ["a"], RetryPolicy(max_retries=2), stats)
+    assert stats.retries == 2
+
+
+def test_call_with_retry_bisects_oversized_batches():
+    def request(texts):
+        if len(texts) > 2:
+            raise make_error(413)
+        return [[float(text)] for text in texts]
+
+    stats = RetryStats()
+    texts = [str(i) for i in range(7)]
+    assert call_with_retry(request, texts, RetryPolicy(), stats) == [[float(i)] for i in range(7)]
+    assert stats.batch_splits == 3
+
+
+def test_acall_with_retry_bisects_and_retries(mocker):
+    mocker.patch("src.embeddings.retry.asyncio.sleep", new=mocker.AsyncMock())
+    failures = iter([make_error(413), make_error(502)])
+
+    async def request(texts):
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        return [[1.0] for _ in texts]
+
+    stats = RetryStats()
+    assert asyncio.run(acall_with_retry(request, ["a", "b"], RetryPolicy(), stats)) == [[1.0], [1.0]]
+    assert stats.batch_splits == 1
+    assert stats.retries == 1